@@ -1,31 +1,356 @@
 # -*- coding: utf-8 -*-
 
+"""
+Benchmark suite.
+
+Every benchmark reports the best time\
+per operation (in seconds) out of a few\
+repeats, so lower is always better.
+
+Usage::
+
+    $ python benchmarks.py --output baseline.json
+    $ python benchmarks.py --compare baseline.json
+
+The compare mode exits with status 1\
+when a benchmark is slower than the\
+baseline by more than ``--threshold``
+"""
+
 from __future__ import unicode_literals
 
+import sys
+import os
+import json
+import time
+import timeit
+import argparse
+import tempfile
+import threading
+import subprocess
+import platform as py_platform
+from contextlib import contextmanager
 
-if __name__ == "__main__":
-    import time
-    import gc
-    import timeit
-    import functools
+_REPEAT = 3
+_THREADS = (1, 2, 4)
+
+# Roughly the size of a minified
+# server-side rendering bundle
+_BUNDLE_FUNCTIONS = 5000
+
+_PLATFORM_START_UP = (
+    'import time\n'
+    'start = time.time()\n'
+    'from v8cffi.platform import platform\n'
+    'platform.set_up()\n'
+    'print(time.time() - start)\n'
+    'platform.tear_down()\n')
+
+
+def _bundle():
+    return ''.join(
+        'function render%d(props) {\n'
+        '  var items = [];\n'
+        '  for (var i = 0; i < props.length; i++) {\n'
+        '    items.push("<li>" + props[i] + "</li>");\n'
+        '  }\n'
+        '  return "<ul id=\\"%d\\">" + items.join("") + "</ul>";\n'
+        '}\n' % (i, i)
+        for i in range(_BUNDLE_FUNCTIONS)).encode('utf-8')
+
+
+@contextmanager
+def _bundle_file():
+    temp = tempfile.NamedTemporaryFile(suffix='.js', delete=False)
+
+    try:
+        temp.write(_bundle())
+        temp.close()
+        yield temp.name
+    finally:
+        for path in (temp.name, temp.name + '.v8cache'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _best(func, number):
+    """
+    Return the best time per call
+    """
+    return min(timeit.repeat(func, number=number, repeat=_REPEAT)) / number
+
+
+def bench_platform_start_up():
+    # V8 can be initialized once per process
+    times = []
+
+    for _ in range(_REPEAT):
+        out = subprocess.check_output(
+            [sys.executable, '-c', _PLATFORM_START_UP])
+        times.append(float(out.strip()))
+
+    return {'platform_start_up': min(times)}
+
+
+def bench_start_up(vm, number):
+    from v8cffi.platform import platform
+
+    def vm_start_up():
+        with platform.create_vm():
+            pass
+
+    def context_start_up():
+        with vm.create_context():
+            pass
+
+    return {
+        'vm_start_up': _best(vm_start_up, max(1, number // 100)),
+        'context_start_up': _best(context_start_up, max(1, number // 10))}
+
+
+def bench_load_libs(vm, number):
+    results = {}
+
+    with _bundle_file() as path:
+        for name, code_cache in (
+                ('load_libs', False),
+                ('load_libs_code_cache', True)):
+            def load_libs():
+                with vm.create_context() as ctx:
+                    ctx.load_libs([path], code_cache=code_cache)
+
+            load_libs()  # Produce the cache
+            results[name] = _best(load_libs, max(1, number // 100))
+
+    return results
+
+
+def bench_reset(vm, number):
+    # Compare to load_libs, only
+    # the parsing is skipped
+    with _bundle_file() as path:
+        with vm.create_context() as ctx:
+            ctx.load_libs([path])
+            return {'reset': _best(ctx.reset, max(1, number // 100))}
+
+
+def bench_run_script(ctx, number):
+    from v8cffi.context import OutputBuffer, RESULT_DISCARD
+
+    big = 'a' * (1024 * 1024)
+    ctx.run_script('var hello = "hi"; var big = "%s";' % big)
+    big_input = ('"%s".length' % big).encode('utf-8')
+    output = OutputBuffer()
+    script = ctx.compile('hello')
+
+    try:
+        return {
+            'run_script_small': _best(
+                lambda: ctx.run_script(b'hello'), number),
+            'run_script_compiled': _best(script.run, number),
+            'run_script_into': _best(
+                lambda: ctx.run_script_into(b'hello', output), number),
+            'run_script_large_input': _best(
+                lambda: ctx.run_script(big_input, result=RESULT_DISCARD),
+                max(1, number // 100)),
+            'run_script_large_output': _best(
+                lambda: ctx.run_script(b'big'), max(1, number // 100)),
+            'run_script_large_output_into': _best(
+                lambda: ctx.run_script_into(b'big', output),
+                max(1, number // 100))}
+    finally:
+        script.tear_down()
+
+
+def bench_js_error(ctx, number):
+    from v8cffi import exceptions
+
+    ctx.run_script(
+        'function fail(n) {'
+        '  if (n === 0) { throw new Error("fail"); }'
+        '  return fail(n - 1); }')
+
+    def js_error():
+        try:
+            ctx.run_script(b'fail(10)')
+        except exceptions.V8JSError:
+            pass
+
+    return {'js_error': _best(js_error, max(1, number // 10))}
+
+
+def bench_unicode(ctx, number):
+    text = 'hola mundo, 日本語のテキスト, ñandú, émoji 🐍 ' * 1000
+    ctx.run_script('var text = %s;' % json.dumps(text, ensure_ascii=False))
+    script = (
+        '%s.length' % json.dumps(text, ensure_ascii=False)).encode('utf-8')
+
+    return {
+        'unicode_input': _best(
+            lambda: ctx.run_script(script), max(1, number // 100)),
+        'unicode_output': _best(
+            lambda: ctx.run_script(b'text'), max(1, number // 100))}
+
+
+def bench_threads(number):
     from v8cffi.platform import platform
 
-    OPS_NUMBER = 110000
+    results = {}
+    ops = max(1, number // 10)
+
+    for threads_count in _THREADS:
+        contexts = []
+
+        for _ in range(threads_count):
+            vm = platform.create_vm()
+            vm.set_up()
+            ctx = vm.create_context()
+            ctx.set_up()
+            ctx.run_script(
+                'function work() {'
+                '  var n = 0;'
+                '  for (var i = 0; i < 10000; i++) { n += i; }'
+                '  return n; }')
+            contexts.append(ctx)
+
+        def run(ctx):
+            for _ in range(ops):
+                ctx.run_script(b'work()')
+
+        def run_all():
+            threads = [
+                threading.Thread(target=run, args=(ctx,))
+                for ctx in contexts]
+
+            for t in threads:
+                t.start()
+
+            for t in threads:
+                t.join()
+
+        try:
+            results['threads_%d' % threads_count] = (
+                _best(run_all, 1) / (ops * threads_count))
+        finally:
+            for ctx in contexts:
+                ctx.tear_down()
+                ctx._vm.tear_down()  # no-qa
+
+    return results
+
+
+def run_all(number, only=None):
+    from v8cffi.platform import platform
+
+    def selected(name):
+        return only is None or name in only
+
+    results = {}
+
+    if selected('platform'):
+        results.update(bench_platform_start_up())
+
+    with platform as pm:
+        with pm.create_vm() as vm:
+            if selected('start_up'):
+                results.update(bench_start_up(vm, number))
+
+            if selected('load_libs'):
+                results.update(bench_load_libs(vm, number))
+
+            if selected('reset'):
+                results.update(bench_reset(vm, number))
 
+            with vm.create_context() as ctx:
+                if selected('run_script'):
+                    results.update(bench_run_script(ctx, number))
 
-    def do_all():
+                if selected('js_error'):
+                    results.update(bench_js_error(ctx, number))
 
-        with platform as pm:
-            with pm.create_vm() as vm:
-                with vm.create_context() as context:
-                    # hello = b'hi' * 10000
-                    hello = b'hi'
-                    context.run_script(b"var hello = '" + hello + b"';")
-                    # 110000 ops/s on a 1.8Ghz CPU
-                    print(timeit.timeit(functools.partial(context.run_script, b"hello"), number=OPS_NUMBER))
+                if selected('unicode'):
+                    results.update(bench_unicode(ctx, number))
 
-                    print('ok')
+        if selected('threads'):
+            results.update(bench_threads(number))
 
-    do_all()
-    #gc.collect()
-    #time.sleep(30)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Return the benchmarks slower\
+    than the baseline by more than\
+    the threshold
+
+    :return: ``{name: current / baseline}``
+    :rtype: dict
+    """
+    regressions = {}
+
+    for name, seconds in sorted(results.items()):
+        if name not in baseline or not baseline[name]:
+            continue
+
+        ratio = seconds / baseline[name]
+
+        if ratio > 1 + threshold:
+            regressions[name] = ratio
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='v8-cffi benchmarks')
+    parser.add_argument(
+        '--number', type=int, default=10000,
+        help='Operations per fast benchmark, slow ones run fewer')
+    parser.add_argument(
+        '--only', nargs='+',
+        choices=(
+            'platform', 'start_up', 'load_libs', 'reset',
+            'run_script', 'js_error', 'unicode', 'threads'),
+        help='Run these benchmarks only')
+    parser.add_argument(
+        '--output', help='Write the JSON results into this file')
+    parser.add_argument(
+        '--compare', help='Baseline JSON file to compare against')
+    parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='Max slowdown ratio before flagging a regression')
+    args = parser.parse_args()
+
+    from v8cffi import __version__
+
+    report = {
+        'meta': {
+            'v8cffi': __version__,
+            'python': sys.version.split()[0],
+            'implementation': py_platform.python_implementation(),
+            'machine': py_platform.machine(),
+            'time': time.time()},
+        'results': run_all(args.number, args.only)}
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+    if not args.compare:
+        return 0
+
+    with open(args.compare) as fh:
+        baseline = json.load(fh)['results']
+
+    regressions = compare(report['results'], baseline, args.threshold)
+
+    for name, ratio in sorted(regressions.items()):
+        sys.stderr.write(
+            'REGRESSION %s: %.2fx slower than baseline\n' % (name, ratio))
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import unittest
+import logging
+import os
+import sys
+import tempfile
+
+from v8cffi import exceptions
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from v8cffi.aio import AsyncContext
+
+
+logging.disable(logging.CRITICAL)
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'Requires Python 3.5+')
+class AsyncContextTest(unittest.TestCase):
+
+    def setUp(self):
+        temp = tempfile.NamedTemporaryFile(delete=False)
+        temp.write(
+            b'var foo = {render: function (t) { return "<p>" + t + "</p>"; }};'
+            b'function wait(ms) {'
+            b'  var end = Date.now() + ms; while (Date.now() < end) {}'
+            b'}')
+        temp.close()
+        self.script_path = temp.name
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        os.remove(self.script_path)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_run_script(self):
+        """
+        It should await the script result
+        """
+        async def run():
+            async with AsyncContext(2, [self.script_path]) as actx:
+                self.assertTrue(actx.is_alive())
+                return await actx.run_script('foo.render("áé")')
+
+        self.assertEqual('<p>áé</p>', self.run_async(run()))
+
+    def test_call(self):
+        """
+        It should await the function result
+        """
+        async def run():
+            async with AsyncContext(2, [self.script_path]) as actx:
+                return await asyncio.gather(*[
+                    actx.call('foo.render', i)
+                    for i in range(10)])
+
+        self.assertEqual(
+            ['<p>%d</p>' % i for i in range(10)],
+            self.run_async(run()))
+
+    def test_run_script_stream(self):
+        """
+        It should iterate over the chunks
+        """
+        async def run():
+            async with AsyncContext(1, [self.script_path]) as actx:
+                chunks = []
+
+                async for chunk in actx.run_script_stream(
+                        'write(foo.render("áé")); write("b");'):
+                    chunks.append(chunk)
+
+                return chunks
+
+        self.assertEqual(
+            ['<p>áé</p>'.encode('utf-8'), b'b'], self.run_async(run()))
+
+    def test_run_script_stream_error(self):
+        """
+        It should raise JS errors after the written chunks
+        """
+        chunks = []
+
+        async def run():
+            async with AsyncContext(1, [self.script_path]) as actx:
+                async for chunk in actx.run_script_stream(
+                        'write("a"); oops();'):
+                    chunks.append(chunk)
+
+        self.assertRaises(exceptions.V8JSError, self.run_async, run())
+        self.assertEqual([b'a'], chunks)
+
+    def test_error(self):
+        """
+        It should raise JS errors
+        """
+        async def run():
+            async with AsyncContext(1, [self.script_path]) as actx:
+                await actx.run_script('oops()')
+
+        self.assertRaises(exceptions.V8JSError, self.run_async, run())
+
+    def test_loop_not_blocked(self):
+        """
+        It should keep the loop running while JS runs
+        """
+        ticks = []
+
+        async def tick():
+            for _ in range(5):
+                ticks.append(None)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            async with AsyncContext(1, [self.script_path]) as actx:
+                await asyncio.gather(
+                    actx.run_script('wait(200)'),
+                    tick())
+
+        self.run_async(run())
+        self.assertEqual(5, len(ticks))
+
+    def test_max_in_flight(self):
+        """
+        It should bound the submitted work
+        """
+        async def run():
+            async with AsyncContext(
+                    2, [self.script_path], max_in_flight=1) as actx:
+                tasks = [
+                    asyncio.ensure_future(actx.run_script('wait(20); 1'))
+                    for _ in range(4)]
+                await asyncio.sleep(0.005)
+                self.assertEqual(0, actx._semaphore._value)
+                return await asyncio.gather(*tasks)
+
+        self.assertEqual(['1'] * 4, self.run_async(run()))
+
+    def test_cancel(self):
+        """
+        It should cancel the pending work
+        """
+        async def run():
+            async with AsyncContext(1, [self.script_path]) as actx:
+                slow = asyncio.ensure_future(actx.run_script('wait(100)'))
+                pending = asyncio.ensure_future(
+                    actx.run_script('var bar = 1;'))
+                await asyncio.sleep(0.01)
+                pending.cancel()
+                await slow
+                return pending.cancelled()
+
+        self.assertTrue(self.run_async(run()))
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from v8cffi import code_cache
+
+
+logging.disable(logging.CRITICAL)
+
+
+class CodeCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'foo.js.v8cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cache_path_for(self):
+        """
+        It should place the cache next to the script
+        """
+        self.assertEqual(
+            code_cache.cache_path_for('/foo/bar.js'),
+            '/foo/bar.js.v8cache')
+
+    def test_cache_key(self):
+        """
+        It should return a key for the script source
+        """
+        key = code_cache.cache_key(b'var foo;')
+        self.assertIsInstance(key, bytes)
+        self.assertEqual(len(key), 40)
+        self.assertEqual(key, code_cache.cache_key(b'var foo;'))
+        self.assertNotEqual(key, code_cache.cache_key(b'var bar;'))
+
+    def test_store_and_load(self):
+        """
+        It should store and load the cache
+        """
+        key = code_cache.cache_key(b'var foo;')
+        code_cache.store(self.path, key, b'\x00foo\x01')
+        self.assertEqual(code_cache.load(self.path, key), b'\x00foo\x01')
+        self.assertEqual(os.listdir(self.tmp_dir), ['foo.js.v8cache'])
+
+    def test_store_concurrent(self):
+        """
+        It should not mix the caches stored by many threads
+        """
+        key = code_cache.cache_key(b'var foo;')
+        datas = [bytes(bytearray([i])) * 1024 * 1024 for i in range(8)]
+        threads = [
+            threading.Thread(
+                target=code_cache.store, args=(self.path, key, data))
+            for data in datas]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertIn(code_cache.load(self.path, key), datas)
+        self.assertEqual(os.listdir(self.tmp_dir), ['foo.js.v8cache'])
+
+    def test_load_missing(self):
+        """
+        It should return an empty cache if there is no file
+        """
+        key = code_cache.cache_key(b'var foo;')
+        self.assertEqual(code_cache.load(self.path, key), b'')
+
+    def test_load_stale(self):
+        """
+        It should return an empty cache if the key does not match
+        """
+        key = code_cache.cache_key(b'var foo;')
+        code_cache.store(self.path, key, b'foo')
+        self.assertEqual(
+            code_cache.load(self.path, code_cache.cache_key(b'var bar;')),
+            b'')
+
+    def test_discard(self):
+        """
+        It should remove the cache
+        """
+        key = code_cache.cache_key(b'var foo;')
+        code_cache.store(self.path, key, b'foo')
+        code_cache.discard(self.path)
+        self.assertFalse(os.path.exists(self.path))
+        code_cache.discard(self.path)  # Does not fail
@@ -8,8 +8,11 @@ except ImportError:
     from mock import patch, Mock
 
 import unittest
+import json
+import pickle
 import logging
 import os
+import shutil
 import tempfile
 from contextlib import contextmanager
 
@@ -19,6 +22,7 @@ from v8cffi.platform import platform
 from v8cffi.vm import VM
 from v8cffi import exceptions
 from v8cffi import context
+from v8cffi import code_cache
 
 
 logging.disable(logging.CRITICAL)
@@ -179,13 +183,341 @@ class ContextTest(unittest.TestCase):
         """
         It should run the script file content on V8
         """
-        script = b'var foo = "foo";'
+        with js_file(b'var foo = "foo";') as path:
+            with context.Context(self.vm) as ctx:
+                self.assertIsNone(ctx.load_libs([path]))
+                self.assertEqual('foo', ctx.run_script('foo'))
+                self.assertFalse(os.path.exists(path + '.v8cache'))
+
+    def test_load_libs_code_cache(self):
+        """
+        It should run the script files using a code cache
+        """
+        script = (
+            b'var foo = (function () {\n'
+            b'  var bar = "bar!";\n'
+            b'  return function () { return bar; };\n'
+            b'})();\n')
 
         with js_file(script) as path:
+            cache_path = path + '.v8cache'
+
+            try:
+                with context.Context(self.vm) as ctx:
+                    self.assertEqual(
+                        [code_cache.PRODUCED],
+                        ctx.load_libs([path], code_cache=True))
+                    self.assertEqual('bar!', ctx.run_script('foo()'))
+                    self.assertTrue(os.path.isfile(cache_path))
+
+                with context.Context(self.vm) as ctx:
+                    self.assertEqual(
+                        [code_cache.ACCEPTED],
+                        ctx.load_libs([path], code_cache=True))
+                    self.assertEqual('bar!', ctx.run_script('foo()'))
+            finally:
+                if os.path.exists(cache_path):
+                    os.remove(cache_path)
+
+    def test_reset(self):
+        """
+        It should discard the global scope and reload the libs
+        """
+        with js_file(b'var foo = "foo"; var counter = 0;') as path:
+            with context.Context(self.vm) as ctx:
+                ctx.load_libs([path])
+                ctx.run_script('counter = 1; var bar = "bar";')
+                self.assertEqual('1', ctx.run_script('counter'))
+
+                ctx.reset()
+                self.assertEqual('0', ctx.run_script('counter'))
+                self.assertEqual('foo', ctx.run_script('foo'))
+                self.assertEqual('undefined', ctx.run_script('typeof bar'))
+
+                ctx.run_script('counter = 2;')
+                ctx.reset()
+                self.assertEqual('0', ctx.run_script('counter'))
+
+    def test_reset_stale(self):
+        """
+        It should raise when running scripts and functions created before
+        """
+        with js_file(b'function foo() { return "foo"; }') as path:
             with context.Context(self.vm) as ctx:
-                with patch.object(ctx, 'run_script', autospec=True) as r:
-                    ctx.load_libs([path])
-                    r.assert_called_once_with(script, identifier=path)
+                ctx.load_libs([path])
+
+                with context.Script(ctx, 'foo()') as script:
+                    with context.Function(ctx, 'foo') as foo:
+                        self.assertEqual('foo', script.run())
+                        self.assertEqual('foo', foo())
+                        ctx.reset()
+                        self.assertRaises(exceptions.V8StaleError, script.run)
+                        self.assertRaises(exceptions.V8StaleError, foo)
+
+                with context.Function(ctx, 'foo') as foo:
+                    self.assertEqual('foo', foo())
+
+    def test_reset_lib_error(self):
+        """
+        It should keep the global scope when a lib fails
+        """
+        calls = []
+
+        def check():
+            calls.append(None)
+
+            if len(calls) > 1:
+                raise ValueError('bad lib')
+
+        with js_file(b'check(); var counter = 0;') as path:
+            with context.Context(self.vm) as ctx:
+                ctx.add_function('check', check)
+                ctx.load_libs([path])
+                ctx.run_script('counter = 1;')
+                self.assertRaises(exceptions.V8JSError, ctx.reset)
+                self.assertEqual('1', ctx.run_script('counter'))
+
+    def test_reset_no_libs(self):
+        """
+        It should reset a context without libs
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('var bar = "bar";')
+            ctx.reset()
+            self.assertEqual('undefined', ctx.run_script('typeof bar'))
+            self.assertEqual('object', ctx.run_script('typeof JSON'))
+
+    def test_add_function(self):
+        """
+        It should call the Python function with the converted values
+        """
+        calls = []
+
+        def translate(key, values=None):
+            calls.append((key, values))
+            return {'text': 'hola %s' % (values or {}).get('name', '')}
+
+        with context.Context(self.vm) as ctx:
+            ctx.add_function('t', translate)
+            ctx.add_function(b'flag', lambda: None)
+            self.assertEqual('function', ctx.run_script('typeof t'))
+            self.assertEqual('hola ñandú', ctx.run_script(
+                't("hello", {name: "ñandú"}).text'))
+            self.assertEqual([('hello', {'name': 'ñandú'})], calls)
+            self.assertEqual('null', ctx.run_script('flag()'))
+
+            ctx.add_function('echo', lambda *args: list(args))
+            self.assertEqual(
+                [1, 2.5, True, None, [1], 'a'],
+                ctx.run_script(
+                    'echo(1, 2.5, true, null, [1], "a")',
+                    result=context.RESULT_PYTHON))
+            self.assertEqual([], ctx.run_script(
+                'echo()', result=context.RESULT_PYTHON))
+
+            ctx.add_function('greet', lambda name: 'hola "%s"' % name)
+            self.assertEqual('string', ctx.run_script('typeof greet("a")'))
+            self.assertEqual('hola "ñandú"', ctx.run_script('greet("ñandú")'))
+            self.assertEqual('greet', ctx.run_script('greet.name'))
+
+    def test_add_function_error(self):
+        """
+        It should throw Python errors as JS errors
+        """
+        def fail(message):
+            raise ValueError(message)
+
+        with context.Context(self.vm) as ctx:
+            ctx.add_function('fail', fail)
+            ctx.add_function('bad_result', lambda: object())
+            self.assertEqual('ValueError: foo', ctx.run_script(
+                'try { fail("foo"); } catch (err) { err.message; }'))
+            self.assertRaises(
+                exceptions.V8JSError,
+                lambda: ctx.run_script('fail("foo")'))
+            self.assertRaises(
+                exceptions.V8JSError,
+                lambda: ctx.run_script('bad_result()'))
+            self.assertEqual('bar', ctx.run_script(
+                'try {'
+                '  fail({toJSON: function() { throw "bar"; }});'
+                '} catch (err) { err; }'))
+
+    def test_add_function_reset(self):
+        """
+        It should keep the functions on reset
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.add_function('foo', lambda: 'foo')
+            ctx.add_function('bar', lambda: 'bar')
+            ctx.reset()
+            self.assertEqual('foo', ctx.run_script('foo()'))
+            self.assertEqual('bar', ctx.run_script('bar()'))
+
+            ctx.add_function('baz', lambda: 'baz')
+            ctx.reset()
+            self.assertEqual('foobarbaz', ctx.run_script('foo() + bar() + baz()'))
+
+    def test_profiling(self):
+        """
+        It should return a DevTools CPU profile
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.start_profiling('foo', sampling_interval_us=100)
+            ctx.run_script(
+                'function fib(n) { return n < 2? n: fib(n - 1) + fib(n - 2); }'
+                'fib(25);', identifier='fib.js')
+            profile = json.loads(ctx.stop_profiling('foo'))
+
+            self.assertEqual(
+                set(profile.keys()),
+                {'nodes', 'startTime', 'endTime', 'samples', 'timeDeltas'})
+            self.assertGreaterEqual(profile['endTime'], profile['startTime'])
+            self.assertEqual(
+                len(profile['samples']), len(profile['timeDeltas']))
+            self.assertEqual(
+                '(root)', profile['nodes'][0]['callFrame']['functionName'])
+            nodes_ids = {node['id'] for node in profile['nodes']}
+            self.assertTrue(set(profile['samples']) <= nodes_ids)
+            self.assertIn('fib', {
+                node['callFrame']['functionName']
+                for node in profile['nodes']
+                if node['callFrame']['url'] == 'fib.js'})
+
+    def test_run_script_profiled(self):
+        """
+        It should write the profile into a file
+        """
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'foo.cpuprofile')
+
+        try:
+            with context.Context(self.vm) as ctx:
+                self.assertEqual('3', ctx.run_script_profiled('1 + 2', path))
+
+                with open(path, 'rb') as fh:
+                    profile = json.loads(fh.read().decode('utf-8'))
+
+                self.assertIn('nodes', profile)
+
+                self.assertRaises(
+                    exceptions.V8JSError,
+                    lambda: ctx.run_script_profiled('oops()', path))
+                self.assertTrue(os.path.isfile(path))
+                self.assertFalse(ctx._profiles)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_run_script_stream(self):
+        """
+        It should pass the chunks to the callback as they are written
+        """
+        chunks = []
+
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('var write = "foo";')
+            self.assertIsNone(ctx.run_script_stream(
+                'write("<p>"); write("áé"); write(1); write("</p>"); "bar"',
+                chunks.append))
+            self.assertEqual(
+                [b'<p>', 'áé'.encode('utf-8'), b'1', b'</p>'], chunks)
+            self.assertEqual('foo', ctx.run_script('write'))
+
+            del chunks[:]
+            ctx.run_script_stream(
+                'out("a");', chunks.append, write_name='out')
+            self.assertEqual([b'a'], chunks)
+            self.assertEqual('undefined', ctx.run_script('typeof out'))
+
+    def test_run_script_stream_error(self):
+        """
+        It should raise JS and callback errors
+        """
+        chunks = []
+
+        def fail(chunk):
+            raise ValueError(chunk)
+
+        with context.Context(self.vm) as ctx:
+            self.assertRaises(
+                exceptions.V8JSError,
+                lambda: ctx.run_script_stream(
+                    'write("a"); oops();', chunks.append))
+            self.assertEqual([b'a'], chunks)
+            self.assertEqual('undefined', ctx.run_script('typeof write'))
+
+            try:
+                ctx.run_script_stream(
+                    'write("a"); var done = true;', fail)
+            except ValueError as err:
+                self.assertEqual(b'a', err.args[0])
+            else:
+                self.fail('ValueError not raised')
+
+            self.assertEqual('undefined', ctx.run_script('typeof done'))
+
+    def test_run_script_stream_ended(self):
+        """
+        It should throw when write is called after the stream ended
+        """
+        chunks = []
+
+        with context.Context(self.vm) as ctx:
+            ctx.run_script_stream('var w = write; w("a");', chunks.append)
+            self.assertEqual([b'a'], chunks)
+            self.assertEqual(
+                'Error: write() called after the stream ended',
+                ctx.run_script('try { w("b"); } catch (err) { String(err); }'))
+            self.assertRaises(
+                exceptions.V8JSError,
+                lambda: ctx.run_script_stream('w("c");', chunks.append))
+            self.assertEqual([b'a'], chunks)
+
+    def test_run_script_cached(self):
+        """
+        It should produce the code cache and consume it afterwards
+        """
+        script = (
+            'var foo = (function () {\n'
+            '  var bar = "bar!";\n'
+            '  return function () { return bar; };\n'
+            '})();\n'
+            'foo();')
+
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'foo.js.v8cache')
+
+        try:
+            with context.Context(self.vm) as ctx:
+                self.assertEqual(
+                    ('bar!', code_cache.PRODUCED),
+                    ctx.run_script_cached(script, cache_path=path))
+                self.assertTrue(os.path.isfile(path))
+
+            with context.Context(self.vm) as ctx:
+                self.assertEqual(
+                    ('bar!', code_cache.ACCEPTED),
+                    ctx.run_script_cached(script, cache_path=path))
+
+            with open(path, 'r+b') as fh:
+                fh.seek(40)
+                fh.write(b'\x00' * 16)
+
+            with context.Context(self.vm) as ctx:
+                self.assertEqual(
+                    ('bar!', code_cache.REJECTED),
+                    ctx.run_script_cached(script, cache_path=path))
+                self.assertFalse(os.path.exists(path))
+
+            with context.Context(self.vm) as ctx:
+                self.assertRaises(
+                    exceptions.V8JSError,
+                    ctx.run_script_cached,
+                    'function[]();',
+                    cache_path=path)
+                self.assertFalse(os.path.exists(path))
+        finally:
+            shutil.rmtree(tmp_dir)
 
     def test_run_script(self):
         """
@@ -208,6 +540,418 @@ class ContextTest(unittest.TestCase):
         with context.Context(self.vm) as ctx:
             self.assertRaises(exceptions.V8JSError, ctx.run_script, 'foo')
 
+    def test_run_script_result_python(self):
+        """
+        It should convert the result into Python objects
+        """
+        with context.Context(self.vm) as ctx:
+            run = lambda script: ctx.run_script(
+                script, result=context.RESULT_PYTHON)
+            self.assertEqual(1, run('1'))
+            self.assertIsInstance(run('1'), int)
+            self.assertEqual(1.5, run('1.5'))
+            self.assertEqual(2 ** 40, run('Math.pow(2, 40)'))
+            self.assertEqual(-0.1, run('-0.1'))
+            self.assertEqual('0', repr(run('-0')))
+            self.assertIsNone(run('NaN'))
+            self.assertIsNone(run('Infinity'))
+            self.assertIs(True, run('true'))
+            self.assertIs(False, run('false'))
+            self.assertIs(True, run('new Boolean(true)'))
+            self.assertIsNone(run('null'))
+            self.assertIsNone(run('undefined'))
+            self.assertEqual('áé "\\\n\t', run('"áé \\"\\\\\\n\\t"'))
+            self.assertEqual('foo', run('new String("foo")'))
+            self.assertEqual([1, 'a', None, None, [True]], run(
+                '[1, "a", undefined, function () {}, [true]]'))
+            self.assertEqual({'a': 1, 'b': {'c': [1.5]}, '1': 'x'}, run(
+                '({a: 1, b: {c: [1.5]}, d: undefined, e: function () {}, 1: "x"})'))
+            self.assertEqual(
+                '1970-01-01T00:00:00.000Z', run('new Date(0)'))
+            self.assertEqual({'foo': 'bar'}, run(
+                '({toJSON: function () { return {foo: "bar"}; }})'))
+            self.assertRaises(
+                exceptions.V8JSError, run, 'var a = {}; a.a = a; a')
+            self.assertRaises(
+                exceptions.V8JSError,
+                run,
+                '({get foo() { throw new Error("oops"); }})')
+
+    def test_run_script_result_json(self):
+        """
+        It should serialize the result as JSON.stringify does
+        """
+        with context.Context(self.vm) as ctx:
+            output = context.OutputBuffer()
+            run = lambda script: ctx.run_script_into(
+                script, output, result=context.RESULT_PYTHON).tobytes()
+            self.assertEqual(b'0.1', run('0.1'))
+            self.assertEqual(b'[0.1,1e+21,-1.5]', run('[0.1, 1e21, -1.5]'))
+            self.assertEqual(b'null', run('undefined'))
+            self.assertEqual(b'null', run('(function () {})'))
+            self.assertEqual(b'{"foo":1}', run(
+                '({get foo() { return 1; }})'))
+            self.assertEqual(b'[1,null,null,2]', run(
+                'var a = [1]; a[3] = 2; a'))
+            self.assertEqual(b'{"a":{"b":null}}', run(
+                '({a: {b: null, c: undefined}})'))
+
+            with self.assertRaises(exceptions.V8JSError) as cm:
+                run('var b = {}; b.b = [b]; b')
+
+            self.assertIn('TypeError', cm.exception.message)
+
+    def test_run_script_result_discard(self):
+        """
+        It should skip the result conversion
+        """
+        with context.Context(self.vm) as ctx:
+            self.assertIsNone(ctx.run_script(
+                'var foo = "foo"; foo', result=context.RESULT_DISCARD))
+            self.assertEqual('foo', ctx.run_script('foo'))
+            self.assertRaises(
+                exceptions.V8JSError,
+                ctx.run_script,
+                'bar',
+                result=context.RESULT_DISCARD)
+
+    def test_run_script_into(self):
+        """
+        It should write the result into the buffer
+        """
+        output = context.OutputBuffer(size=8)
+
+        with context.Context(self.vm) as ctx:
+            view = ctx.run_script_into('"foo"', output)
+            self.assertIsInstance(view, memoryview)
+            self.assertEqual(b'foo', view.tobytes())
+            self.assertEqual(3, len(output))
+            self.assertEqual(8, output.capacity())
+            self.assertEqual(
+                'áéíóú'.encode('utf-8'),
+                ctx.run_script_into('"áéíóú"', output).tobytes())
+            self.assertEqual(
+                b'[1,"a"]',
+                ctx.run_script_into(
+                    '[1, "a"]', output, result=context.RESULT_PYTHON).tobytes())
+            self.assertEqual(
+                b'',
+                ctx.run_script_into(
+                    '"foo"', output, result=context.RESULT_DISCARD).tobytes())
+            self.assertRaises(
+                exceptions.V8JSError, ctx.run_script_into, 'baz', output)
+            self.assertEqual(0, len(output))
+
+    def test_run_script_into_grow(self):
+        """
+        It should grow the buffer when the result does not fit
+        """
+        output = context.OutputBuffer(size=4)
+
+        with context.Context(self.vm) as ctx:
+            view = ctx.run_script_into('"foo"', output)
+            self.assertEqual(
+                'á'.encode('utf-8') * 10,
+                ctx.run_script_into('Array(11).join("á")', output).tobytes())
+            self.assertEqual(20, output.capacity())
+            self.assertEqual(b'foo', view.tobytes())
+            self.assertEqual(
+                b'x' * 100,
+                ctx.run_script_into('Array(101).join("x")', output).tobytes())
+            self.assertEqual(100, output.capacity())
+            self.assertEqual(b'x' * 100, output.to_bytes())
+
+    def test_call_into(self):
+        """
+        It should write the function result into the buffer
+        """
+        output = context.OutputBuffer(size=4)
+
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('function foo(a, b) { return a + b; }')
+
+            with context.Function(ctx, 'foo') as foo:
+                self.assertEqual(b'3', foo.call_into(output, 1, 2).tobytes())
+                self.assertEqual(
+                    b'foobar', foo.call_into(output, 'foo', 'bar').tobytes())
+                self.assertRaises(TypeError, foo.call_into, output, object())
+
+            with context.Function(
+                    ctx, 'foo', result=context.RESULT_PYTHON) as foo:
+                self.assertEqual(
+                    b'"ab"', foo.call_into(output, 'a', 'b').tobytes())
+
+    def test_run_script_pinned_input(self):
+        """
+        It should pass big inputs without copying them
+        """
+        size = context._PIN_MIN_SIZE
+        script = b'var foo = "' + b'x' * size + b'"; foo.length'
+        script_special = 'var bar = "' + 'á' * size + '"; bar.length'
+
+        with VM(platform) as vm:
+            with context.Context(vm) as ctx:
+                self.assertEqual(
+                    six.text_type(size), ctx.run_script(script))
+                self.assertLessEqual(len(context._pinned), 1)
+                # Non ASCII inputs get copied and released
+                self.assertEqual(
+                    six.text_type(size), ctx.run_script(script_special))
+                self.assertLessEqual(len(context._pinned), 1)
+                self.assertEqual('x', ctx.run_script('foo[0]'))
+
+                ctx.run_script('function baz(a) { return a.length; }')
+
+                with context.Function(ctx, 'baz') as baz:
+                    self.assertEqual(
+                        six.text_type(size), baz('y' * size))
+
+                with context.Script(ctx, script) as compiled:
+                    self.assertEqual(
+                        six.text_type(size), compiled.run())
+
+        self.assertEqual({}, context._pinned)
+
+    def test_pin_input(self):
+        """
+        It should only pin big inputs
+        """
+        data, pin = context._pin_input(b'foo')
+        self.assertEqual(b'foo', data)
+        self.assertEqual(context.ffi.NULL, pin)
+
+        big = b'x' * context._PIN_MIN_SIZE
+        data, pin = context._pin_input(big)
+        self.assertNotEqual(context.ffi.NULL, pin)
+        self.assertEqual(big, context.ffi.buffer(data)[:])
+        self.assertIn(context._address(pin), context._pinned)
+        context.v8cffi_py_release_input(pin)
+        self.assertNotIn(context._address(pin), context._pinned)
+
+    def test_run_script_timeout(self):
+        """
+        It should terminate the execution and keep the context usable
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('var foo = "foo";')
+            self.assertRaises(
+                exceptions.V8TimeoutError,
+                ctx.run_script,
+                'while (true) {}',
+                timeout=0.05)
+            self.assertRaises(
+                exceptions.V8TimeoutError,
+                ctx.run_script,
+                '/(a+)+b/.test(Array(64).join("a"))',
+                timeout=0.05)
+            self.assertEqual('foo', ctx.run_script('foo'))
+            self.assertEqual('foo', ctx.run_script('foo', timeout=10))
+            self.assertRaises(
+                exceptions.V8JSError,
+                ctx.run_script,
+                'bar',
+                timeout=10)
+            self.assertRaises(
+                exceptions.V8TimeoutError,
+                ctx.run_script_into,
+                'while (true) {}',
+                context.OutputBuffer(),
+                timeout=0.05)
+
+            # A late termination should not leak into the next call
+            for _ in range(100):
+                try:
+                    ctx.run_script('foo', timeout=0.001)
+                except exceptions.V8TimeoutError:
+                    pass
+
+            self.assertEqual('foo', ctx.run_script('foo'))
+
+    def test_script_and_function_timeout(self):
+        """
+        It should terminate scripts and functions execution
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('function loop() { while (true) {} }')
+
+            with context.Script(ctx, 'loop()') as script:
+                self.assertRaises(
+                    exceptions.V8TimeoutError, script.run, timeout=0.05)
+
+            with context.Function(ctx, 'loop', timeout=0.05) as loop:
+                self.assertRaises(exceptions.V8TimeoutError, loop)
+
+            self.assertEqual('1', ctx.run_script('1'))
+
+    def test_nested_timeout(self):
+        """
+        It should restore the outer deadline after a nested timed call
+        """
+        with context.Context(self.vm) as ctx:
+            def nested(script):
+                try:
+                    return ctx.run_script(script, timeout=0.05)
+                except exceptions.V8TimeoutError:
+                    return 'timeout'
+
+            ctx.add_function('nested', nested)
+            self.assertRaises(
+                exceptions.V8TimeoutError,
+                ctx.run_script,
+                'nested("1"); while (true) {}',
+                timeout=0.2)
+            self.assertEqual(
+                'timeout',
+                ctx.run_script('nested("while (true) {}")', timeout=10))
+            self.assertEqual('1', ctx.run_script('nested("1")', timeout=10))
+
+    def test_result_compile_and_get_function(self):
+        """
+        It should support the result types on scripts and functions
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('function foo(a) { return {a: a}; }')
+
+            with context.Script(ctx, 'foo(1)') as script:
+                self.assertEqual({'a': 1}, script.run(
+                    result=context.RESULT_PYTHON))
+                self.assertIsNone(script.run(result=context.RESULT_DISCARD))
+                self.assertEqual('[object Object]', script.run())
+
+            foo = ctx.get_function('foo', result=context.RESULT_PYTHON)
+
+            try:
+                self.assertEqual({'a': [1, 'b']}, foo([1, 'b']))
+            finally:
+                foo.tear_down()
+
+    def test_is_alive(self):
+        """
+        It should be alive within a with context
+        """
+        ctx = context.Context(self.vm)
+        self.assertFalse(ctx.is_alive())
+
+        with ctx as _:
+            self.assertTrue(ctx.is_alive())
+
+        self.assertFalse(ctx.is_alive())
+
+    def test_compile(self):
+        """
+        It should compile the script once and run it many times
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('var counter = 0;')
+            script = ctx.compile('counter += 1; "áé" + counter;')
+
+            try:
+                self.assertIsInstance(script, context.Script)
+                self.assertTrue(script.is_alive())
+                self.assertEqual('áé1', script.run())
+                self.assertEqual('áé2', script.run())
+                self.assertEqual('2', ctx.run_script('counter'))
+            finally:
+                script.tear_down()
+
+            self.assertFalse(script.is_alive())
+
+    def test_compile_errors(self):
+        """
+        It should raise JS errors on compile and run
+        """
+        with context.Context(self.vm) as ctx:
+            self.assertRaises(
+                exceptions.V8JSError, ctx.compile, 'function[]();')
+
+            with context.Script(ctx, 'oops();', identifier='oops.js') as script:
+                try:
+                    script.run()
+                except exceptions.V8JSError as ex:
+                    self.assertIn('oops.js:1', six.text_type(ex))
+                    self.assertIn('ReferenceError', six.text_type(ex))
+                else:
+                    self.fail('V8JSError not raised')
+
+    def test_get_function(self):
+        """
+        It should call the JS function with native arguments
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script(
+                'var foo = {\n'
+                '  prefix: "áé ",\n'
+                '  render: function (props, sep) {\n'
+                '    return this.prefix + props.title + sep + props.items.length;\n'
+                '  }\n'
+                '};\n'
+                'function bar() { return arguments.length; }')
+
+            render = ctx.get_function('foo.render')
+
+            try:
+                self.assertIsInstance(render, context.Function)
+                self.assertEqual(
+                    'áé hola "mundo"!2',
+                    render({'title': 'hola "mundo"', 'items': [1, None]}, '!'))
+                self.assertEqual(
+                    'áé foo-0',
+                    render.call({'title': 'foo', 'items': []}, '-'))
+                self.assertRaises(exceptions.V8JSError, render, None, '!')
+                self.assertRaises(TypeError, render, object())
+            finally:
+                render.tear_down()
+
+            with context.Function(ctx, 'bar') as bar:
+                self.assertEqual('0', bar())
+                self.assertEqual('3', bar(1, 'a', {'b': 1.5}))
+
+    def test_run_batch(self):
+        """
+        It should run the scripts and calls returning every result
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('function sum(a, b) { return a + b; }')
+
+            with context.Function(
+                    ctx, 'sum', result=context.RESULT_PYTHON) as sum_:
+                results = ctx.run_batch([
+                    'var foo = "áé";',
+                    b'foo',
+                    (sum_, [1, 2]),
+                    (sum_, ['a', 'b']),
+                    'foo + 1'])
+                self.assertEqual(
+                    ['undefined', 'áé', 3, 'ab', 'áé1'], results)
+                self.assertEqual([], ctx.run_batch([]))
+
+                results = ctx.run_batch(
+                    ['oops()', '[1, null]', (sum_, [1, 1])],
+                    identifier='foo.js',
+                    result=context.RESULT_PYTHON)
+                self.assertIsInstance(results[0], exceptions.V8JSError)
+                self.assertIn('foo.js', six.text_type(results[0]))
+                self.assertEqual([[1, None], 2], results[1:])
+
+                results = ctx.run_batch(
+                    ['while (true) {}', '1'], timeout=0.1)
+                self.assertIsInstance(results[0], exceptions.V8TimeoutError)
+                self.assertEqual('1', results[1])
+
+                self.assertRaises(
+                    TypeError, lambda: ctx.run_batch([(sum_, [object()])]))
+
+    def test_get_function_not_found(self):
+        """
+        It should raise if the function is not found
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('var foo = {bar: 1};')
+            self.assertRaises(exceptions.V8JSError, ctx.get_function, 'baz')
+            self.assertRaises(exceptions.V8JSError, ctx.get_function, 'foo.bar')
+            self.assertRaises(
+                exceptions.V8JSError, ctx.get_function, 'foo.bar.baz')
+
     def test_builtin_libs(self):
         """
         It should pre-load builtin libraries
@@ -215,6 +959,134 @@ class ContextTest(unittest.TestCase):
         with context.Context(self.vm) as ctx:
             self.assertEqual("20", ctx.run_script('Math.max(10, 20);'))
 
+    def test_js_error_details(self):
+        """
+        It should carry the error details
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script(
+                'function Foo() { oops(); }\n'
+                'function bar() { return new Foo(); }',
+                identifier='foo.js')
+
+            try:
+                ctx.run_script('bar()', identifier='bar.js')
+            except exceptions.V8JSError as err:
+                self.assertEqual(
+                    'ReferenceError: oops is not defined', err.message)
+                self.assertEqual('foo.js', err.resource_name)
+                self.assertEqual(1, err.line_number)
+                self.assertEqual(17, err.start_column)
+                self.assertEqual(21, err.end_column)
+                self.assertEqual(
+                    'function Foo() { oops(); }', err.source_line)
+                self.assertEqual([
+                    {'function_name': 'Foo', 'script_name': 'foo.js',
+                     'line_number': 1, 'column': 18, 'is_constructor': True},
+                    {'function_name': 'bar', 'script_name': 'foo.js',
+                     'line_number': 2, 'column': 25, 'is_constructor': False},
+                    {'function_name': '', 'script_name': 'bar.js',
+                     'line_number': 1, 'column': 1, 'is_constructor': False}],
+                    err.frames)
+                self.assertIsNone(err.value)
+                self.assertEqual(
+                    'foo.js:1\n'
+                    '    function Foo() { oops(); }\n'
+                    '                     ^^^^\n'
+                    'ReferenceError: oops is not defined\n'
+                    '    at new Foo (foo.js:1:18)\n'
+                    '    at bar (foo.js:2:25)\n'
+                    '    at bar.js:1:1',
+                    six.text_type(err))
+            else:
+                self.fail('V8JSError not raised')
+
+            try:
+                ctx.run_script('throw {code: 400, fields: ["name"]};')
+            except exceptions.V8JSError as err:
+                self.assertEqual('[object Object]', err.message)
+                self.assertEqual({'code': 400, 'fields': ['name']}, err.value)
+                self.assertEqual([], err.frames)
+            else:
+                self.fail('V8JSError not raised')
+
+    def test_js_error_details_lazy(self):
+        """
+        It should format the stack and value when accessed
+        """
+        with context.Context(self.vm) as ctx:
+            try:
+                ctx.run_script('function foo() { oops(); } foo()')
+            except exceptions.V8JSError as err:
+                self.assertIn('error_id', err._get_details())
+                self.assertNotIn('stack', err._get_details())
+                self.assertEqual(
+                    'ReferenceError: oops is not defined', err.message)
+                self.assertEqual('foo', err.frames[0]['function_name'])
+                self.assertTrue(err.details['stack'].startswith(
+                    'ReferenceError: oops is not defined\n'))
+                error = err
+            else:
+                self.fail('V8JSError not raised')
+
+            errors = []
+
+            for i in range(17):
+                try:
+                    ctx.run_script('throw [%d];' % i)
+                except exceptions.V8JSError as err:
+                    errors.append(err)
+
+            self.assertIsNone(errors[0].value)
+            self.assertEqual('0', errors[0].message)
+            self.assertEqual([16], errors[-1].value)
+
+            err = pickle.loads(pickle.dumps(errors[-2]))
+            self.assertEqual([15], err.value)
+            self.assertEqual(error.details, pickle.loads(
+                pickle.dumps(error)).details)
+
+    def test_js_error_details_vm_torn_down(self):
+        """
+        It should not format the stack once the VM is torn down
+        """
+        with VM(platform) as vm:
+            with context.Context(vm) as ctx:
+                try:
+                    ctx.run_script('oops()')
+                except exceptions.V8JSError as err:
+                    error = err
+
+        self.assertEqual('ReferenceError: oops is not defined', error.message)
+        self.assertIsNone(error.details.get('stack'))
+        self.assertTrue(six.text_type(error).endswith(
+            'ReferenceError: oops is not defined'))
+
+    def test_js_error_message(self):
+        """
+        It should work for errors created from Python
+        """
+        err = exceptions.V8JSError('Error: foo')
+        self.assertEqual('Error: foo', err.message)
+        self.assertEqual('Error: foo', six.text_type(err))
+        self.assertIsNone(err.resource_name)
+        self.assertEqual([], err.frames)
+
+        err = exceptions.V8JSError(
+            '{"message": "Error: foo", "resource_name": "foo.js", '
+            '"line_number": 1, "start_column": 0, "end_column": 1, '
+            '"stack": "Error: foo\\n    at Array.map (native)"}')
+        self.assertEqual(
+            'foo.js:1\n'
+            '    ~Source line not available.\n'
+            'Error: foo\n'
+            '    at Array.map (native)',
+            six.text_type(err))
+        self.assertEqual([
+            {'function_name': 'Array.map', 'script_name': 'native',
+             'line_number': None, 'column': None, 'is_constructor': False}],
+            err.frames)
+
     def test_run_script_trace_back(self):
         """
         It should run the script on V8\
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import unittest
+import logging
+import os
+import tempfile
+from concurrent import futures
+
+from v8cffi.executor import IsolateExecutor, ROUND_ROBIN, LEAST_BUSY
+from v8cffi import exceptions
+from v8cffi import context
+
+
+logging.disable(logging.CRITICAL)
+
+
+class IsolateExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        temp = tempfile.NamedTemporaryFile(delete=False)
+        temp.write(
+            b'var foo = {render: function (props) { return {html: props.title}; }};'
+            b'var counter = 0;')
+        temp.close()
+        self.script_path = temp.name
+
+    def tearDown(self):
+        os.remove(self.script_path)
+
+    def test_submit(self):
+        """
+        It should run the script in a worker
+        """
+        with IsolateExecutor(2, [self.script_path]) as executor:
+            future = executor.submit('foo.render({title: "áé"}).html')
+            self.assertIsInstance(future, futures.Future)
+            self.assertEqual('áé', future.result())
+            self.assertEqual(
+                {'html': 'a'},
+                executor.submit(
+                    'foo.render({title: "a"})',
+                    result=context.RESULT_PYTHON).result())
+
+    def test_pinned(self):
+        """
+        It should run the scripts with the VMs pinned to the workers
+        """
+        with IsolateExecutor(2, [self.script_path], pinned=True) as executor:
+            results = executor.map(
+                ['foo.render({title: "%d"}).html' % i for i in range(10)],
+                timeout=10)
+            self.assertEqual([str(i) for i in range(10)], list(results))
+
+    def test_submit_stream(self):
+        """
+        It should stream the chunks from the worker
+        """
+        chunks = []
+
+        with IsolateExecutor(1, [self.script_path]) as executor:
+            future = executor.submit_stream(
+                'write("a"); write("b");', chunks.append)
+            self.assertIsNone(future.result())
+            self.assertEqual([b'a', b'b'], chunks)
+
+    def test_submit_error(self):
+        """
+        It should set the JS error into the future
+        """
+        with IsolateExecutor(1, [self.script_path]) as executor:
+            future = executor.submit('oops()')
+            self.assertRaises(exceptions.V8JSError, future.result)
+            self.assertEqual('0', executor.submit('counter').result())
+
+    def test_submit_timeout(self):
+        """
+        It should terminate long running scripts and keep the worker
+        """
+        with IsolateExecutor(1, [self.script_path]) as executor:
+            future = executor.submit(
+                'counter = 1; while (true) {}', timeout=0.05)
+            self.assertRaises(exceptions.V8TimeoutError, future.result)
+            future = executor.submit_call(
+                'eval', ('while (true) {}',), timeout=0.05)
+            self.assertRaises(exceptions.V8TimeoutError, future.result)
+            self.assertEqual('1', executor.submit('counter').result())
+
+    def test_submit_call(self):
+        """
+        It should call the function in a worker
+        """
+        with IsolateExecutor(2, [self.script_path]) as executor:
+            fs = [
+                executor.submit_call('foo.render', ({'title': i},))
+                for i in range(10)]
+            self.assertEqual(
+                [{'html': i} for i in range(10)],
+                [f.result() for f in fs])
+
+    def test_map(self):
+        """
+        It should run the scripts in parallel, in order
+        """
+        with IsolateExecutor(4, [self.script_path]) as executor:
+            results = executor.map(
+                ['for (var i = 0; i < 10000; i++) {}; %d' % i
+                 for i in range(20)],
+                timeout=10)
+            self.assertEqual([str(i) for i in range(20)], list(results))
+
+    def test_sticky_key(self):
+        """
+        It should route the same key to the same worker
+        """
+        with IsolateExecutor(4, [self.script_path]) as executor:
+            for _ in range(10):
+                executor.submit('counter++', key='foo')
+
+            self.assertEqual(
+                '10', executor.submit('counter', key='foo').result())
+
+    def test_round_robin(self):
+        """
+        It should route to every worker in turns
+        """
+        with IsolateExecutor(4, [self.script_path], routing=ROUND_ROBIN) as executor:
+            fs = [executor.submit('++counter') for _ in range(8)]
+            self.assertEqual(['1'] * 4 + ['2'] * 4, [f.result() for f in fs])
+
+    def test_least_busy(self):
+        """
+        It should route to the worker with the fewest items
+        """
+        with IsolateExecutor(2, [self.script_path], routing=LEAST_BUSY) as executor:
+            fs = [executor.submit('++counter') for _ in range(8)]
+            self.assertEqual(8, len([f.result() for f in fs]))
+
+    def test_shutdown(self):
+        """
+        It should not allow to submit after shutdown
+        """
+        executor = IsolateExecutor(1, [self.script_path])
+        future = executor.submit('counter')
+        executor.shutdown()
+        self.assertEqual('0', future.result())
+        self.assertRaises(RuntimeError, executor.submit, 'counter')
+
+    def test_init_error(self):
+        """
+        It should raise initialization errors
+        """
+        with open(self.script_path, 'wb') as fh:
+            fh.write(b'oops()')
+
+        self.assertRaises(
+            exceptions.V8JSError,
+            IsolateExecutor, 2, [self.script_path])
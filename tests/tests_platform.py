@@ -97,6 +97,16 @@ class PlatformTest(unittest.TestCase):
             self.assertFalse(platform_.is_alive())
             self.assertRaises(AssertionError, platform_.__exit__)
 
+    def test_blobs_not_found(self):
+        """
+        It should raise if the blobs do not exist
+        """
+        platform_ = _Platform()
+        platform_.natives_path = '/foo/natives_blob.bin'
+        self.assertRaises(OSError, platform_.__enter__)
+        self.assertFalse(platform_.is_alive())
+        self.assertFalse(platform_._is_dead)
+
     def test_with_exceptions(self):
         """
         It should raise V8 exceptions
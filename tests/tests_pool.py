@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import unittest
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from v8cffi.pool import ContextPool
+from v8cffi import exceptions
+from v8cffi import context
+
+
+logging.disable(logging.CRITICAL)
+
+
+class ContextPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        temp = tempfile.NamedTemporaryFile(delete=False)
+        temp.write(b'var foo = "foo!"; var counter = 0;')
+        temp.close()
+        self.script_path = temp.name
+
+    def tearDown(self):
+        os.remove(self.script_path)
+
+    def test_with(self):
+        """
+        It should support with statement
+        """
+        pool = ContextPool(2, [self.script_path])
+        self.assertFalse(pool.is_alive())
+
+        with pool as p:
+            self.assertIsInstance(p, ContextPool)
+            self.assertTrue(pool.is_alive())
+
+        self.assertFalse(pool.is_alive())
+
+    def test_checkout(self):
+        """
+        It should checkout a context with the libs loaded
+        """
+        with ContextPool(2, [self.script_path]) as pool:
+            with pool.checkout() as ctx:
+                self.assertIsInstance(ctx, context.Context)
+                self.assertEqual('foo!', ctx.run_script('foo'))
+                self.assertEqual(1, pool.stats()['in_use'])
+
+                with pool.checkout() as ctx_b:
+                    self.assertIsNot(ctx, ctx_b)
+                    self.assertEqual(2, pool.stats()['in_use'])
+                    self.assertEqual(1.0, pool.stats()['utilization'])
+
+            self.assertEqual(0, pool.stats()['in_use'])
+
+    def test_checkout_timeout(self):
+        """
+        It should raise when no context is available
+        """
+        with ContextPool(1, [self.script_path]) as pool:
+            with pool.checkout():
+                self.assertRaises(
+                    exceptions.V8PoolTimeoutError,
+                    lambda: pool.checkout(timeout=0.01).__enter__())
+
+    def test_checkout_js_error(self):
+        """
+        It should keep the context on JS errors
+        """
+        with ContextPool(1, [self.script_path]) as pool:
+            with pool.checkout() as ctx:
+                ctx.run_script('counter = 1;')
+
+            try:
+                with pool.checkout() as ctx:
+                    ctx.run_script('oops()')
+            except exceptions.V8JSError:
+                pass
+
+            with pool.checkout() as ctx:
+                self.assertEqual('1', ctx.run_script('counter'))
+
+            self.assertEqual(0, pool.stats()['recreated'])
+
+    def test_checkout_broken(self):
+        """
+        It should recreate broken contexts
+        """
+        with ContextPool(1, [self.script_path]) as pool:
+            with pool.checkout() as ctx:
+                ctx.run_script('counter = 1;')
+
+            try:
+                with pool.checkout() as ctx:
+                    raise exceptions.V8MemoryError()
+            except exceptions.V8MemoryError:
+                pass
+
+            self.assertFalse(ctx.is_alive())
+
+            with pool.checkout() as ctx:
+                self.assertEqual('0', ctx.run_script('counter'))
+                self.assertEqual('foo!', ctx.run_script('foo'))
+
+            stats = pool.stats()
+            self.assertEqual(1, stats['recreated'])
+            self.assertEqual(1, stats['size'])
+
+    def test_checkout_broken_recreate_error(self):
+        """
+        It should raise the checkout error when recreating fails
+        """
+        with ContextPool(1, [self.script_path]) as pool:
+            with patch.object(
+                    pool, '_create_member', side_effect=OSError('foo')):
+                try:
+                    with pool.checkout():
+                        raise exceptions.V8MemoryError()
+                except exceptions.V8MemoryError:
+                    pass
+                else:
+                    self.fail('V8MemoryError not raised')
+
+            stats = pool.stats()
+            self.assertEqual(0, stats['size'])
+            self.assertEqual(0, stats['in_use'])
+            self.assertEqual(1, stats['recreated'])
+
+    def test_checkout_reset(self):
+        """
+        It should reset the contexts when checked in
+        """
+        with ContextPool(1, [self.script_path], reset=True) as pool:
+            with pool.checkout() as ctx:
+                ctx.run_script('counter = 1; var bar = "bar";')
+
+            with pool.checkout() as ctx:
+                self.assertEqual('0', ctx.run_script('counter'))
+                self.assertEqual('foo!', ctx.run_script('foo'))
+                self.assertEqual('undefined', ctx.run_script('typeof bar'))
+
+            self.assertEqual(0, pool.stats()['recreated'])
+
+    def test_threads(self):
+        """
+        It should run contexts from many threads
+        """
+        results = []
+
+        def render(pool):
+            with pool.checkout() as ctx:
+                results.append(ctx.run_script(
+                    'for (var i = 0; i < 100000; i++) { counter++; } foo'))
+
+        with ContextPool(4, [self.script_path]) as pool:
+            threads = [
+                threading.Thread(target=render, args=(pool,))
+                for _ in range(16)]
+
+            for t in threads:
+                t.start()
+
+            for t in threads:
+                t.join()
+
+            self.assertEqual(['foo!'] * 16, results)
+            stats = pool.stats()
+            self.assertEqual(16, stats['checkouts'])
+            self.assertEqual(4, stats['size'])
+            self.assertEqual(0, stats['in_use'])
+            self.assertGreaterEqual(stats['wait_time'], 0)
+
+    def test_tear_down_checked_out(self):
+        """
+        It should not allow tearing down while in use
+        """
+        pool = ContextPool(1, [self.script_path])
+        pool.set_up()
+
+        with pool.checkout():
+            self.assertRaises(AssertionError, pool.tear_down)
+
+        pool.tear_down()
+        self.assertFalse(pool.is_alive())
+
+    def test_idle_gc(self):
+        """
+        It should notify the VMs of idle contexts
+        """
+        with ContextPool(
+                2, [self.script_path], idle_gc_ms=10) as pool:
+            with pool.checkout() as ctx:
+                ctx.run_script('var garbage = []; '
+                               'for (var i = 0; i < 10000; i++) '
+                               '{ garbage.push({i: i}); } '
+                               'garbage = null;')
+
+            for _ in range(100):
+                if pool.stats()['idle_notifications']:
+                    break
+
+                time.sleep(0.01)
+
+            self.assertGreater(pool.stats()['idle_notifications'], 0)
+
+            with pool.checkout() as ctx:
+                self.assertEqual('foo!', ctx.run_script('foo'))
+
+        self.assertFalse(pool.is_alive())
+
+    def test_idle_gc_in_use(self):
+        """
+        It should not count the contexts being notified as in use
+        """
+        in_use = []
+
+        def idle_notification(deadline_ms):
+            in_use.append(pool.stats()['in_use'])
+            return True
+
+        with ContextPool(1, [self.script_path]) as pool:
+            with pool.checkout() as ctx:
+                vm = ctx._vm
+
+            pool._idle_gc_ms = 1
+            time.sleep(0.01)
+
+            with patch.object(
+                    vm, 'idle_notification', side_effect=idle_notification):
+                pool._idle_gc()
+
+            self.assertEqual([0], in_use)
+            self.assertEqual(1, pool.stats()['idle_notifications'])
+
+    def test_idle_gc_disabled(self):
+        """
+        It should not notify the VMs by default
+        """
+        with ContextPool(1, [self.script_path]) as pool:
+            time.sleep(0.05)
+            self.assertEqual(0, pool.stats()['idle_notifications'])
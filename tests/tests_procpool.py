@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import unittest
+import logging
+import os
+import tempfile
+
+from v8cffi import procpool
+from v8cffi.procpool import ProcessPool, _SharedBuffer
+from v8cffi import exceptions
+from v8cffi import context
+
+
+logging.disable(logging.CRITICAL)
+
+
+class SharedBufferTest(unittest.TestCase):
+
+    def test_write_read(self):
+        """
+        It should share the data through the file
+        """
+        buffer = _SharedBuffer.create(16)
+
+        try:
+            buffer_b = _SharedBuffer(buffer.path, 16)
+            buffer.unlink()
+            self.assertFalse(os.path.exists(buffer.path))
+            self.assertTrue(buffer.write(b'foo'))
+            self.assertEqual(b'foo', buffer_b.read(3))
+            self.assertFalse(buffer.write(b'x' * 17))
+            buffer_b.close()
+        finally:
+            buffer.close()
+
+
+class ProcessPoolTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        temp = tempfile.NamedTemporaryFile(delete=False)
+        temp.write(
+            b'var foo = {render: function (t) { return "<p>" + t + "</p>"; }};')
+        temp.close()
+        cls.script_path = temp.name
+        cls.pool = ProcessPool(2, [cls.script_path], buffer_size=1024)
+        cls.pool.set_up()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.tear_down()
+        os.remove(cls.script_path)
+
+    def test_run_script(self):
+        """
+        It should run the script in a worker process
+        """
+        self.assertEqual(
+            '<p>áé</p>', self.pool.run_script('foo.render("áé")'))
+        self.assertEqual(
+            {'a': [1, None]},
+            self.pool.run_script(
+                '({a: [1, null]})', result=context.RESULT_PYTHON))
+        self.assertIsNone(self.pool.run_script(
+            '1', result=context.RESULT_DISCARD))
+
+    def test_large_payloads(self):
+        """
+        It should send payloads not fitting the buffer through the pipe
+        """
+        txt = 'á' * 2048
+        self.assertEqual(
+            '<p>%s</p>' % txt,
+            self.pool.run_script('foo.render("%s")' % txt))
+
+    def test_call(self):
+        """
+        It should call the function in a worker process
+        """
+        self.assertEqual('<p>1</p>', self.pool.call('foo.render', 1))
+
+    def test_js_error(self):
+        """
+        It should raise the JS error
+        """
+        self.assertRaises(
+            exceptions.V8JSError, self.pool.run_script, 'oops()')
+        self.assertRaises(
+            exceptions.V8JSError, self.pool.call, 'oops')
+
+    def test_restart(self):
+        """
+        It should restart dead workers
+        """
+        restarts = self.pool.stats()['restarts']
+
+        for worker in self.pool._workers:
+            worker._process.terminate()
+            worker._process.join()
+
+        for _ in range(4):
+            self.assertEqual('<p>a</p>', self.pool.call('foo.render', 'a'))
+
+        stats = self.pool.stats()
+        self.assertEqual(restarts + 2, stats['restarts'])
+        self.assertEqual(2, stats['size'])
+        self.assertEqual(0, stats['in_use'])
+
+    def test_restart_error(self):
+        """
+        It should raise the process error when the restart fails
+        """
+        with patch.object(
+                procpool._Worker,
+                'request',
+                side_effect=exceptions.V8ProcessError('foo')):
+            with patch.object(
+                    self.pool,
+                    '_create_worker',
+                    side_effect=OSError('bar')):
+                self.assertRaises(
+                    exceptions.V8ProcessError,
+                    self.pool.call, 'foo.render', 'a')
+
+        self.assertEqual(2, self.pool.stats()['size'])
+        self.assertEqual('<p>a</p>', self.pool.call('foo.render', 'a'))
+
+    def test_start_error(self):
+        """
+        It should raise the error when the process fails to start
+        """
+        worker = procpool._Worker(
+            [self.script_path], {}, buffer_size=1024)
+
+        with patch.object(
+                procpool._mp_context().Process,
+                'start',
+                side_effect=OSError('foo')):
+            self.assertRaises(OSError, worker.start)
+
+        self.assertFalse(worker.is_alive())
+        self.assertIsNone(worker._process)
+
+    def test_process_error(self):
+        """
+        It should raise when the worker dies within a request
+        """
+        worker = self.pool._available.get()
+
+        try:
+            worker._process.terminate()
+            worker._process.join()
+            self.assertRaises(
+                exceptions.V8ProcessError,
+                worker.request, 'run_script', ('foo', 0), b'1')
+        finally:
+            self.pool._available.put(worker)
+
+    def test_init_error(self):
+        """
+        It should raise initialization errors
+        """
+        temp = tempfile.NamedTemporaryFile(delete=False)
+        temp.write(b'oops()')
+        temp.close()
+
+        try:
+            self.assertRaises(
+                exceptions.V8JSError,
+                ProcessPool(1, [temp.name]).set_up)
+        finally:
+            os.remove(temp.name)
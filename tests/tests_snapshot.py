@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+
+from v8cffi.platform import platform
+from v8cffi import exceptions
+from v8cffi import snapshot
+
+
+logging.disable(logging.CRITICAL)
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.foo_path = os.path.join(self.tmp_dir, 'foo.js')
+        self.bar_path = os.path.join(self.tmp_dir, 'bar.js')
+        self.snapshot_path = os.path.join(self.tmp_dir, 'snapshot.bin')
+
+        with open(self.foo_path, 'wb') as fh:
+            fh.write('var foo = "foo áéíóú";'.encode('utf-8'))
+
+        with open(self.bar_path, 'wb') as fh:
+            fh.write(b'function bar() { return foo + "!"; }')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_create(self):
+        """
+        It should create a snapshot blob
+        """
+        snapshot_blob = snapshot.create([self.foo_path, self.bar_path])
+        self.assertIsInstance(snapshot_blob, bytes)
+        self.assertTrue(snapshot_blob)
+
+    def test_create_error(self):
+        """
+        It should raise when the script fails
+        """
+        with open(self.foo_path, 'wb') as fh:
+            fh.write(b'function[]();')
+
+        self.assertRaises(
+            exceptions.V8JSError,
+            snapshot.create,
+            [self.foo_path])
+
+    def test_create_file(self):
+        """
+        It should boot contexts with the scripts loaded
+        """
+        snapshot.create_file(
+            [self.foo_path, self.bar_path],
+            self.snapshot_path)
+
+        with platform.create_vm(snapshot_path=self.snapshot_path) as vm:
+            with vm.create_context() as ctx:
+                self.assertEqual('foo áéíóú!', ctx.run_script('bar()'))
+                ctx.run_script('foo = "changed";')
+
+            with vm.create_context() as ctx:
+                self.assertEqual('foo áéíóú!', ctx.run_script('bar()'))
+
+        with platform.create_vm() as vm:
+            with vm.create_context() as ctx:
+                self.assertRaises(
+                    exceptions.V8JSError, ctx.run_script, 'bar()')
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+
+from v8cffi.platform import platform
+from v8cffi.vm import VM
+from v8cffi import exceptions
+from v8cffi import context
+from v8cffi import timing
+
+
+logging.disable(logging.CRITICAL)
+
+
+class TimingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vm = VM(platform)
+        self.vm.set_up()
+
+    def tearDown(self):
+        self.vm.tear_down()
+
+    def test_context_timing(self):
+        """
+        It should time the calls of the context
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('var foo = "foo";')
+            self.assertEqual(0, ctx.counters()['calls'])
+
+            ctx.set_timing(True)
+            ctx.run_script('foo')
+            call = timing.last_call()
+            self.assertEqual(len('foo'), call['bytes_in'])
+            self.assertEqual(len('foo'), call['bytes_out'])
+            self.assertFalse(call['is_error'])
+            self.assertEqual(
+                set(call['phases_ns'].keys()),
+                {'input', 'compile', 'run', 'output', 'copy'})
+            self.assertGreater(call['phases_ns']['run'], 0)
+
+            self.assertRaises(
+                exceptions.V8JSError,
+                lambda: ctx.run_script('oops()'))
+            self.assertTrue(timing.last_call()['is_error'])
+
+            counters = ctx.counters()
+            self.assertEqual(2, counters['calls'])
+            self.assertEqual(1, counters['errors'])
+            self.assertEqual(len('foo') + len('oops()'), counters['bytes_in'])
+            self.assertEqual(len('foo'), counters['bytes_out'])
+            self.assertGreater(counters['phases_ns']['compile'], 0)
+
+            ctx.set_timing(False)
+            ctx.run_script('foo')
+            self.assertEqual(2, ctx.counters()['calls'])
+
+    def test_script_and_function_timing(self):
+        """
+        It should time compiled scripts and functions
+        """
+        with context.Context(self.vm) as ctx:
+            ctx.run_script('function add(a, b) { return a + b; }')
+            ctx.set_timing(True)
+
+            script = ctx.compile('add(1, 2)')
+
+            try:
+                self.assertEqual('3', script.run())
+                self.assertEqual(0, timing.last_call()['bytes_in'])
+                self.assertEqual(
+                    0, timing.last_call()['phases_ns']['compile'])
+            finally:
+                script.tear_down()
+
+            add = ctx.get_function('add')
+
+            try:
+                self.assertEqual('3', add(1, 2))
+                self.assertEqual(
+                    len('[1,2]'), timing.last_call()['bytes_in'])
+                self.assertGreater(
+                    timing.last_call()['phases_ns']['input'], 0)
+            finally:
+                add.tear_down()
+
+            self.assertEqual(2, ctx.counters()['calls'])
+
+    def test_run_script_cached_timing(self):
+        """
+        It should time the cached script runs
+        """
+        tmp_dir = tempfile.mkdtemp()
+        cache_path = os.path.join(tmp_dir, 'foo.v8cache')
+
+        try:
+            with context.Context(self.vm) as ctx:
+                ctx.set_timing(True)
+                self.assertEqual(
+                    '3', ctx.run_script_cached('1 + 2', cache_path))
+                call = timing.last_call()
+                self.assertEqual(len('1 + 2'), call['bytes_in'])
+                self.assertEqual(len('3'), call['bytes_out'])
+                self.assertFalse(call['is_error'])
+                self.assertGreater(call['phases_ns']['compile'], 0)
+                self.assertGreater(call['phases_ns']['run'], 0)
+
+                self.assertRaises(
+                    exceptions.V8JSError,
+                    lambda: ctx.run_script_cached('oops()', cache_path))
+                self.assertTrue(timing.last_call()['is_error'])
+                self.assertEqual(2, ctx.counters()['calls'])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_global_timing(self):
+        """
+        It should time the calls of every context
+        """
+        calls = timing.counters()['calls']
+        timing.set_enabled(True)
+
+        try:
+            with context.Context(self.vm) as ctx:
+                ctx.run_script('1')
+                self.assertEqual(1, ctx.counters()['calls'])
+        finally:
+            timing.set_enabled(False)
+
+        self.assertEqual(calls + 1, timing.counters()['calls'])
@@ -9,6 +9,11 @@ except ImportError:
 
 import unittest
 import logging
+import json
+import os
+import shutil
+import tempfile
+import threading
 
 from v8cffi.platform import platform
 from v8cffi import vm as vm_module
@@ -115,6 +120,285 @@ class VMTest(unittest.TestCase):
             self.assertFalse(vm.is_alive())
             self.assertRaises(AssertionError, vm.__exit__)
 
+    def test_snapshot_path(self):
+        """
+        It should pass the snapshot path to the C VM
+        """
+        code_ok = vm_module.lib.E_V8_OK
+
+        with patch('v8cffi.vm.lib', autospec=True) as r:
+            vm = VM(platform, snapshot_path=platform.snapshot_path)
+
+            vm_new = Mock(return_value=code_ok)
+            r.v8cffi_vm_new = vm_new
+            r.E_V8_OK = code_ok
+            vm.__enter__()
+            snapshot_path = platform.snapshot_path.encode('utf-8')
+            vm_new.assert_called_once_with(
+                vm._c_vm, snapshot_path, len(snapshot_path), 0, 0, 0)
+
+    def test_heap_limits(self):
+        """
+        It should pass the heap limits to the C VM
+        """
+        code_ok = vm_module.lib.E_V8_OK
+
+        with patch('v8cffi.vm.lib', autospec=True) as r:
+            vm = VM(
+                platform,
+                max_semi_space_size=1,
+                max_old_space_size=64,
+                max_executable_size=32)
+
+            vm_new = Mock(return_value=code_ok)
+            r.v8cffi_vm_new = vm_new
+            r.E_V8_OK = code_ok
+            vm.__enter__()
+            vm_new.assert_called_once_with(vm._c_vm, b'', 0, 1, 64, 32)
+
+        self.assertRaises(AssertionError, VM, platform, max_old_space_size=-1)
+
+    def test_heap_stats(self):
+        """
+        It should return the heap usage
+        """
+        with VM(platform, max_old_space_size=64) as vm:
+            stats = vm.heap_stats()
+            self.assertEqual(set(stats.keys()), {
+                'total_heap_size',
+                'total_heap_size_executable',
+                'total_physical_size',
+                'total_available_size',
+                'used_heap_size',
+                'heap_size_limit',
+                'external_memory'})
+            self.assertGreater(stats['used_heap_size'], 0)
+            self.assertGreaterEqual(
+                stats['total_heap_size'], stats['used_heap_size'])
+            self.assertLess(stats['heap_size_limit'], 128 * 1024 * 1024)
+
+            with vm.create_context() as ctx:
+                ctx.run_script('var foo = new ArrayBuffer(1024 * 1024);')
+                self.assertGreaterEqual(
+                    vm.heap_stats()['external_memory'], 1024 * 1024)
+
+    def test_idle_notification(self):
+        """
+        It should let V8 collect garbage
+        """
+        with VM(platform) as vm:
+            with vm.create_context() as ctx:
+                ctx.run_script('var garbage = []; '
+                               'for (var i = 0; i < 10000; i++) '
+                               '{ garbage.push({i: i}); } '
+                               'garbage = null;')
+
+                for _ in range(100):
+                    if vm.idle_notification(10):
+                        break
+
+                self.assertIsInstance(vm.idle_notification(10), bool)
+                self.assertEqual('1', ctx.run_script('1'))
+
+    def test_low_memory_notification(self):
+        """
+        It should free memory
+        """
+        with VM(platform) as vm:
+            with vm.create_context() as ctx:
+                ctx.run_script('var garbage = []; '
+                               'for (var i = 0; i < 100000; i++) '
+                               '{ garbage.push({i: i}); } '
+                               'garbage = null;')
+                used = vm.heap_stats()['used_heap_size']
+                vm.low_memory_notification()
+                self.assertLess(vm.heap_stats()['used_heap_size'], used)
+                self.assertEqual('1', ctx.run_script('1'))
+
+    def test_pin(self):
+        """
+        It should hold the VM for the current thread
+        """
+        errors = []
+
+        def run_elsewhere(ctx):
+            try:
+                ctx.run_script('1')
+            except exceptions.V8Error as err:
+                errors.append(err)
+
+        with VM(platform) as vm:
+            with vm.create_context() as ctx:
+                vm.pin()
+                vm.pin()
+
+                try:
+                    self.assertEqual('2', ctx.run_script('1 + 1'))
+
+                    with context.Function(ctx, 'String') as fn:
+                        self.assertEqual('1', fn(1))
+
+                    thread = threading.Thread(target=run_elsewhere, args=(ctx,))
+                    thread.start()
+                    thread.join()
+                    self.assertEqual(1, len(errors))
+                    self.assertIsInstance(errors[0], exceptions.V8PinnedError)
+                    self.assertIn('pinned', str(errors[0]))
+                finally:
+                    vm.unpin()
+
+                self.assertRaises(exceptions.V8PinnedError, vm.unpin)
+                del errors[:]
+                thread = threading.Thread(target=run_elsewhere, args=(ctx,))
+                thread.start()
+                thread.join()
+                self.assertEqual([], errors)
+
+    def test_pin_error_message(self):
+        """
+        It should report the pinned error from every context call
+        """
+        errors = []
+
+        def call_elsewhere(ctx):
+            calls = [
+                lambda: ctx.add_function('foo', lambda: None),
+                lambda: ctx.run_batch(['1']),
+                lambda: ctx.start_profiling('foo')]
+
+            for call in calls:
+                try:
+                    call()
+                except exceptions.V8Error as err:
+                    errors.append(err)
+
+        with VM(platform) as vm:
+            with vm.create_context() as ctx:
+                vm.pin()
+
+                try:
+                    thread = threading.Thread(target=call_elsewhere, args=(ctx,))
+                    thread.start()
+                    thread.join(10)
+                    self.assertFalse(thread.is_alive())
+                finally:
+                    vm.unpin()
+
+        self.assertEqual(3, len(errors))
+
+        for err in errors:
+            self.assertIsInstance(err, exceptions.V8PinnedError)
+            self.assertIn('pinned', str(err))
+
+    def test_pin_other_thread(self):
+        """
+        It should not block other threads on the pinned VM
+        """
+        errors = []
+
+        def idle_elsewhere(vm):
+            try:
+                vm.idle_notification(10)
+            except exceptions.V8Error as err:
+                errors.append(err)
+
+        with VM(platform) as vm:
+            with vm.create_context() as ctx:
+                fn = context.Function(ctx, 'String').set_up()
+                vm.pin()
+
+                try:
+                    thread = threading.Thread(target=idle_elsewhere, args=(vm,))
+                    thread.start()
+                    thread.join(10)
+                    self.assertFalse(thread.is_alive())
+                    self.assertEqual(1, len(errors))
+                    self.assertIsInstance(errors[0], exceptions.V8PinnedError)
+
+                    # The release is left to the pinned thread
+                    thread = threading.Thread(target=fn.tear_down)
+                    thread.start()
+                    thread.join(10)
+                    self.assertFalse(thread.is_alive())
+                finally:
+                    vm.unpin()
+
+                self.assertEqual('1', ctx.run_script('1'))
+
+    def test_pin_tear_down(self):
+        """
+        It should unpin the VM on tear down
+        """
+        with VM(platform) as vm:
+            vm.pin()
+
+            with vm.create_context() as ctx:
+                self.assertEqual('1', ctx.run_script('1'))
+
+    def test_write_heap_snapshot(self):
+        """
+        It should write a DevTools heap snapshot
+        """
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'foo.heapsnapshot')
+
+        try:
+            with VM(platform) as vm:
+                with vm.create_context() as ctx:
+                    ctx.run_script(
+                        'function Leak() {} var leaks = [];'
+                        'for (var i = 0; i < 100; i++) leaks.push(new Leak());')
+                    vm.write_heap_snapshot(path)
+
+            with open(path, 'rb') as fh:
+                snapshot = json.loads(fh.read().decode('utf-8'))
+
+            self.assertTrue(
+                {'snapshot', 'nodes', 'edges', 'strings'} <=
+                set(snapshot.keys()))
+            self.assertIn('Leak', snapshot['strings'])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_write_heap_snapshot_bad_path(self):
+        """
+        It should raise when the file can't be written
+        """
+        with VM(platform) as vm:
+            self.assertRaises(
+                (IOError, OSError),
+                lambda: vm.write_heap_snapshot('/does/not/exist/foo'))
+
+    def test_write_heap_snapshot_error(self):
+        """
+        It should leave no file behind on error
+        """
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'foo.heapsnapshot')
+
+        try:
+            with VM(platform) as vm:
+                with patch('v8cffi.vm.lib', autospec=True) as r:
+                    r.v8cffi_vm_write_heap_snapshot = Mock(
+                        return_value=vm_module.lib.E_V8_PINNED)
+                    r.E_V8_OK = vm_module.lib.E_V8_OK
+
+                    self.assertRaises(
+                        exceptions.V8PinnedError,
+                        lambda: vm.write_heap_snapshot(path))
+
+            self.assertEqual(os.listdir(tmp_dir), [])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_snapshot_path_not_found(self):
+        """
+        It should raise if the snapshot does not exists
+        """
+        vm = VM(platform, snapshot_path='/foo/snapshot_blob.bin')
+        self.assertRaises(OSError, vm.__enter__)
+        self.assertFalse(vm.is_alive())
+
     def test_with_exceptions(self):
         """
         It should raise V8 exceptions
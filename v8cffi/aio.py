@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio support, Python 3.5+ only
+"""
+
+from __future__ import unicode_literals
+import asyncio
+
+from . import context as context_module
+from .executor import IsolateExecutor, ROUND_ROBIN
+
+
+__all__ = ['AsyncContext']
+
+_END = object()
+
+
+class _Chunks(object):
+    """
+    Async iterator of the chunks\
+    written by a streaming script.\
+    The chunks are queued as the\
+    worker thread writes them
+    """
+    def __init__(self, loop):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._future = None
+
+    def _write(self, chunk):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, chunk)
+
+    def _done(self, _):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, _END)
+
+    def _start(self, future):
+        self._future = future
+        future.add_done_callback(self._done)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self._queue.get()
+
+        if chunk is _END:
+            await asyncio.wrap_future(self._future)  # Raise errors
+            raise StopAsyncIteration
+
+        return chunk
+
+
+class AsyncContext(object):
+    """
+    Run JS code without blocking the event loop.\
+    The work is handed to an :py:class:`.IsolateExecutor`,\
+    its threads own a VM and a context each, so\
+    many scripts run in parallel while the loop\
+    keeps serving I/O.
+
+    Cancelling an awaiting task cancels the work\
+    item if it was not started. Once started,\
+    the script runs to completion.
+
+    The platform must be set up.
+
+    Usage::
+
+        async with AsyncContext(4, ['./foo_bundled.js']) as actx:
+            await actx.run_script('foo.render("hola mundo");')
+
+    :param int max_workers: Number of threads
+    :param list scripts_paths: Script file paths\
+    loaded into every context,\
+    see :py:func:`.Context.load_libs`
+    :param dict vm_options: :py:class:`.VM` options
+    :param str routing: See :py:class:`.IsolateExecutor`
+    :param int max_in_flight: Max number of work items\
+    submitted at a given time, the rest wait\
+    within the loop. Default is no limit
+    """
+    def __init__(
+            self,
+            max_workers,
+            scripts_paths=(),
+            vm_options=None,
+            routing=ROUND_ROBIN,
+            max_in_flight=None):
+        assert max_in_flight is None or max_in_flight > 0
+
+        self._max_workers = max_workers
+        self._scripts_paths = list(scripts_paths)
+        self._vm_options = vm_options
+        self._routing = routing
+        self._max_in_flight = max_in_flight
+        self._semaphore = None
+        self._executor = None
+
+    async def __aenter__(self):
+        """
+        See :py:func:`set_up` method for docs
+        """
+        return await self.set_up()
+
+    async def __aexit__(self, *_, **__):
+        """
+        See :py:func:`tear_down` method for docs
+        """
+        await self.tear_down()
+
+    def is_alive(self):
+        """
+        Check is initialized and was not exited
+
+        :return: Whether the context is alive or not
+        :rtype: bool
+        """
+        return self._executor is not None
+
+    async def set_up(self):
+        """
+        Create the workers, their VMs and contexts.\
+        This is done in a thread,\
+        the loop is not blocked
+
+        :raises V8Error: if there was\
+        an error initializing the contexts
+        """
+        assert not self.is_alive()
+
+        loop = asyncio.get_event_loop()
+
+        if self._max_in_flight is not None:
+            self._semaphore = asyncio.Semaphore(self._max_in_flight)
+
+        self._executor = await loop.run_in_executor(
+            None,
+            lambda: IsolateExecutor(
+                self._max_workers,
+                self._scripts_paths,
+                vm_options=self._vm_options,
+                routing=self._routing))
+        return self
+
+    async def tear_down(self):
+        """
+        Wait for the pending work and destroy\
+        the workers. This is done in a thread,\
+        the loop is not blocked
+        """
+        assert self.is_alive()
+
+        executor = self._executor
+        self._executor = None
+        await asyncio.get_event_loop().run_in_executor(
+            None, executor.shutdown)
+
+    async def _await(self, submit):
+        if self._semaphore is None:
+            return await asyncio.wrap_future(submit())
+
+        async with self._semaphore:
+            return await asyncio.wrap_future(submit())
+
+    async def run_script(
+            self,
+            script,
+            identifier=context_module._DEFAULT_SCRIPT_NAME,
+            result=context_module.RESULT_TEXT,
+            key=None,
+            timeout=None):
+        """
+        Run a JS script within a worker,\
+        see :py:func:`.Context.run_script`
+
+        :param script: utf-8 encoded or unicode string
+        :type script: bytes or str
+        :param identifier: Name of the script
+        :type identifier: bytes or str
+        :param int result: How the result is returned
+        :param key: Route to the worker of this key,\
+        any hashable
+        :param float timeout: Terminate the execution\
+        after this many seconds
+        :return: Result of running the JS script
+        :raises V8Error: if there was\
+        an error running the JS script
+        """
+        assert self.is_alive()
+
+        return await self._await(lambda: self._executor.submit(
+            script,
+            identifier=identifier,
+            result=result,
+            key=key,
+            timeout=timeout))
+
+    def run_script_stream(
+            self,
+            script,
+            identifier=context_module._DEFAULT_SCRIPT_NAME,
+            key=None,
+            timeout=None):
+        """
+        Run a JS script within a worker,\
+        streaming its output,\
+        see :py:func:`.Context.run_script_stream`.\
+        The chunks are yielded as soon\
+        as the script writes them.\
+        This is not limited by ``max_in_flight``
+
+        Usage::
+
+            async for chunk in actx.run_script_stream(
+                    'foo.renderToStream("hola mundo", write);'):
+                response.write(chunk)
+
+        :param script: utf-8 encoded or unicode string
+        :type script: bytes or str
+        :param identifier: Name of the script
+        :type identifier: bytes or str
+        :param key: Route to the worker of this key,\
+        any hashable
+        :param float timeout: Terminate the execution\
+        after this many seconds
+        :return: Async iterator of the\
+        utf-8 encoded chunks (bytes)
+        :raises V8Error: if there was\
+        an error running the JS script,\
+        once the chunks written\
+        before the error are consumed
+        """
+        assert self.is_alive()
+
+        chunks = _Chunks(asyncio.get_event_loop())
+        chunks._start(self._executor.submit_stream(
+            script,
+            chunks._write,
+            identifier=identifier,
+            key=key,
+            timeout=timeout))
+        return chunks
+
+    async def call(self, name, *args, key=None, timeout=None):
+        """
+        Call a JS function within a worker,\
+        see :py:func:`.IsolateExecutor.submit_call`
+
+        :param name: Dotted name of the function\
+        (ie: ``foo.render``)
+        :type name: bytes or str
+        :param args: JSON serializable arguments
+        :param key: Route to the worker of this key,\
+        any hashable
+        :param float timeout: Terminate the execution\
+        after this many seconds
+        :return: Result of calling the JS\
+        function, as Python objects
+        :raises V8Error: if there was\
+        an error calling the JS function
+        """
+        assert self.is_alive()
+
+        return await self._await(lambda: self._executor.submit_call(
+            name, args, key=key, timeout=timeout))
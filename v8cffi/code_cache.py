@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import os
+import struct
+import hashlib
+import tempfile
+
+from _v8 import lib
+
+
+__all__ = [
+    'PRODUCED',
+    'ACCEPTED',
+    'REJECTED',
+    'cache_path_for',
+    'cache_key',
+    'load',
+    'store',
+    'discard']
+
+
+PRODUCED = 'produced'
+ACCEPTED = 'accepted'
+REJECTED = 'rejected'
+
+_CACHE_EXT = '.v8cache'
+_KEY_LEN = 40  # sha1 hex digest
+
+
+def cache_path_for(script_path):
+    """
+    Return the path of the code cache\
+    for a given script. The cache is\
+    stored next to the script
+
+    :param str script_path: Script file path
+    :return: Code cache file path
+    :rtype: str
+    """
+    return script_path + _CACHE_EXT
+
+
+def cache_key(script):
+    """
+    Return a key identifying a script\
+    source compiled by the current V8 version.\
+    A code cache is only valid for the same key
+
+    :param bytes script: utf-8 encoded script
+    :return: Hex digest of the source and V8 version
+    :rtype: bytes
+    """
+    version_tag = struct.pack('<I', lib.v8cffi_cached_data_version_tag())
+    return (hashlib
+        .sha1(version_tag + script)
+        .hexdigest()
+        .encode('ascii'))
+
+
+def load(path, key):
+    """
+    Read a code cache from disk
+
+    :param str path: Code cache file path
+    :param bytes key: See :py:func:`cache_key`
+    :return: The code cache or an empty string\
+    if it does not exist or it does not\
+    match the key
+    :rtype: bytes
+    """
+    try:
+        with open(path, 'rb') as fh:
+            data = fh.read()
+    except (IOError, OSError):
+        return b''
+
+    if data[:_KEY_LEN] != key:
+        return b''
+
+    return data[_KEY_LEN:]
+
+
+def store(path, key, data):
+    """
+    Write a code cache to disk.\
+    The file is replaced atomically,\
+    so concurrent readers never see\
+    a partial cache
+
+    :param str path: Code cache file path
+    :param bytes key: See :py:func:`cache_key`
+    :param bytes data: The code cache
+    :raises OSError: If there was an error\
+    writing the file
+    """
+    assert len(key) == _KEY_LEN
+
+    # Unique per call, threads may store the same cache
+    fd, tmp_path = tempfile.mkstemp(
+        prefix='.v8cache-', dir=os.path.dirname(path) or '.')
+
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(key)
+            fh.write(data)
+
+        os.rename(tmp_path, path)
+    except Exception:
+        discard(tmp_path)
+        raise
+
+
+def discard(path):
+    """
+    Remove a code cache from disk,\
+    if it exists
+
+    :param str path: Code cache file path
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,17 +1,43 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import unicode_literals
+import sys
+import json
+import itertools
 
 import six
 
 from _v8 import ffi, lib
 
 from . import exceptions
+from . import code_cache as _code_cache
+from . import timing as _timing
 
 
-__all__ = ['Context']
+__all__ = [
+    'Context',
+    'Script',
+    'Function',
+    'OutputBuffer',
+    'RESULT_TEXT',
+    'RESULT_PYTHON',
+    'RESULT_DISCARD']
 
 _DEFAULT_SCRIPT_NAME = '<anonymous>'
+_OUTPUT_BUFFER_SIZE = 64 * 1024
+_PIN_MIN_SIZE = 64 * 1024
+_PROFILE_IDS = itertools.count()
+
+#: Return the result as string (JS ``String(result)``)
+RESULT_TEXT = lib.V8_RESULT_TEXT
+#: Return the result converted into Python
+#: ``int``, ``float``, ``bool``, ``None``, ``str``,
+#: ``list`` and ``dict``. The result is serialized
+#: as JSON by V8 and parsed by ``json.loads``,
+#: so the JSON semantics apply (i.e: ``-0`` is ``0``)
+RESULT_PYTHON = lib.V8_RESULT_JSON
+#: Skip the result conversion and return ``None``
+RESULT_DISCARD = lib.V8_RESULT_DISCARD
 
 
 def _read_file(path):
@@ -38,6 +64,242 @@ def _is_utf_8(txt):
         return True
 
 
+def _to_utf_8(txt):
+    """
+    Encode unicode strings
+
+    :param txt: utf-8 encoded or unicode string
+    :type txt: bytes or str
+    :return: utf-8 encoded string
+    :rtype: bytes
+    """
+    assert isinstance(txt, six.text_type) or _is_utf_8(txt)
+
+    if isinstance(txt, six.text_type):
+        return txt.encode('utf-8')
+
+    return txt
+
+
+def _to_timeout_ms(timeout):
+    """
+    Convert a timeout into milliseconds
+
+    :param float timeout: Timeout in seconds or ``None``
+    :return: Timeout in milliseconds, 0 for no timeout
+    :rtype: int
+    """
+    if timeout is None:
+        return 0
+
+    assert timeout > 0
+
+    return max(1, int(timeout * 1000))
+
+
+def _to_result(output, result):
+    """
+    Convert the C result as requested
+
+    :param output: C result
+    :type output: :py:class:`_String`
+    :param int result: The result type
+    :return: The converted result
+    """
+    # RESULT_PYTHON is a JSON round trip: the C side
+    # serializes the value through JSON.stringify
+    # and it gets parsed here. Building the Python
+    # objects natively would require the C side to
+    # know about Python, this is a deliberate trade-off
+    if result == RESULT_PYTHON:
+        return json.loads(six.text_type(output))
+
+    if result == RESULT_DISCARD:
+        return None
+
+    return six.text_type(output)
+
+
+def _to_error(vm, code, error):
+    """
+    Create the exception of a failed call.\
+    JS errors keep the VM to format\
+    their stack when it's accessed
+
+    :param vm: The VM the error was raised within
+    :type vm: :py:class:`.VM`
+    :param int code: Status code
+    :param error: Error message or details
+    :type error: :py:class:`_String` or str
+    :rtype: :py:class:`.V8Error`
+    """
+    err = exceptions.get_exception(code)(six.text_type(error))
+
+    if isinstance(err, exceptions.V8JSError):
+        err._vm = vm
+
+    return err
+
+
+# Pinned inputs referenced by V8, by handle address
+_pinned = {}
+
+
+def _address(handle):
+    return int(ffi.cast('uintptr_t', handle))
+
+
+@ffi.def_extern()
+def v8cffi_py_release_input(handle):
+    """
+    Called once V8 is done with a pinned input
+
+    :param handle: See :py:func:`_pin_input`
+    """
+    _pinned.pop(_address(handle), None)
+
+
+lib.v8cffi_set_release_input(lib.v8cffi_py_release_input)
+
+
+class _Stream(object):
+    """
+    State of a streaming script
+
+    :ivar write: Chunks callback
+    :ivar exc_info: Error raised\
+    by the callback, if any
+    """
+    def __init__(self, write):
+        self.write = write
+        self.exc_info = None
+
+
+@ffi.def_extern(error=1)
+def v8cffi_py_write(data, chunk, chunk_len):
+    """
+    Called with every chunk a\
+    streaming script writes
+
+    :param data: Handle of the :py:class:`_Stream`
+    :return: 0 on success, 1 to abort the script
+    :rtype: int
+    """
+    stream = ffi.from_handle(data)
+
+    try:
+        stream.write(ffi.buffer(chunk, chunk_len)[:])
+    except BaseException:
+        stream.exc_info = sys.exc_info()
+        return 1
+
+    return 0
+
+
+class _Callback(object):
+    """
+    Python function exposed to JS
+
+    :ivar func: The function
+    :ivar result: Result of the last\
+    call, it must outlive the call
+    """
+    def __init__(self, func):
+        self.func = func
+        self.result = b''
+
+
+@ffi.def_extern(error=1)
+def v8cffi_py_callback(
+        data, args_json, args_json_len, result, result_len, result_type):
+    """
+    Called with the JSON arguments\
+    every time JS calls the function.\
+    Strings are returned as text\
+    and ``None`` as ``null``, skipping\
+    the JSON serialization
+
+    :param data: Handle of the :py:class:`_Callback`
+    :return: 0 on success, 1 to throw\
+    the result as a JS error
+    :rtype: int
+    """
+    callback = ffi.from_handle(data)
+    code = 0
+
+    try:
+        args = ()
+
+        if args_json_len > len(b'[]'):
+            args = json.loads(
+                ffi.buffer(args_json, args_json_len)[:].decode('utf-8'))
+
+        value = callback.func(*args)
+
+        if isinstance(value, six.string_types):
+            callback.result = _to_utf_8(value)
+            result_type[0] = RESULT_TEXT
+        elif value is None:
+            callback.result = b'null'
+            result_type[0] = RESULT_PYTHON
+        else:
+            callback.result = _to_utf_8(json.dumps(value))
+            result_type[0] = RESULT_PYTHON
+    except Exception as err:
+        callback.result = _to_utf_8(
+            '%s: %s' % (type(err).__name__, six.text_type(err)))
+        code = 1
+
+    result[0] = ffi.from_buffer(callback.result)
+    result_len[0] = len(callback.result)
+    return code
+
+
+def _pin_input(data):
+    """
+    Pin big inputs, so V8 can reference\
+    them without a copy. ASCII inputs\
+    become external strings, the rest\
+    gets copied anyway. The pin is\
+    released by V8 once it's done\
+    with the buffer, which may be\
+    after the call returns (ie: a script\
+    source is kept for lazy compilation)
+
+    :param bytes data: utf-8 encoded input
+    :return: The data to pass to C and its pin\
+    or :py:data:`cffi.NULL` for small inputs
+    :rtype: tuple
+    """
+    if len(data) < _PIN_MIN_SIZE:
+        return data, ffi.NULL
+
+    c_data = ffi.from_buffer(data)
+    handle = ffi.new_handle(c_data)
+    _pinned[_address(handle)] = handle
+    return c_data, handle
+
+
+def _store_code_cache(path, key, data):
+    """
+    Store the code cache, failing to\
+    do so is not an error since the cache\
+    is an optimization. The script\
+    gets compiled again next time
+
+    :param str path: Code cache file path
+    :param bytes key: Code cache key
+    :param bytes data: Code cache
+    """
+    if not data:
+        return
+
+    try:
+        _code_cache.store(path, key, data)
+    except (IOError, OSError):
+        pass
+
+
 @six.python_2_unicode_compatible
 class _String(object):
     """
@@ -95,9 +357,135 @@ class _String(object):
         :return: Representation of the string, utf-8 encoded
         :rtype: bytes
         """
+        if self.string_ptr[0] == ffi.NULL:
+            return b''
+
         return ffi.buffer(self.string_ptr[0], self.len_ptr[0])[:]
 
 
+class OutputBuffer(object):
+    """
+    A reusable buffer the JS results\
+    get written into. V8 writes the utf-8\
+    result straight into it, skipping\
+    the allocation and the copies a regular\
+    call does. It grows to fit the largest\
+    result seen so far.
+
+    It's not thread-safe, use one\
+    per thread. The result is only valid\
+    until the next call writing into the buffer
+
+    Usage::
+
+        output = OutputBuffer()
+        view = ctx.run_script_into('render()', output)
+        response.write(view)
+
+    :param int size: Initial size in bytes
+    """
+    def __init__(self, size=_OUTPUT_BUFFER_SIZE):
+        assert size > 0
+
+        self._buffer = bytearray(size)
+        self._c_buffer = ffi.from_buffer(self._buffer)
+        self._length = 0
+        self._c_overflow = ffi.new('char **')
+        self._c_length = ffi.new('size_t *', 0)
+        self._c_error = ffi.new('char **')
+        self._c_error_len = ffi.new('size_t *', 0)
+
+    def __len__(self):
+        """
+        :return: Length of the last result
+        :rtype: int
+        """
+        return self._length
+
+    def capacity(self):
+        """
+        :return: Size of the buffer
+        :rtype: int
+        """
+        return len(self._buffer)
+
+    def view(self):
+        """
+        :return: The last result, utf-8 encoded.\
+        It's not a copy, the next call\
+        writing into the buffer overwrites it
+        :rtype: memoryview
+        """
+        return memoryview(self._buffer)[:self._length]
+
+    def to_bytes(self):
+        """
+        :return: A copy of the last result, utf-8 encoded
+        :rtype: bytes
+        """
+        return bytes(self._buffer[:self._length])
+
+    def _grow(self, size):
+        """
+        Replace the buffer by a bigger one.\
+        The old one is kept alive by any view into it
+        """
+        self._buffer = bytearray(max(size, len(self._buffer) * 2))
+        self._c_buffer = ffi.from_buffer(self._buffer)
+
+    def _write(self, vm, c_func, *args):
+        """
+        @Private
+        Call a C function writing into the buffer.\
+        A result that does not fit is returned\
+        as overflow, it gets copied into a buffer\
+        big enough for next calls
+
+        :param c_func: C ``*_into`` function
+        :param args: Arguments before the buffer ones
+        :return: The result
+        :rtype: memoryview
+        :raises V8Error: if there was\
+        an error running the JS code
+        """
+        self._length = 0
+        self._c_overflow[0] = ffi.NULL
+        self._c_error[0] = ffi.NULL
+        self._c_error_len[0] = 0
+
+        code = c_func(*(args + (
+            self._c_buffer,
+            len(self._buffer),
+            self._c_overflow,
+            self._c_length,
+            self._c_error,
+            self._c_error_len)))
+
+        try:
+            if code != lib.E_V8_OK:
+                error = b''
+
+                if self._c_error[0] != ffi.NULL:
+                    error = ffi.buffer(
+                        self._c_error[0], self._c_error_len[0])[:]
+
+                raise _to_error(vm, code, six.text_type(error, 'utf-8'))
+
+            length = self._c_length[0]
+
+            if self._c_overflow[0] != ffi.NULL:
+                self._grow(length)
+                self._buffer[:length] = ffi.buffer(
+                    self._c_overflow[0], length)
+
+            self._length = length
+        finally:
+            lib.v8cffi_free(self._c_error[0])
+            lib.v8cffi_free(self._c_overflow[0])
+
+        return self.view()
+
+
 class Context(object):
     """
     An execution environment that allows\
@@ -116,6 +504,8 @@ class Context(object):
     def __init__(self, vm):
         self._vm = vm
         self._c_context = None
+        self._profiles = set()
+        self._callbacks = []
 
     def __enter__(self):
         """
@@ -124,6 +514,7 @@ class Context(object):
         assert self._c_context is None
         assert self._vm.is_alive()
 
+        self._callbacks = []
         self._c_context = ffi.new('v8cffi_context_t **')
         self._c_context[0] = ffi.NULL
         code = lib.v8cffi_context_new(self._c_context, self._vm.get_c_vm()[0])
@@ -142,6 +533,26 @@ class Context(object):
 
         lib.v8cffi_context_free(self._c_context[0])
         self._c_context = None
+        self._callbacks = []
+
+    def is_alive(self):
+        """
+        Check the context is initialized and was not exited
+
+        :return: Whether the context is alive or not
+        :rtype: bool
+        """
+        return self._c_context is not None
+
+    def get_c_context(self):
+        """
+        @Private
+        Return the underlying C context
+
+        :return: struct cdata
+        :rtype: :py:class:`ffi.CData<struct **>`
+        """
+        return self._c_context
 
     def set_up(self):
         """
@@ -165,26 +576,189 @@ class Context(object):
         """
         return self.__exit__()
 
-    def load_libs(self, scripts_paths):
+    def load_libs(self, scripts_paths, code_cache=False):
         """
         Load script files into the context.\
         This can be thought as the HTML script tag.\
         The files content must be utf-8 encoded.
 
-        This is a shortcut for reading the files\
-        and pass the content to :py:func:`run_script`
+        The scripts are ran in order and kept\
+        compiled within the context,\
+        so :py:func:`reset` can run them again
+
+        When ``code_cache`` is enabled,\
+        the compiled code of every script\
+        is stored next to it (``<path>.v8cache``)\
+        and reused by later calls,\
+        see :py:func:`run_script_cached`
 
         :param list scripts_paths: Script file paths.
+        :param bool code_cache: Whether to produce\
+        and consume a code cache stored on disk
+        :return: The code cache status\
+        of every script, if ``code_cache``\
+        is enabled
+        :rtype: list or None
         :raises OSError: If there was an error\
         manipulating the files. This should not\
         normally be caught
         :raises V8Error: if there was\
         an error running the JS script
         """
-        for path in scripts_paths:
-            self.run_script(_read_file(path), identifier=path)
+        assert self.is_alive()
+
+        statuses = [
+            self._load_lib(path, _read_file(path), code_cache)
+            for path in scripts_paths]
+
+        if not code_cache:
+            return None
+
+        return statuses
+
+    def _load_lib(self, path, script, code_cache):
+        """
+        Run the lib and keep it compiled\
+        within the context, to run it again\
+        on :py:func:`reset`
+
+        :return: The code cache status, if ``code_cache``
+        """
+        script = _to_utf_8(script)
+        identifier = _to_utf_8(path)
+        cache = b''
+        cache_path = None
+        key = None
 
-    def run_script(self, script, identifier=_DEFAULT_SCRIPT_NAME):
+        if code_cache:
+            cache_path = _code_cache.cache_path_for(path)
+            key = _code_cache.cache_key(script)
+            cache = _code_cache.load(cache_path, key)
+
+        cache_rejected = ffi.new('int *', 0)
+
+        with _String() as cache_output:
+            with _String() as error:
+                code = lib.v8cffi_context_load_lib(
+                    self._c_context[0],
+                    script,
+                    len(script),
+                    identifier,
+                    len(identifier),
+                    int(code_cache),
+                    cache,
+                    len(cache),
+                    cache_output.string_ptr,
+                    cache_output.len_ptr,
+                    cache_rejected,
+                    error.string_ptr,
+                    error.len_ptr)
+
+                if code != lib.E_V8_OK:
+                    raise _to_error(self._vm, code, error)
+
+            if not code_cache:
+                return None
+
+            if cache_rejected[0]:
+                _code_cache.discard(cache_path)
+                return _code_cache.REJECTED
+
+            if cache:
+                return _code_cache.ACCEPTED
+
+            _store_code_cache(cache_path, key, cache_output.to_bytes())
+            return _code_cache.PRODUCED
+
+    def reset(self):
+        """
+        Discard the global scope and\
+        create a new one, then run the\
+        scripts loaded through :py:func:`load_libs`\
+        again. This isolates requests from each\
+        other without tearing down the context.
+
+        The new global scope is created from\
+        the VM's startup snapshot, the functions\
+        added through :py:func:`add_function`\
+        are set again and the libs are ran again,\
+        within V8. The libs are kept compiled,\
+        so only parsing is saved, their top level\
+        code runs on every reset. Baking the\
+        libs into a custom snapshot\
+        (see :py:func:`.snapshot.create`)\
+        skips running them.
+
+        Scripts and functions created\
+        before the reset are stale, running\
+        them raises :py:class:`.V8StaleError`.\
+        It waits for running scripts to finish
+
+        :raises V8MemoryError: if there\
+        is no memory for allocating it
+        :raises V8Error: if there was\
+        an error running the libs,\
+        the current global scope is kept then
+        """
+        assert self.is_alive()
+
+        with _String() as error:
+            code = lib.v8cffi_context_reset(
+                self._c_context[0],
+                error.string_ptr,
+                error.len_ptr)
+
+            if code != lib.E_V8_OK:
+                raise _to_error(self._vm, code, error)
+
+    def add_function(self, name, func):
+        """
+        Expose a Python function to JS\
+        as the global ``name``. The arguments\
+        and the result are converted following\
+        the JSON semantics (like ``RESULT_PYTHON``),\
+        returning ``None`` results in ``null``.\
+        Strings are returned without conversion.
+
+        The function is called within the\
+        thread running the script, so it\
+        should be quick. Errors raised\
+        by it are thrown as JS errors.\
+        The function is kept on :py:func:`reset`
+
+        :param name: Name of the JS function
+        :type name: bytes or str
+        :param callable func: Python function
+        :raises V8MemoryError: if there\
+        is no memory for allocating it
+        """
+        assert self.is_alive()
+
+        name = _to_utf_8(name)
+        callback_handle = ffi.new_handle(_Callback(func))
+
+        with _String() as error:
+            code = lib.v8cffi_context_add_function(
+                self._c_context[0],
+                name,
+                len(name),
+                lib.v8cffi_py_callback,
+                callback_handle,
+                error.string_ptr,
+                error.len_ptr)
+
+            if code != lib.E_V8_OK:
+                raise _to_error(self._vm, code, error)
+
+        # The handle must outlive the context
+        self._callbacks.append(callback_handle)
+
+    def run_script(
+            self,
+            script,
+            identifier=_DEFAULT_SCRIPT_NAME,
+            result=RESULT_TEXT,
+            timeout=None):
         """
         Run a JS script within the context.\
         All code is ran synchronously,\
@@ -196,34 +770,858 @@ class Context(object):
         This is used as the name of the script\
         (ie: in stack-traces)
         :type identifier: bytes or str
+        :param int result: How the result is returned,\
+        one of :py:data:`RESULT_TEXT`,\
+        :py:data:`RESULT_PYTHON` or\
+        :py:data:`RESULT_DISCARD`
+        :param float timeout: Terminate the\
+        execution after this many seconds.\
+        The context remains usable afterwards
         :return: Result of running the JS script
-        :rtype: str
+        :rtype: str or as ``result`` says
+        :raises V8TimeoutError: if the\
+        execution timed out
         :raises V8Error: if there was\
         an error running the JS script
         """
-        assert isinstance(script, six.text_type) or _is_utf_8(script)
-        assert isinstance(identifier, six.text_type) or _is_utf_8(identifier)
-
-        if isinstance(script, six.text_type):
-            script = script.encode('utf-8')
-
-        if isinstance(identifier, six.text_type):
-            identifier = identifier.encode('utf-8')
+        script = _to_utf_8(script)
+        identifier = _to_utf_8(identifier)
+        script_data, script_pin = _pin_input(script)
 
         with _String() as output:
             with _String() as error:
                 code = lib.v8cffi_run_script(
                     self._c_context[0],
-                    script,
+                    script_data,
                     len(script),
+                    script_pin,
                     identifier,
                     len(identifier),
+                    result,
+                    _to_timeout_ms(timeout),
                     output.string_ptr,
                     output.len_ptr,
                     error.string_ptr,
                     error.len_ptr)
 
                 if code != lib.E_V8_OK:
-                    raise exceptions.get_exception(code)(six.text_type(error))
+                    raise _to_error(self._vm, code, error)
+
+                return _to_result(output, result)
+
+    def run_batch(
+            self,
+            items,
+            identifier=_DEFAULT_SCRIPT_NAME,
+            result=RESULT_TEXT,
+            timeout=None):
+        """
+        Run many scripts and function calls\
+        back to back, entering the context once.\
+        This is cheaper than running them one\
+        by one when they are small.
+
+        An item failing does not stop the batch,\
+        its error is returned in place of the\
+        result instead of being raised.
+
+        Usage::
+
+            render = ctx.get_function('foo.render')
+            ctx.run_batch([
+                'var bar = "bar";',
+                (render, ['hola mundo']),
+                (render, ['bar'])])
+            # ['undefined', '<p>hola mundo</p>', '<p>bar</p>']
+
+        :param list items: Scripts (bytes or str)\
+        and ``(function, args)`` tuples, where\
+        the :py:class:`Function` belongs to this\
+        context and ``args`` is a list of\
+        JSON serializable arguments. The calls\
+        follow the function's ``result``\
+        and ``timeout``
+        :param identifier: utf-8 encoded or unicode string.\
+        This is used as the name of the scripts\
+        (ie: in stack-traces)
+        :type identifier: bytes or str
+        :param int result: The result type\
+        of the scripts, see :py:func:`run_script`
+        :param float timeout: Terminate the\
+        execution of a script after this many seconds
+        :return: The result of every item or\
+        the :py:class:`.V8Error` it failed with
+        :rtype: list
+        :raises TypeError: if the arguments\
+        are not JSON serializable
+        :raises V8MemoryError: if there\
+        is no memory for allocating it
+        """
+        assert self.is_alive()
+
+        identifier = ffi.from_buffer(_to_utf_8(identifier))
+        timeout_ms = _to_timeout_ms(timeout)
+        c_items = ffi.new('v8cffi_batch_item_t[]', len(items))
+        c_results = ffi.new('v8cffi_batch_result_t[]', len(items))
+        results_types = []
+        inputs = []  # Must outlive the batch
+
+        for c_item, item in zip(c_items, items):
+            if isinstance(item, tuple):
+                function, args = item
+                assert function.is_alive()
+                assert function._context is self  # no-qa
+
+                inputs.append(ffi.from_buffer(_to_utf_8(
+                    json.dumps(args, separators=(',', ':')))))
+                c_item.function = function._c_function[0]  # no-qa
+                c_item.result_type = function._result  # no-qa
+                c_item.timeout_ms = function._timeout_ms  # no-qa
+            else:
+                inputs.append(ffi.from_buffer(_to_utf_8(item)))
+                c_item.identifier = identifier
+                c_item.identifier_len = len(identifier)
+                c_item.result_type = result
+                c_item.timeout_ms = timeout_ms
+
+            c_item.input = inputs[-1]
+            c_item.input_len = len(inputs[-1])
+            results_types.append(c_item.result_type)
+
+        with _String() as error:
+            code = lib.v8cffi_run_batch(
+                self._c_context[0],
+                c_items,
+                len(items),
+                c_results,
+                error.string_ptr,
+                error.len_ptr)
+
+            if code != lib.E_V8_OK:
+                raise _to_error(self._vm, code, error)
+
+        results = []
+
+        try:
+            for c_result, result_type in zip(c_results, results_types):
+                output = ''
+
+                if c_result.output != ffi.NULL:
+                    output = six.text_type(
+                        ffi.buffer(c_result.output, c_result.output_len)[:],
+                        'utf-8')
+
+                if c_result.code != lib.E_V8_OK:
+                    results.append(
+                        _to_error(self._vm, c_result.code, output))
+                    continue
+
+                results.append(_to_result(output, result_type))
+        finally:
+            for c_result in c_results:
+                lib.v8cffi_free(c_result.output)
+
+        return results
+
+    def run_script_stream(
+            self,
+            script,
+            write,
+            identifier=_DEFAULT_SCRIPT_NAME,
+            timeout=None,
+            write_name='write'):
+        """
+        Run a JS script within the context,\
+        streaming its output. The script calls\
+        a native ``write(chunk)`` function and\
+        every chunk is passed to the ``write``\
+        callback as soon as it's produced,\
+        instead of building the whole result.
+
+        The native function is set as\
+        the global ``write_name`` while\
+        the script runs, the global is\
+        restored afterwards. Non-string chunks\
+        are converted into strings. The result\
+        of the script is discarded.
+
+        The callback is called within the\
+        calling thread. Raising from it\
+        aborts the script and the error\
+        is raised by this method
+
+        :param script: utf-8 encoded or unicode string
+        :type script: bytes or str
+        :param write: Callback receiving\
+        the utf-8 encoded chunks (bytes)
+        :type write: callable
+        :param identifier: utf-8 encoded or unicode string.\
+        This is used as the name of the script\
+        (ie: in stack-traces)
+        :type identifier: bytes or str
+        :param float timeout: Terminate the\
+        execution after this many seconds
+        :param write_name: Name of the JS function
+        :type write_name: bytes or str
+        :raises V8TimeoutError: if the\
+        execution timed out
+        :raises V8Error: if there was\
+        an error running the JS script
+        """
+        script = _to_utf_8(script)
+        identifier = _to_utf_8(identifier)
+        write_name = _to_utf_8(write_name)
+        script_data, script_pin = _pin_input(script)
+        stream = _Stream(write)
+        stream_handle = ffi.new_handle(stream)
+
+        with _String() as error:
+            code = lib.v8cffi_run_script_stream(
+                self._c_context[0],
+                script_data,
+                len(script),
+                script_pin,
+                identifier,
+                len(identifier),
+                write_name,
+                len(write_name),
+                lib.v8cffi_py_write,
+                stream_handle,
+                _to_timeout_ms(timeout),
+                error.string_ptr,
+                error.len_ptr)
+
+            if stream.exc_info is not None:
+                six.reraise(*stream.exc_info)
+
+            if code != lib.E_V8_OK:
+                raise _to_error(self._vm, code, error)
+
+    def run_script_into(
+            self,
+            script,
+            output,
+            identifier=_DEFAULT_SCRIPT_NAME,
+            result=RESULT_TEXT,
+            timeout=None):
+        """
+        Run a JS script within the context,\
+        same as :py:func:`run_script`\
+        but the result is written into\
+        a reusable buffer. This is faster\
+        for big results (ie: rendering HTML)
+
+        :param script: utf-8 encoded or unicode string
+        :type script: bytes or str
+        :param output: Buffer to write the result into
+        :type output: :py:class:`.OutputBuffer`
+        :param identifier: utf-8 encoded or unicode string.\
+        This is used as the name of the script\
+        (ie: in stack-traces)
+        :type identifier: bytes or str
+        :param int result: How the result is written,\
+        :py:data:`RESULT_TEXT` writes the string,\
+        :py:data:`RESULT_PYTHON` writes it as JSON and\
+        :py:data:`RESULT_DISCARD` writes nothing
+        :param float timeout: See :py:func:`run_script`
+        :return: View of the result within\
+        the buffer, utf-8 encoded. It's valid\
+        until the buffer gets written again
+        :rtype: memoryview
+        :raises V8Error: if there was\
+        an error running the JS script
+        """
+        script = _to_utf_8(script)
+        identifier = _to_utf_8(identifier)
+        script_data, script_pin = _pin_input(script)
+
+        return output._write(
+            self._vm,
+            lib.v8cffi_run_script_into,
+            self._c_context[0],
+            script_data,
+            len(script),
+            script_pin,
+            identifier,
+            len(identifier),
+            result,
+            _to_timeout_ms(timeout))
+
+    def compile(self, script, identifier=_DEFAULT_SCRIPT_NAME):
+        """
+        Compile a JS script within the context.\
+        The returned :py:class:`.Script`\
+        can be ran many times, skipping\
+        the parsing and compiling.
+
+        Remember to call :py:func:`Script.tear_down`\
+        before tearing down the context
+
+        :param script: utf-8 encoded or unicode string
+        :type script: bytes or str
+        :param identifier: utf-8 encoded or unicode string.\
+        This is used as the name of the script\
+        (ie: in stack-traces)
+        :type identifier: bytes or str
+        :return: Compiled script
+        :rtype: :py:class:`.Script`
+        :raises V8JSError: if there was\
+        an error compiling the JS script
+        """
+        return Script(self, script, identifier=identifier).set_up()
+
+    def get_function(self, name, result=RESULT_TEXT, timeout=None):
+        """
+        Lookup a JS function within the context.\
+        The returned :py:class:`.Function`\
+        can be called many times, without\
+        building, parsing and compiling a script\
+        for every call.
+
+        Remember to call :py:func:`Function.tear_down`\
+        before tearing down the context
+
+        :param name: Dotted name of the function\
+        (ie: ``foo.render``), utf-8 encoded or unicode string
+        :type name: bytes or str
+        :param int result: How the result of\
+        calling the function is returned,\
+        see :py:func:`run_script`
+        :param float timeout: Timeout of every call,\
+        see :py:func:`run_script`
+        :return: JS function
+        :rtype: :py:class:`.Function`
+        :raises V8JSError: if the function\
+        was not found
+        """
+        return Function(
+            self, name, result=result, timeout=timeout).set_up()
+
+    def set_timing(self, is_enabled):
+        """
+        Instrument the calls ran within\
+        the context (including its scripts\
+        and functions), see :py:func:`.timing.set_enabled`
+
+        :param bool is_enabled: Whether to\
+        instrument the calls or not
+        """
+        assert self.is_alive()
+
+        lib.v8cffi_context_set_timing(
+            self._c_context[0], 1 if is_enabled else 0)
+
+    def counters(self):
+        """
+        Return the cumulative counters\
+        of the instrumented calls ran\
+        within the context,\
+        see :py:func:`.timing.counters`
+
+        :return: The counters
+        :rtype: dict
+        """
+        assert self.is_alive()
+
+        c_counters = ffi.new('v8cffi_counters_t *')
+        lib.v8cffi_context_counters(self._c_context[0], c_counters)
+        return _timing._to_counters(c_counters)  # no-qa
+
+    def start_profiling(self, name, sampling_interval_us=None):
+        """
+        Start collecting a CPU profile.\
+        The profiler is shared by all\
+        contexts within the VM, so the profile\
+        includes all of them and the name must\
+        be unique within the VM
+
+        :param name: utf-8 encoded or unicode string
+        :type name: bytes or str
+        :param int sampling_interval_us: Microseconds\
+        between samples, default is V8's (1000).\
+        It can't be changed while another\
+        profile is being collected
+        """
+        assert self.is_alive()
+        assert name not in self._profiles
+        assert sampling_interval_us is None or sampling_interval_us > 0
+
+        title = _to_utf_8(name)
+
+        with _String() as error:
+            code = lib.v8cffi_context_start_profiling(
+                self._c_context[0],
+                title,
+                len(title),
+                sampling_interval_us or 0,
+                error.string_ptr,
+                error.len_ptr)
+
+            if code != lib.E_V8_OK:
+                raise _to_error(self._vm, code, error)
+
+        self._profiles.add(name)
+
+    def stop_profiling(self, name, path=None):
+        """
+        Stop collecting a CPU profile.\
+        The profile is in the Chrome DevTools'\
+        ``.cpuprofile`` format, it can be loaded\
+        in the Performance (or JavaScript Profiler) tab
+
+        :param name: Name passed to :py:func:`start_profiling`
+        :type name: bytes or str
+        :param str path: Write the profile into this file
+        :return: The profile (JSON)
+        :rtype: str
+        :raises OSError: If there was an error\
+        writing the file
+        """
+        assert self.is_alive()
+        assert name in self._profiles
+
+        self._profiles.remove(name)
+        title = _to_utf_8(name)
+
+        with _String() as output:
+            with _String() as error:
+                code = lib.v8cffi_context_stop_profiling(
+                    self._c_context[0],
+                    title,
+                    len(title),
+                    output.string_ptr,
+                    output.len_ptr,
+                    error.string_ptr,
+                    error.len_ptr)
+
+                if code != lib.E_V8_OK:
+                    raise _to_error(self._vm, code, error)
+
+            profile = output.to_bytes()
+
+        if path is not None:
+            with open(path, 'wb') as fh:
+                fh.write(profile)
+
+        return profile.decode('utf-8')
+
+    def run_script_profiled(
+            self,
+            script,
+            profile_path,
+            identifier=_DEFAULT_SCRIPT_NAME,
+            result=RESULT_TEXT,
+            timeout=None,
+            sampling_interval_us=None):
+        """
+        Run a JS script within the context\
+        while collecting a CPU profile\
+        written into ``profile_path``.\
+        See :py:func:`run_script`\
+        and :py:func:`stop_profiling`
+
+        :param str profile_path: ``.cpuprofile`` file path
+        :param int sampling_interval_us: Microseconds\
+        between samples
+        :return: Result of running the JS script
+        :rtype: str or as ``result`` says
+        :raises V8Error: if there was\
+        an error running the JS script.\
+        The profile is written anyway
+        """
+        name = 'run_script_profiled-%d' % next(_PROFILE_IDS)
+        self.start_profiling(name, sampling_interval_us)
+
+        try:
+            return self.run_script(
+                script,
+                identifier=identifier,
+                result=result,
+                timeout=timeout)
+        finally:
+            self.stop_profiling(name, path=profile_path)
+
+    def run_script_cached(
+            self,
+            script,
+            cache_path,
+            identifier=_DEFAULT_SCRIPT_NAME):
+        """
+        Run a JS script within the context,\
+        same as :py:func:`run_script`\
+        but the compiled code is cached on disk.
+
+        The first call produces the cache\
+        and stores it in ``cache_path``, later\
+        calls consume it and skip most of the\
+        parsing and compiling. The cache is keyed\
+        by the script source and the V8 version,\
+        a stale or rejected cache gets discarded
+
+        :param script: utf-8 encoded or unicode string
+        :type script: bytes or str
+        :param str cache_path: Code cache file path
+        :param identifier: utf-8 encoded or unicode string.\
+        This is used as the name of the script\
+        (ie: in stack-traces)
+        :type identifier: bytes or str
+        :return: Result of running the JS script\
+        and the code cache status, one of\
+        :py:data:`.code_cache.PRODUCED`,\
+        :py:data:`.code_cache.ACCEPTED` or\
+        :py:data:`.code_cache.REJECTED`
+        :rtype: tuple
+        :raises V8Error: if there was\
+        an error running the JS script
+        """
+        script = _to_utf_8(script)
+        identifier = _to_utf_8(identifier)
+
+        key = _code_cache.cache_key(script)
+        cache = _code_cache.load(cache_path, key)
+        cache_rejected = ffi.new('int *', 0)
+
+        with _String() as output:
+            with _String() as cache_output:
+                with _String() as error:
+                    code = lib.v8cffi_run_script_cached(
+                        self._c_context[0],
+                        script,
+                        len(script),
+                        identifier,
+                        len(identifier),
+                        cache,
+                        len(cache),
+                        output.string_ptr,
+                        output.len_ptr,
+                        cache_output.string_ptr,
+                        cache_output.len_ptr,
+                        cache_rejected,
+                        error.string_ptr,
+                        error.len_ptr)
+
+                    if code != lib.E_V8_OK:
+                        raise _to_error(self._vm, code, error)
+
+                if cache_rejected[0]:
+                    _code_cache.discard(cache_path)
+                    status = _code_cache.REJECTED
+                elif cache:
+                    status = _code_cache.ACCEPTED
+                else:
+                    _store_code_cache(cache_path, key, cache_output.to_bytes())
+                    status = _code_cache.PRODUCED
+
+                return six.text_type(output), status
+
+
+class Script(object):
+    """
+    A JS script compiled once within\
+    a context. It may be ran many times,\
+    every run skips the parsing and compiling.\
+    It's thread-safe.
+
+    The context must outlive the script.\
+    See :py:func:`Context.compile`
+
+    :param context: Initialized context
+    :type context: :py:class:`.Context`
+    :param script: utf-8 encoded or unicode string
+    :type script: bytes or str
+    :param identifier: utf-8 encoded or unicode string.\
+    This is used as the name of the script\
+    (ie: in stack-traces)
+    :type identifier: bytes or str
+    """
+    def __init__(self, context, script, identifier=_DEFAULT_SCRIPT_NAME):
+        self._context = context
+        self._script = _to_utf_8(script)
+        self._identifier = _to_utf_8(identifier)
+        self._c_script = None
+
+    def __enter__(self):
+        """
+        See :py:func:`set_up` method for docs
+        """
+        assert not self.is_alive()
+        assert self._context.is_alive()
+
+        c_script = ffi.new('v8cffi_script_t **')
+        c_script[0] = ffi.NULL
+        script_data, script_pin = _pin_input(self._script)
+
+        with _String() as error:
+            code = lib.v8cffi_script_new(
+                c_script,
+                self._context.get_c_context()[0],
+                script_data,
+                len(self._script),
+                script_pin,
+                self._identifier,
+                len(self._identifier),
+                error.string_ptr,
+                error.len_ptr)
+
+            if code != lib.E_V8_OK:
+                raise _to_error(self._context._vm, code, error)
+
+        self._c_script = c_script
+        return self
+
+    def __exit__(self, *_, **__):
+        """
+        See :py:func:`tear_down` method for docs
+        """
+        assert self.is_alive()
+        assert self._context.is_alive()
+
+        lib.v8cffi_script_free(self._c_script[0])
+        self._c_script = None
+
+    def is_alive(self):
+        """
+        Check the script is compiled and was not exited
+
+        :return: Whether the script is alive or not
+        :rtype: bool
+        """
+        return self._c_script is not None
+
+    def set_up(self):
+        """
+        Compile the script.\
+        Remember to call :py:func:`tear_down`\
+        before tearing down the context.\
+        It's recommended to use a ``with``\
+        statement instead of this method\
+        to ensure clean up
+
+        :raises V8JSError: if there was\
+        an error compiling the JS script
+        """
+        return self.__enter__()
+
+    def tear_down(self):
+        """
+        Destructs the script
+        """
+        return self.__exit__()
+
+    def run(self, result=RESULT_TEXT, timeout=None):
+        """
+        Run the compiled script within\
+        its context. All code is ran synchronously,\
+        there is no event loop. It's thread-safe
+
+        :param int result: How the result is returned,\
+        see :py:func:`Context.run_script`
+        :param float timeout: Terminate the\
+        execution after this many seconds,\
+        see :py:func:`Context.run_script`
+        :return: Result of running the JS script
+        :rtype: str or as ``result`` says
+        :raises V8TimeoutError: if the\
+        execution timed out
+        :raises V8Error: if there was\
+        an error running the JS script
+        """
+        assert self.is_alive()
+
+        with _String() as output:
+            with _String() as error:
+                code = lib.v8cffi_script_run(
+                    self._c_script[0],
+                    result,
+                    _to_timeout_ms(timeout),
+                    output.string_ptr,
+                    output.len_ptr,
+                    error.string_ptr,
+                    error.len_ptr)
+
+                if code != lib.E_V8_OK:
+                    raise _to_error(self._context._vm, code, error)
+
+                return _to_result(output, result)
+
+
+class Function(object):
+    """
+    A JS function within a context.\
+    It may be called many times with\
+    JSON serializable arguments,\
+    these get parsed by V8 natively.\
+    It's thread-safe.
+
+    The context must outlive the function.\
+    See :py:func:`Context.get_function`
+
+    Usage::
+
+        render = ctx.get_function('foo.render')
+        render({'title': 'hola mundo'})
+
+    :param context: Initialized context
+    :type context: :py:class:`.Context`
+    :param name: Dotted name of the function\
+    (ie: ``foo.render``), utf-8 encoded or unicode string.\
+    The function is called with the object\
+    holding it as ``this``
+    :type name: bytes or str
+    :param int result: How the result of\
+    calling the function is returned,\
+    see :py:func:`Context.run_script`
+    :param float timeout: Terminate the execution\
+    of every call after this many seconds,\
+    see :py:func:`Context.run_script`
+    """
+    def __init__(self, context, name, result=RESULT_TEXT, timeout=None):
+        self._context = context
+        self._name = _to_utf_8(name)
+        self._result = result
+        self._timeout_ms = _to_timeout_ms(timeout)
+        self._c_function = None
+
+    def __enter__(self):
+        """
+        See :py:func:`set_up` method for docs
+        """
+        assert not self.is_alive()
+        assert self._context.is_alive()
+
+        c_function = ffi.new('v8cffi_function_t **')
+        c_function[0] = ffi.NULL
+
+        with _String() as error:
+            code = lib.v8cffi_function_new(
+                c_function,
+                self._context.get_c_context()[0],
+                self._name,
+                len(self._name),
+                error.string_ptr,
+                error.len_ptr)
+
+            if code != lib.E_V8_OK:
+                raise _to_error(self._context._vm, code, error)
+
+        self._c_function = c_function
+        return self
+
+    def __exit__(self, *_, **__):
+        """
+        See :py:func:`tear_down` method for docs
+        """
+        assert self.is_alive()
+        assert self._context.is_alive()
+
+        lib.v8cffi_function_free(self._c_function[0])
+        self._c_function = None
+
+    def __call__(self, *args):
+        """
+        See :py:func:`call` method for docs
+        """
+        return self.call(*args)
+
+    def is_alive(self):
+        """
+        Check the function was found and was not exited
+
+        :return: Whether the function is alive or not
+        :rtype: bool
+        """
+        return self._c_function is not None
+
+    def set_up(self):
+        """
+        Lookup the function.\
+        Remember to call :py:func:`tear_down`\
+        before tearing down the context.\
+        It's recommended to use a ``with``\
+        statement instead of this method\
+        to ensure clean up
+
+        :raises V8JSError: if the function\
+        was not found
+        """
+        return self.__enter__()
+
+    def tear_down(self):
+        """
+        Destructs the function
+        """
+        return self.__exit__()
+
+    def call(self, *args):
+        """
+        Call the JS function.\
+        All code is ran synchronously,\
+        there is no event loop. It's thread-safe
+
+        :param args: JSON serializable arguments
+        :return: Result of calling the JS function
+        :rtype: str or as the function's ``result`` says
+        :raises TypeError: if the arguments\
+        are not JSON serializable
+        :raises V8TimeoutError: if the\
+        execution timed out
+        :raises V8Error: if there was\
+        an error calling the JS function
+        """
+        assert self.is_alive()
+
+        args_json = _to_utf_8(json.dumps(args, separators=(',', ':')))
+        args_data, args_pin = _pin_input(args_json)
+
+        with _String() as output:
+            with _String() as error:
+                code = lib.v8cffi_function_call(
+                    self._c_function[0],
+                    args_data,
+                    len(args_json),
+                    args_pin,
+                    self._result,
+                    self._timeout_ms,
+                    output.string_ptr,
+                    output.len_ptr,
+                    error.string_ptr,
+                    error.len_ptr)
+
+                if code != lib.E_V8_OK:
+                    raise _to_error(self._context._vm, code, error)
+
+                return _to_result(output, self._result)
+
+    def call_into(self, output, *args):
+        """
+        Call the JS function,\
+        same as :py:func:`call`\
+        but the result is written into\
+        a reusable buffer
+
+        :param output: Buffer to write the result into
+        :type output: :py:class:`.OutputBuffer`
+        :param args: JSON serializable arguments
+        :return: View of the result within\
+        the buffer, see\
+        :py:func:`Context.run_script_into`
+        :rtype: memoryview
+        :raises TypeError: if the arguments\
+        are not JSON serializable
+        :raises V8Error: if there was\
+        an error calling the JS function
+        """
+        assert self.is_alive()
+
+        args_json = _to_utf_8(json.dumps(args, separators=(',', ':')))
+        args_data, args_pin = _pin_input(args_json)
 
-                return six.text_type(output)
+        return output._write(
+            self._context._vm,
+            lib.v8cffi_function_call_into,
+            self._c_function[0],
+            args_data,
+            len(args_json),
+            args_pin,
+            self._result,
+            self._timeout_ms)
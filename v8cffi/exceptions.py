@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import unicode_literals
+import re
+import json
+
+import six
 
 from _v8 import lib
 
@@ -11,13 +15,235 @@ class V8Error(Exception):
     related errors
     """
 
+def _to_details(message):
+    """
+    Parse the details of a JS error.\
+    Errors created from Python only\
+    have got a message
+
+    :param str message: JSON details or message
+    :rtype: dict
+    """
+    if message.startswith('{'):
+        try:
+            return json.loads(message)
+        except ValueError:
+            pass
+
+    return {'message': message}
+
+
+_FRAME_RE = re.compile(r'^\s+at (?:(new )?(.*?) \((.*)\)|(.*))$')
+_LOCATION_RE = re.compile(r'^(.*):(\d+):(\d+)$')
+
+
+def _to_frames(stack):
+    """
+    Parse the frames of an ``error.stack``.\
+    Native frames have got no line\
+    number nor column
+
+    :param str stack: Error stack
+    :rtype: list
+    """
+    frames = []
+
+    for line in stack.splitlines():
+        match = _FRAME_RE.match(line)
+
+        if not match:
+            continue
+
+        is_constructor, function_name, location, top_location = (
+            match.groups())
+        location_match = _LOCATION_RE.match(location or top_location)
+        script_name, line_number, column = (
+            location_match.groups() if location_match else
+            (location or top_location, None, None))
+        frames.append({
+            'function_name': function_name or '',
+            'script_name': script_name,
+            'line_number': line_number and int(line_number),
+            'column': column and int(column),
+            'is_constructor': bool(is_constructor)})
+
+    return frames
+
+
+@six.python_2_unicode_compatible
 class V8JSError(V8Error):
     """
     Error raised when a JS\
     script fails to compile or run.\
     The message contains an\
-    explanation of the cause of the error
+    explanation of the cause of the error.
+
+    The details are parsed when\
+    accessed and the traceback\
+    is formatted when the error\
+    is rendered as text, so catching\
+    it is cheap. The stack and the\
+    thrown value are formatted by the VM\
+    on first access, only the VM's latest\
+    errors are kept until then
     """
+    def __init__(self, *args):
+        super(V8JSError, self).__init__(*args)
+        self._details = None
+        self._vm = None
+
+    def __reduce__(self):
+        # The VM is not pickled, the
+        # stack gets formatted beforehand
+        return self.__class__, (json.dumps(self.details),)
+
+    def __str__(self):
+        """
+        :return: The traceback, including\
+        the location and the stack
+        :rtype: str
+        """
+        lines = []
+
+        if self.resource_name is not None:
+            lines.append('%s:%d' % (self.resource_name, self.line_number))
+
+            if self.source_line is not None:
+                lines.append('    ' + self.source_line)
+                lines.append(
+                    '    ' + ' ' * max(0, self.start_column) +
+                    '^' * (self.end_column - self.start_column))
+            elif self._get_details().get('source_line_too_long'):
+                lines.append('    ~Line too long to display.')
+            else:
+                lines.append('    ~Source line not available.')
+
+        # The stack starts with the message
+        lines.append(self.details.get('stack') or self.message)
+        return '\n'.join(lines)
+
+    @property
+    def details(self):
+        """
+        :return: ``message``, and if known\
+        ``resource_name``, ``line_number``,\
+        ``start_column``, ``end_column``,\
+        ``source_line`` (or ``source_line_too_long``),\
+        ``stack`` and ``value``. The stack\
+        and value are missing if the VM\
+        was torn down or raised too many\
+        errors since this one
+        :rtype: dict
+        """
+        details = self._get_details()
+        vm, self._vm = self._vm, None
+
+        if vm is None or 'error_id' not in details or not vm.is_alive():
+            return details
+
+        try:
+            details.update(vm._error_details(details['error_id']))
+        except V8Error:
+            pass
+
+        return details
+
+    def _get_details(self):
+        """
+        Return the details without\
+        formatting the stack and value
+        """
+        if self._details is None:
+            self._details = _to_details(
+                six.text_type(self.args[0]) if self.args else '')
+
+        return self._details
+
+    @property
+    def message(self):
+        """
+        :return: The error as string,\
+        ie: ``TypeError: foo is not a function``
+        :rtype: str
+        """
+        return self._get_details()['message']
+
+    @property
+    def resource_name(self):
+        """
+        :return: Name of the script\
+        where the error was thrown
+        :rtype: str or None
+        """
+        return self._get_details().get('resource_name')
+
+    @property
+    def line_number(self):
+        """
+        :return: Line where the\
+        error was thrown, 1-based
+        :rtype: int or None
+        """
+        return self._get_details().get('line_number')
+
+    @property
+    def start_column(self):
+        """
+        :return: Column where the\
+        error was thrown, 0-based
+        :rtype: int or None
+        """
+        return self._get_details().get('start_column')
+
+    @property
+    def end_column(self):
+        """
+        :return: Column where the\
+        thrown expression ends, 0-based
+        :rtype: int or None
+        """
+        return self._get_details().get('end_column')
+
+    @property
+    def source_line(self):
+        """
+        :return: Line of code where\
+        the error was thrown, it's\
+        ``None`` for long lines
+        :rtype: str or None
+        """
+        return self._get_details().get('source_line')
+
+    @property
+    def frames(self):
+        """
+        Stack of the error,\
+        innermost frame first. Only\
+        ``Error`` objects have got a stack.\
+        It's parsed from ``error.stack``\
+        when accessed
+
+        :return: ``function_name``, ``script_name``,\
+        ``line_number``, ``column`` (1-based)\
+        and ``is_constructor`` of every frame.\
+        The line number and column are ``None``\
+        for native frames
+        :rtype: list
+        """
+        if 'frames' not in self.details:
+            self.details['frames'] = _to_frames(
+                self.details.get('stack', ''))
+
+        return self.details['frames']
+
+    @property
+    def value(self):
+        """
+        :return: The thrown value, when\
+        it's not an ``Error`` object and\
+        it's JSON serializable
+        """
+        return self.details.get('value')
 
 class V8MemoryError(V8Error):
     """
@@ -30,11 +256,51 @@ class V8UnknownError(V8Error):
     Unpredicted error
     """
 
+class V8TimeoutError(V8Error):
+    """
+    Error raised when a JS script\
+    or function call runs longer than\
+    its timeout and gets terminated.\
+    The context remains usable
+    """
+
+class V8PinnedError(V8Error):
+    """
+    Error raised when a VM pinned\
+    to a thread is used from another\
+    thread, or when unpinning it\
+    from a thread not holding the pin
+    """
+
+class V8StaleError(V8Error):
+    """
+    Error raised when running a script\
+    or calling a function created before\
+    the context was reset
+    """
+
+class V8ProcessError(V8Error):
+    """
+    Error raised when a worker process\
+    dies while running a script,\
+    ie: on a fatal out of memory
+    """
+
+class V8PoolTimeoutError(V8Error):
+    """
+    Error raised when there is no\
+    context available in the pool\
+    within the given timeout
+    """
+
 
 EXCEPT = {
     lib.E_V8_JS_ERROR: V8JSError,
     lib.E_V8_OUT_OF_MEM_ERROR: V8MemoryError,
-    lib.E_V8_UNKNOWN_ERROR: V8UnknownError}
+    lib.E_V8_UNKNOWN_ERROR: V8UnknownError,
+    lib.E_V8_TIMEOUT_ERROR: V8TimeoutError,
+    lib.E_V8_PINNED_ERROR: V8PinnedError,
+    lib.E_V8_STALE_ERROR: V8StaleError}
 
 
 def get_exception(code):
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import itertools
+import threading
+import time
+from concurrent import futures
+
+from six.moves import queue
+
+from .platform import platform
+from . import context as context_module
+
+
+__all__ = [
+    'IsolateExecutor',
+    'ROUND_ROBIN',
+    'LEAST_BUSY']
+
+
+#: Submit to the workers in turns
+ROUND_ROBIN = 'round_robin'
+#: Submit to the worker with the fewest pending items
+LEAST_BUSY = 'least_busy'
+
+
+class _Worker(object):
+    """
+    A thread owning a VM and a context.\
+    Both are created, used and destroyed\
+    within the thread
+
+    :ivar queue: Pending work items
+    :ivar ctx: The context, only for\
+    the worker thread to use
+    """
+    def __init__(self, scripts_paths, vm_options, pinned):
+        self.queue = queue.Queue()
+        self.ctx = None
+        self._scripts_paths = scripts_paths
+        self._vm_options = vm_options
+        self._pinned = pinned
+        self._functions = {}
+        self._ready = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        """
+        Start the thread and wait for\
+        the context to be initialized
+
+        :raises Exception: If the\
+        initialization failed
+        """
+        self._thread.start()
+        self._ready.wait()
+
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+
+    def stop(self, wait=True):
+        self.queue.put(None)
+
+        if wait:
+            self._thread.join()
+
+    def get_function(self, name, timeout=None):
+        """
+        Return a cached JS function,\
+        must be called within the worker thread
+
+        :param str name: Dotted function name
+        :param float timeout: Timeout of every call
+        :rtype: :py:class:`.Function`
+        """
+        try:
+            return self._functions[(name, timeout)]
+        except KeyError:
+            fn = self.ctx.get_function(
+                name, result=context_module.RESULT_PYTHON, timeout=timeout)
+            self._functions[(name, timeout)] = fn
+            return fn
+
+    def _set_up(self):
+        vm = platform.create_vm(**self._vm_options)
+        vm.set_up()
+
+        try:
+            if self._pinned:
+                vm.pin()  # Unpinned on tear down
+
+            ctx = vm.create_context()
+            ctx.set_up()
+
+            try:
+                ctx.load_libs(self._scripts_paths)
+            except:
+                ctx.tear_down()
+                raise
+        except:
+            vm.tear_down()
+            raise
+
+        self.ctx = ctx
+
+    def _tear_down(self):
+        for fn in self._functions.values():
+            fn.tear_down()
+
+        self._functions.clear()
+        self.ctx.tear_down()
+        self.ctx._vm.tear_down()  # no-qa
+        self.ctx = None
+
+    def _run(self):
+        try:
+            self._set_up()
+        except Exception as err:
+            self._error = err
+            return
+        finally:
+            self._ready.set()
+
+        try:
+            while True:
+                work_item = self.queue.get()
+
+                if work_item is None:
+                    return
+
+                future, fn = work_item
+
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                try:
+                    result = fn(self)
+                except BaseException as err:
+                    future.set_exception(err)
+                else:
+                    future.set_result(result)
+        finally:
+            self._tear_down()
+
+
+class IsolateExecutor(futures.Executor):
+    """
+    An executor running JS code\
+    in a pool of threads. Every thread\
+    owns a VM and a context with the\
+    scripts loaded. The GIL is released\
+    while running JS code, so the workers\
+    run in parallel.
+
+    Work items with the same ``key``\
+    are always routed to the same worker,\
+    this allows to reuse the warm JIT state\
+    (and the global state) of that context.\
+    Otherwise the ``routing`` option is used.
+
+    The platform must be set up.
+
+    Usage::
+
+        with IsolateExecutor(4, ['./foo_bundled.js']) as executor:
+            future = executor.submit('foo.render("hola mundo");')
+            future.result()
+
+    :param int max_workers: Number of threads
+    :param list scripts_paths: Script file paths\
+    loaded into every context,\
+    see :py:func:`.Context.load_libs`
+    :param dict vm_options: :py:class:`.VM` options
+    :param str routing: :py:data:`ROUND_ROBIN`\
+    or :py:data:`LEAST_BUSY`
+    :param bool pinned: Pin every VM to\
+    its thread (see :py:func:`.VM.pin`),\
+    so the calls skip taking the VM lock
+    :raises V8Error: if there was\
+    an error initializing the contexts
+    """
+    def __init__(
+            self,
+            max_workers,
+            scripts_paths=(),
+            vm_options=None,
+            routing=ROUND_ROBIN,
+            pinned=False):
+        assert max_workers > 0
+        assert routing in (ROUND_ROBIN, LEAST_BUSY)
+        assert platform.is_alive()
+
+        self._routing = routing
+        self._counter = itertools.count()
+        self._shutdown_lock = threading.Lock()
+        self._is_shutdown = False
+        self._workers = []
+
+        try:
+            for _ in range(max_workers):
+                worker = _Worker(
+                    list(scripts_paths), dict(vm_options or {}), pinned)
+                worker.start()
+                self._workers.append(worker)
+        except:
+            self.shutdown()
+            raise
+
+    def _route(self, key):
+        if key is not None:
+            return self._workers[hash(key) % len(self._workers)]
+
+        if self._routing == LEAST_BUSY:
+            return min(self._workers, key=lambda w: w.queue.qsize())
+
+        return self._workers[next(self._counter) % len(self._workers)]
+
+    def _submit(self, fn, key):
+        with self._shutdown_lock:
+            if self._is_shutdown:
+                raise RuntimeError(
+                    'cannot schedule new futures after shutdown')
+
+            future = futures.Future()
+            self._route(key).queue.put((future, fn))
+            return future
+
+    def submit(
+            self,
+            script,
+            identifier=context_module._DEFAULT_SCRIPT_NAME,
+            result=context_module.RESULT_TEXT,
+            key=None,
+            timeout=None):
+        """
+        Schedule a JS script to be ran,\
+        see :py:func:`.Context.run_script`
+
+        :param script: utf-8 encoded or unicode string
+        :type script: bytes or str
+        :param identifier: Name of the script
+        :type identifier: bytes or str
+        :param int result: How the result is returned
+        :param key: Route to the worker of this key,\
+        any hashable
+        :param float timeout: Terminate the execution\
+        after this many seconds, the time waiting\
+        in the queue is not included
+        :return: A future of the script result
+        :rtype: :py:class:`concurrent.futures.Future`
+        """
+        return self._submit(
+            lambda worker: worker.ctx.run_script(
+                script, identifier=identifier, result=result, timeout=timeout),
+            key)
+
+    def submit_stream(
+            self,
+            script,
+            write,
+            identifier=context_module._DEFAULT_SCRIPT_NAME,
+            key=None,
+            timeout=None):
+        """
+        Schedule a JS script streaming its output,\
+        see :py:func:`.Context.run_script_stream`.\
+        The ``write`` callback is called\
+        within the worker thread
+
+        :param script: utf-8 encoded or unicode string
+        :type script: bytes or str
+        :param write: Callback receiving\
+        the utf-8 encoded chunks (bytes)
+        :type write: callable
+        :param identifier: Name of the script
+        :type identifier: bytes or str
+        :param key: Route to the worker of this key,\
+        any hashable
+        :param float timeout: See :py:func:`submit`
+        :return: A future completed once\
+        the script is done
+        :rtype: :py:class:`concurrent.futures.Future`
+        """
+        return self._submit(
+            lambda worker: worker.ctx.run_script_stream(
+                script, write, identifier=identifier, timeout=timeout),
+            key)
+
+    def submit_call(self, name, args=(), key=None, timeout=None):
+        """
+        Schedule a JS function call,\
+        see :py:class:`.Function`.\
+        The result is converted into\
+        Python objects
+
+        :param name: Dotted name of the function\
+        (ie: ``foo.render``)
+        :type name: bytes or str
+        :param tuple args: JSON serializable arguments
+        :param key: Route to the worker of this key,\
+        any hashable
+        :param float timeout: See :py:func:`submit`
+        :return: A future of the function result
+        :rtype: :py:class:`concurrent.futures.Future`
+        """
+        return self._submit(
+            lambda worker: worker.get_function(name, timeout)(*args),
+            key)
+
+    def map(self, scripts, timeout=None, key=None):
+        """
+        Run many JS scripts in parallel
+
+        :param scripts: Iterable of JS scripts
+        :param float timeout: Max seconds to wait\
+        for all the results
+        :param key: Route all the scripts\
+        to the worker of this key
+        :return: Iterator of the results,\
+        in the same order as the scripts
+        :raises concurrent.futures.TimeoutError: If\
+        the results are not ready within the timeout
+        :raises V8Error: if there was\
+        an error running a JS script
+        """
+        if timeout is not None:
+            end_time = timeout + time.time()
+
+        fs = [self.submit(script, key=key) for script in scripts]
+
+        def result_iterator():
+            try:
+                for future in fs:
+                    if timeout is None:
+                        yield future.result()
+                    else:
+                        yield future.result(end_time - time.time())
+            finally:
+                for future in fs:
+                    future.cancel()
+
+        return result_iterator()
+
+    def shutdown(self, wait=True):
+        """
+        Stop the workers and destroy\
+        their VMs and contexts, once the\
+        pending work items are done
+
+        :param bool wait: Whether to wait for the workers
+        """
+        with self._shutdown_lock:
+            self._is_shutdown = True
+
+        for worker in self._workers:
+            worker.stop(wait=wait)
@@ -6,6 +6,7 @@ import os
 from _v8 import ffi, lib
 
 from . import exceptions
+from . import utils
 from . import vm
 
 
@@ -17,11 +18,6 @@ _NATIVES_BLOB_PATH = os.path.join(_BLOBS_PATH, 'natives_blob.bin')
 _SNAPSHOT_BLOB_PATH = os.path.join(_BLOBS_PATH, 'snapshot_blob.bin')
 
 
-def _read_file(path):
-    with open(path, 'rb') as fh:
-        return fh.read()
-
-
 class _Platform(object):
     """
     V8 platform environment. The underlying\
@@ -31,7 +27,10 @@ class _Platform(object):
     Should be used through :py:data:`platform`
 
     :ivar str natives_path: Path to natives_blob.bin
-    :ivar str snapshot_path: Path to snapshot_blob.bin
+    :ivar str snapshot_path: Path to snapshot_blob.bin.\
+    It may be replaced by a custom snapshot\
+    (see :py:mod:`.snapshot`) before\
+    setting up the platform
     """
     def __init__(self):
         self.natives_path = _NATIVES_BLOB_PATH
@@ -46,16 +45,17 @@ class _Platform(object):
         assert not self.is_alive()
         assert not self._is_dead
 
+        # The blobs are memory mapped
+        natives_path = utils.to_fs_path(self.natives_path)
+        snapshot_path = utils.to_fs_path(self.snapshot_path)
         self._c_platform = ffi.new('v8cffi_platform_t **')  # initialized to NULL ?
         self._c_platform[0] = ffi.NULL
-        natives_blob = _read_file(self.natives_path)
-        snapshot_blob = _read_file(self.snapshot_path)
         code = lib.v8cffi_platform_new(
             self._c_platform,
-            natives_blob,
-            len(natives_blob),
-            snapshot_blob,
-            len(snapshot_blob))
+            natives_path,
+            len(natives_path),
+            snapshot_path,
+            len(snapshot_path))
 
         if code != lib.E_V8_OK:
             raise exceptions.get_exception(code)
@@ -81,15 +81,16 @@ class _Platform(object):
         """
         return self._c_platform is not None
 
-    def create_vm(self):
+    def create_vm(self, **options):
         """
         Create a :py:class:`.VM` for running\
         JS scripts within an isolated environment
 
+        :param options: :py:class:`.VM` options
         :return: Instance of :py:class:`.VM`
         :rtype: :py:class:`.VM`
         """
-        return vm.VM(self)
+        return vm.VM(self, **options)
 
     def set_up(self):
         """
@@ -107,6 +108,8 @@ class _Platform(object):
         is no memory for allocating it,\
         the process should die afterwards anyway,\
         there is little point in catching this
+        :raises OSError: If a blob file\
+        does not exists
         """
         return self.__enter__()
 
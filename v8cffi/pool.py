@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from six.moves import queue
+
+from . import exceptions
+from .platform import platform
+
+
+__all__ = ['ContextPool']
+
+logger = logging.getLogger(__name__)
+
+# These may leave the VM in a bad state
+_FATAL_ERRORS = (
+    exceptions.V8MemoryError,
+    exceptions.V8UnknownError)
+
+# Time given to V8 on every idle notification
+_IDLE_GC_DEADLINE_MS = 10
+
+
+class ContextPool(object):
+    """
+    A thread-safe pool of pre-initialized contexts.\
+    Every context lives within its own VM,\
+    so as many threads as contexts\
+    can run JS code in parallel.
+
+    Contexts are not reset between checkouts\
+    unless ``reset`` is enabled, otherwise\
+    any modification to the global scope will\
+    persist. Contexts raising a :py:class:`.V8MemoryError`\
+    or :py:class:`.V8UnknownError` are\
+    considered broken and get recreated.
+
+    When ``idle_gc_ms`` is set, a background\
+    thread lets V8 collect garbage on contexts\
+    not checked out for that long, so the\
+    work is not done while serving a request.
+
+    The platform must be set up.
+
+    Usage::
+
+        with ContextPool(4, ['./foo_bundled.js']) as pool:
+            with pool.checkout(timeout=1) as ctx:
+                ctx.run_script('foo.render("hola mundo");')
+
+    :param int size: Number of contexts
+    :param list scripts_paths: Script file paths\
+    loaded into every context,\
+    see :py:func:`.Context.load_libs`
+    :param dict vm_options: :py:class:`.VM` options
+    :param float idle_gc_ms: Milliseconds a context\
+    must be idle before notifying its VM,\
+    see :py:func:`.VM.idle_notification`.\
+    Default is to never notify
+    :param bool reset: Whether to reset\
+    contexts when checked in,\
+    see :py:func:`.Context.reset`
+    """
+    def __init__(
+            self,
+            size,
+            scripts_paths=(),
+            vm_options=None,
+            idle_gc_ms=None,
+            reset=False):
+        assert size > 0
+        assert idle_gc_ms is None or idle_gc_ms > 0
+
+        self._size = size
+        self._scripts_paths = list(scripts_paths)
+        self._vm_options = dict(vm_options or {})
+        self._available = None
+        self._members = None
+        self._checked_out = set()
+        self._lock = threading.Lock()
+        self._checkouts = 0
+        self._recreated = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._idle_gc_ms = idle_gc_ms
+        self._reset = reset
+        self._idle_since = {}
+        self._idle_gc_thread = None
+        self._idle_gc_stop = threading.Event()
+        self._idle_notifications = 0
+
+    def __enter__(self):
+        """
+        See :py:func:`set_up` method for docs
+        """
+        assert not self.is_alive()
+        assert platform.is_alive()
+
+        self._available = queue.Queue()
+        self._members = set()
+
+        try:
+            for _ in range(self._size):
+                self._add_member(self._create_member())
+        except:
+            self.__exit__()
+            raise
+
+        if self._idle_gc_ms is not None:
+            self._idle_gc_stop.clear()
+            self._idle_gc_thread = threading.Thread(target=self._idle_gc_loop)
+            self._idle_gc_thread.daemon = True
+            self._idle_gc_thread.start()
+
+        return self
+
+    def __exit__(self, *_, **__):
+        """
+        See :py:func:`tear_down` method for docs
+        """
+        assert self.is_alive()
+
+        if self._idle_gc_thread is not None:
+            self._idle_gc_stop.set()
+            self._idle_gc_thread.join()
+            self._idle_gc_thread = None
+
+        with self._lock:
+            assert not self._checked_out, (
+                'All contexts must be checked in '
+                'before tearing down the pool')
+
+            members = self._members
+            self._members = None
+            self._available = None
+            self._idle_since = {}
+
+        for ctx in members:
+            self._destroy_member(ctx)
+
+    def is_alive(self):
+        """
+        Check the pool is initialized and was not exited
+
+        :return: Whether the pool is alive or not
+        :rtype: bool
+        """
+        return self._members is not None
+
+    def set_up(self):
+        """
+        Create all the VMs and contexts\
+        and load the scripts into them.\
+        Remember to call :py:func:`tear_down`\
+        before exiting the application.\
+        It's recommended to use a ``with``\
+        statement instead of this method\
+        to ensure clean up
+
+        :raises OSError: If there was an error\
+        reading the script files
+        :raises V8Error: if there was\
+        an error running the JS scripts
+        """
+        return self.__enter__()
+
+    def tear_down(self):
+        """
+        Destructs all the VMs and contexts.\
+        All of them must be checked in
+        """
+        return self.__exit__()
+
+    def _create_member(self):
+        vm = platform.create_vm(**self._vm_options)
+        vm.set_up()
+
+        try:
+            ctx = vm.create_context()
+            ctx.set_up()
+
+            try:
+                ctx.load_libs(self._scripts_paths)
+            except:
+                ctx.tear_down()
+                raise
+        except:
+            vm.tear_down()
+            raise
+
+        return ctx
+
+    def _destroy_member(self, ctx):
+        ctx.tear_down()
+        ctx._vm.tear_down()  # no-qa
+
+    def _add_member(self, ctx):
+        with self._lock:
+            self._members.add(ctx)
+            self._idle_since[ctx] = (time.time(), False)
+
+        self._available.put(ctx)
+
+    def _acquire(self, timeout):
+        start = time.time()
+
+        try:
+            ctx = self._available.get(timeout=timeout)
+        except queue.Empty:
+            raise exceptions.V8PoolTimeoutError(
+                'No context available within %s seconds' % timeout)
+
+        wait_time = time.time() - start
+
+        with self._lock:
+            self._checked_out.add(ctx)
+            self._checkouts += 1
+            self._wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+
+        return ctx
+
+    def _release(self, ctx, is_broken):
+        """
+        Put the context back into the pool,\
+        a broken context is recreated instead.\
+        Recreation errors are logged, so the\
+        error of the checkout is not replaced
+        """
+        if not is_broken and self._reset:
+            try:
+                ctx.reset()
+            except exceptions.V8Error:
+                is_broken = True
+
+        if not is_broken:
+            with self._lock:
+                self._checked_out.discard(ctx)
+                self._idle_since[ctx] = (time.time(), False)
+
+            self._available.put(ctx)
+            return
+
+        with self._lock:
+            self._checked_out.discard(ctx)
+            self._members.discard(ctx)
+            self._idle_since.pop(ctx, None)
+            self._recreated += 1
+
+        try:
+            self._destroy_member(ctx)
+        except Exception:
+            logger.exception('Failed to destroy a broken context')
+
+        try:
+            self._add_member(self._create_member())
+        except Exception:
+            # The pool shrinks, stats()
+            # reports the actual size
+            logger.exception('Failed to recreate a broken context')
+
+    def _idle_gc(self):
+        """
+        Notify the VMs of the available\
+        contexts idle for long enough.\
+        They are taken out of the pool\
+        while V8 does the work
+        """
+        idle_time = self._idle_gc_ms / 1000.0
+
+        for _ in range(self._available.qsize()):
+            try:
+                ctx = self._available.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                with self._lock:
+                    since, is_done = self._idle_since[ctx]
+
+                if is_done or time.time() - since < idle_time:
+                    continue
+
+                try:
+                    is_done = ctx._vm.idle_notification(  # no-qa
+                        _IDLE_GC_DEADLINE_MS)
+                except exceptions.V8PinnedError:
+                    continue
+
+                with self._lock:
+                    self._idle_since[ctx] = (since, is_done)
+                    self._idle_notifications += 1
+            finally:
+                self._available.put(ctx)
+
+    def _idle_gc_loop(self):
+        interval = self._idle_gc_ms / 2000.0
+
+        while not self._idle_gc_stop.wait(interval):
+            self._idle_gc()
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """
+        Take a context out of the pool,\
+        blocking until one is available.\
+        The context is put back into the\
+        pool when exiting the ``with`` statement.
+
+        The context must not be used\
+        after it has been checked in
+
+        :param float timeout: Max seconds\
+        to wait for a context, default\
+        is to wait forever
+        :return: A context with the scripts loaded
+        :rtype: :py:class:`.Context`
+        :raises V8PoolTimeoutError: if there was\
+        no context available within the timeout
+        """
+        assert self.is_alive()
+
+        ctx = self._acquire(timeout)
+        is_broken = False
+
+        try:
+            yield ctx
+        except _FATAL_ERRORS:
+            is_broken = True
+            raise
+        finally:
+            self._release(ctx, is_broken)
+
+    def stats(self):
+        """
+        Return the pool usage statistics
+
+        * ``size``: Number of contexts
+        * ``in_use``: Number of checked out contexts
+        * ``utilization``: ``in_use / size``
+        * ``checkouts``: Total number of checkouts
+        * ``wait_time``: Total seconds spent\
+        waiting for a context
+        * ``max_wait_time``: Max seconds spent\
+        waiting for a context
+        * ``recreated``: Number of broken\
+        contexts that were recreated
+        * ``idle_notifications``: Number of\
+        idle notifications sent to the VMs
+
+        :return: Usage statistics
+        :rtype: dict
+        """
+        assert self.is_alive()
+
+        with self._lock:
+            size = len(self._members)
+            in_use = len(self._checked_out)
+
+            return {
+                'size': size,
+                'in_use': in_use,
+                'utilization': float(in_use) / size if size else 0.0,
+                'checkouts': self._checkouts,
+                'wait_time': self._wait_time,
+                'max_wait_time': self._max_wait_time,
+                'recreated': self._recreated,
+                'idle_notifications': self._idle_notifications}
@@ -0,0 +1,578 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+
+import six
+from six.moves import queue
+
+from . import exceptions
+from . import context as context_module
+
+
+__all__ = ['ProcessPool']
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024  # 4MB
+_SHM_DIR = '/dev/shm'
+
+_RUN_SCRIPT = 'run_script'
+_CALL = 'call'
+
+
+def _mp_context():
+    # V8 is not fork-safe once initialized,
+    # spawn a clean interpreter when possible
+    try:
+        return multiprocessing.get_context('spawn')
+    except AttributeError:  # Python 2
+        return multiprocessing
+
+
+class _SharedBuffer(object):
+    """
+    A fixed size memory region\
+    shared between two processes
+
+    :param str path: Backing file path
+    :param int size: Buffer size in bytes
+    """
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+        with open(path, 'r+b') as fh:
+            self._mm = mmap.mmap(fh.fileno(), size)
+
+    @classmethod
+    def create(cls, size):
+        """
+        Create the backing file,\
+        in memory (/dev/shm) when available
+
+        :param int size: Buffer size in bytes
+        :rtype: :py:class:`_SharedBuffer`
+        """
+        shm_dir = _SHM_DIR if os.path.isdir(_SHM_DIR) else None
+        fd, path = tempfile.mkstemp(prefix='v8cffi-', dir=shm_dir)
+
+        try:
+            os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+
+        return cls(path, size)
+
+    def unlink(self):
+        """
+        Remove the backing file.\
+        The memory is still shared by\
+        the processes that mapped it
+        """
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def close(self):
+        self._mm.close()
+
+    def write(self, data):
+        """
+        :param bytes data: Data to write
+        :return: Whether the data fits in the buffer
+        :rtype: bool
+        """
+        if len(data) > self.size:
+            return False
+
+        self._mm[:len(data)] = data
+        return True
+
+    def read(self, length):
+        """
+        :param int length: Data length
+        :return: Data copy
+        :rtype: bytes
+        """
+        return self._mm[:length]
+
+
+def _send(conn, buffer, data, *meta):
+    """
+    Send the data through the shared buffer,\
+    or through the pipe if it does not fit
+    """
+    if buffer.write(data):
+        conn.send(meta + (len(data), None))
+    else:
+        conn.send(meta + (len(data), data))
+
+
+def _recv_data(buffer, length, inline):
+    if inline is not None:
+        return inline
+
+    return buffer.read(length)
+
+
+def _run(ctx, functions, output, op, arg, data):
+    """
+    Run the request within the worker.\
+    The result is forwarded as written\
+    by V8, it gets parsed by the parent only
+
+    :return: The result as utf-8 encoded text or JSON
+    :rtype: bytes
+    """
+    if op == _RUN_SCRIPT:
+        identifier, result = arg
+        return ctx.run_script_into(
+            data,
+            output,
+            identifier=identifier,
+            result=result).tobytes()
+
+    assert op == _CALL
+
+    try:
+        fn = functions[arg]
+    except KeyError:
+        fn = ctx.get_function(arg, result=context_module.RESULT_PYTHON)
+        functions[arg] = fn
+
+    # Arguments are JSON already
+    return fn.call_into(output, *json.loads(data.decode('utf-8'))).tobytes()
+
+
+def _worker_main(
+        conn,
+        request_path,
+        response_path,
+        buffer_size,
+        scripts_paths,
+        vm_options):
+    """
+    Worker process entry point. It owns\
+    the platform, a VM and a context
+    """
+    from .platform import platform
+
+    request_buffer = _SharedBuffer(request_path, buffer_size)
+    response_buffer = _SharedBuffer(response_path, buffer_size)
+    functions = {}
+    output_buffer = context_module.OutputBuffer()
+
+    try:
+        with platform as p:
+            with p.create_vm(**vm_options) as vm:
+                with vm.create_context() as ctx:
+                    ctx.load_libs(scripts_paths)
+                    conn.send(('ready',))
+
+                    while True:
+                        request = conn.recv()
+
+                        if request is None:
+                            break
+
+                        op, arg, length, inline = request
+                        data = _recv_data(request_buffer, length, inline)
+
+                        try:
+                            output = _run(
+                                ctx, functions, output_buffer, op, arg, data)
+                        except Exception as err:
+                            conn.send(
+                                ('error', type(err).__name__, _to_message(err)))
+                        else:
+                            _send(conn, response_buffer, output, 'ok')
+
+                    for fn in functions.values():
+                        fn.tear_down()
+    except Exception as err:
+        conn.send(('error', type(err).__name__, _to_message(err)))
+    finally:
+        request_buffer.close()
+        response_buffer.close()
+        conn.close()
+
+
+def _to_message(err):
+    """
+    Return the message to recreate\
+    the error from, JS errors keep\
+    their details. The stack is formatted\
+    here, the VM is not in the other process
+    """
+    if isinstance(err, exceptions.V8JSError):
+        return json.dumps(err.details)
+
+    return six.text_type(err)
+
+
+def _to_exception(name, message):
+    exception = getattr(exceptions, name, None)
+
+    if not (isinstance(exception, type) and
+            issubclass(exception, exceptions.V8Error)):
+        return exceptions.V8UnknownError('%s: %s' % (name, message))
+
+    return exception(message)
+
+
+class _Worker(object):
+    """
+    A worker process and its\
+    request and response buffers
+    """
+    def __init__(self, scripts_paths, vm_options, buffer_size):
+        self._scripts_paths = scripts_paths
+        self._vm_options = vm_options
+        self._buffer_size = buffer_size
+        self._process = None
+        self._conn = None
+        self._request_buffer = None
+        self._response_buffer = None
+
+    def start(self):
+        """
+        Start the process and wait for\
+        the context to be initialized
+
+        :raises V8Error: if the\
+        initialization failed
+        """
+        mp = _mp_context()
+        self._request_buffer = _SharedBuffer.create(self._buffer_size)
+        self._response_buffer = _SharedBuffer.create(self._buffer_size)
+        self._conn, child_conn = mp.Pipe()
+        self._process = mp.Process(
+            target=_worker_main,
+            args=(
+                child_conn,
+                self._request_buffer.path,
+                self._response_buffer.path,
+                self._buffer_size,
+                self._scripts_paths,
+                self._vm_options))
+        self._process.daemon = True
+
+        try:
+            self._process.start()
+            child_conn.close()
+
+            try:
+                message = self._conn.recv()
+            except EOFError:
+                raise exceptions.V8ProcessError(
+                    'The worker process died on start up')
+
+            if message[0] == 'error':
+                raise _to_exception(*message[1:])
+        except:
+            exc_info = sys.exc_info()
+
+            try:
+                self.stop()
+            except Exception:
+                logger.exception('Failed to stop the worker process')
+
+            six.reraise(*exc_info)
+        finally:
+            # Both processes have mapped them already
+            self._request_buffer.unlink()
+            self._response_buffer.unlink()
+
+    def stop(self):
+        if self._process is None:
+            return
+
+        # It may have failed to start
+        if self._process.pid is not None:
+            try:
+                self._conn.send(None)
+            except (IOError, OSError):
+                pass
+
+            self._process.join(5)
+
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+
+        self._conn.close()
+        self._request_buffer.close()
+        self._response_buffer.close()
+        self._process = None
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def request(self, op, arg, data):
+        """
+        Send a request and wait for the response
+
+        :return: The response data
+        :rtype: bytes
+        :raises V8ProcessError: if the\
+        process died
+        :raises V8Error: if there was\
+        an error running the request
+        """
+        try:
+            _send(self._conn, self._request_buffer, data, op, arg)
+            response = self._conn.recv()
+        except (EOFError, IOError, OSError):
+            raise exceptions.V8ProcessError(
+                'The worker process died while running a request')
+
+        if response[0] == 'error':
+            raise _to_exception(*response[1:])
+
+        _, length, inline = response
+        return _recv_data(self._response_buffer, length, inline)
+
+
+class ProcessPool(object):
+    """
+    A pool of pre-started worker processes.\
+    Every worker owns a platform, a VM and\
+    a context with the scripts loaded, so\
+    a fatal V8 error (ie: out of memory)\
+    only kills a single worker.\
+    Dead workers are restarted.
+
+    Requests and responses are transferred\
+    through memory shared with the worker,\
+    only payloads larger than ``buffer_size``\
+    go through the pipe. Every worker runs\
+    one request at a time.
+
+    It's thread-safe, up to ``size`` threads\
+    run requests in parallel.
+
+    Workers are spawned as clean processes.\
+    In Python 2 they are forked, so the platform\
+    must not be set up before starting the pool.
+
+    Usage::
+
+        with ProcessPool(4, ['./foo_bundled.js']) as pool:
+            pool.run_script('foo.render("hola mundo");')
+
+    :param int size: Number of worker processes
+    :param list scripts_paths: Script file paths\
+    loaded into every context,\
+    see :py:func:`.Context.load_libs`
+    :param dict vm_options: :py:class:`.VM` options
+    :param int buffer_size: Size in bytes of\
+    the request and response shared buffers,\
+    per worker
+    """
+    def __init__(
+            self,
+            size,
+            scripts_paths=(),
+            vm_options=None,
+            buffer_size=_DEFAULT_BUFFER_SIZE):
+        assert size > 0
+
+        self._size = size
+        self._scripts_paths = [
+            os.path.abspath(path)
+            for path in scripts_paths]
+        self._vm_options = dict(vm_options or {})
+        self._buffer_size = buffer_size
+        self._workers = None
+        self._available = None
+        self._lock = threading.Lock()
+        self._restarts = 0
+
+    def __enter__(self):
+        """
+        See :py:func:`set_up` method for docs
+        """
+        assert not self.is_alive()
+
+        self._workers = []
+        self._available = queue.Queue()
+
+        try:
+            for _ in range(self._size):
+                worker = self._create_worker()
+                self._workers.append(worker)
+                self._available.put(worker)
+        except:
+            self.__exit__()
+            raise
+
+        return self
+
+    def __exit__(self, *_, **__):
+        """
+        See :py:func:`tear_down` method for docs
+        """
+        assert self.is_alive()
+
+        workers = self._workers
+        self._workers = None
+        self._available = None
+
+        for worker in workers:
+            worker.stop()
+
+    def is_alive(self):
+        """
+        Check the pool is initialized and was not exited
+
+        :return: Whether the pool is alive or not
+        :rtype: bool
+        """
+        return self._workers is not None
+
+    def set_up(self):
+        """
+        Start the worker processes and wait\
+        for their contexts to be initialized.\
+        Remember to call :py:func:`tear_down`\
+        before exiting the application.\
+        It's recommended to use a ``with``\
+        statement instead of this method\
+        to ensure clean up
+
+        :raises V8Error: if there was\
+        an error initializing the contexts
+        """
+        return self.__enter__()
+
+    def tear_down(self):
+        """
+        Stop the worker processes
+        """
+        return self.__exit__()
+
+    def _create_worker(self):
+        worker = _Worker(
+            self._scripts_paths,
+            self._vm_options,
+            self._buffer_size)
+        worker.start()
+        return worker
+
+    def _restart(self, worker):
+        worker.stop()
+        new_worker = self._create_worker()
+
+        with self._lock:
+            self._restarts += 1
+            self._workers[self._workers.index(worker)] = new_worker
+
+        return new_worker
+
+    def _request(self, op, arg, data):
+        assert self.is_alive()
+
+        worker = self._available.get()
+
+        try:
+            if not worker.is_alive():
+                worker = self._restart(worker)
+
+            try:
+                return worker.request(op, arg, data)
+            except exceptions.V8ProcessError:
+                exc_info = sys.exc_info()
+
+                try:
+                    worker = self._restart(worker)
+                except Exception:
+                    # The dead worker is put back,
+                    # the next request restarts it
+                    logger.exception('Failed to restart the worker process')
+
+                six.reraise(*exc_info)
+        finally:
+            self._available.put(worker)
+
+    def run_script(
+            self,
+            script,
+            identifier=context_module._DEFAULT_SCRIPT_NAME,
+            result=context_module.RESULT_TEXT):
+        """
+        Run a JS script within a worker,\
+        see :py:func:`.Context.run_script`
+
+        :param script: utf-8 encoded or unicode string
+        :type script: bytes or str
+        :param identifier: Name of the script
+        :type identifier: bytes or str
+        :param int result: How the result is returned
+        :return: Result of running the JS script
+        :raises V8ProcessError: if the worker\
+        died while running the script
+        :raises V8Error: if there was\
+        an error running the JS script
+        """
+        output = self._request(
+            _RUN_SCRIPT,
+            (identifier, result),
+            context_module._to_utf_8(script))
+
+        if result == context_module.RESULT_PYTHON:
+            return json.loads(output.decode('utf-8'))
+
+        if result == context_module.RESULT_DISCARD:
+            return None
+
+        return output.decode('utf-8')
+
+    def call(self, name, *args):
+        """
+        Call a JS function within a worker,\
+        see :py:class:`.Function`
+
+        :param str name: Dotted name of the function\
+        (ie: ``foo.render``)
+        :param args: JSON serializable arguments
+        :return: Result of calling the JS\
+        function, as Python objects
+        :raises V8ProcessError: if the worker\
+        died while calling the function
+        :raises V8Error: if there was\
+        an error calling the JS function
+        """
+        output = self._request(
+            _CALL,
+            name,
+            json.dumps(args).encode('utf-8'))
+        return json.loads(output.decode('utf-8'))
+
+    def stats(self):
+        """
+        Return the pool statistics
+
+        * ``size``: Number of workers
+        * ``in_use``: Number of busy workers
+        * ``restarts``: Number of dead\
+        workers that were restarted
+
+        :return: Statistics
+        :rtype: dict
+        """
+        assert self.is_alive()
+
+        with self._lock:
+            return {
+                'size': len(self._workers),
+                'in_use': len(self._workers) - self._available.qsize(),
+                'restarts': self._restarts}
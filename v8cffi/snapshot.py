@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import os
+
+import six
+
+from _v8 import lib
+
+from . import exceptions
+from .context import _String, _read_file
+from .platform import platform
+
+
+__all__ = ['create', 'create_file']
+
+
+def create(scripts_paths):
+    """
+    Create a custom startup snapshot.\
+    The scripts are ran within a new context\
+    and the resulting heap gets serialized.\
+    Contexts created from the snapshot\
+    start with the scripts already loaded.
+
+    The scripts must not rely on state that\
+    can't be serialized, such as pending\
+    timers or native (embedder) functions.
+
+    The platform must be set up.\
+    Snapshots are only valid for\
+    the V8 version that created them
+
+    :param list scripts_paths: Script file paths.\
+    The files content must be utf-8 encoded
+    :return: The snapshot blob
+    :rtype: bytes
+    :raises OSError: If there was an error\
+    reading the files
+    :raises V8JSError: If the snapshot\
+    could not be created, usually\
+    because the scripts fail to run
+    """
+    assert platform.is_alive()
+
+    source = b'\n;\n'.join(
+        _read_file(path)
+        for path in scripts_paths)
+
+    with _String() as output:
+        with _String() as error:
+            code = lib.v8cffi_snapshot_new(
+                source,
+                len(source),
+                output.string_ptr,
+                output.len_ptr,
+                error.string_ptr,
+                error.len_ptr)
+
+            if code != lib.E_V8_OK:
+                raise exceptions.get_exception(code)(six.text_type(error))
+
+            return output.to_bytes()
+
+
+def create_file(scripts_paths, path):
+    """
+    Create a custom startup snapshot\
+    and write it into a file. This file can\
+    be passed as the VM's ``snapshot_path``\
+    or set as the platform's ``snapshot_path``.
+
+    See :py:func:`create` for details
+
+    :param list scripts_paths: Script file paths
+    :param str path: Destination file path
+    :raises OSError: If there was an error\
+    manipulating the files
+    :raises V8JSError: If the snapshot\
+    could not be created
+    """
+    snapshot_blob = create(scripts_paths)
+
+    # Running VMs may have the file mapped,
+    # replace it instead of truncating it
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+
+    with open(tmp_path, 'wb') as fh:
+        fh.write(snapshot_blob)
+
+    os.rename(tmp_path, path)
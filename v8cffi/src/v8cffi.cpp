@@ -5,7 +5,13 @@
 #include "v8cffi_platform.h"
 #include "v8cffi_vm.h"
 #include "v8cffi_context.h"
+#include "v8cffi_script.h"
+#include "v8cffi_function.h"
+#include "v8cffi_input.h"
+#include "v8cffi_timing.h"
+#include "v8cffi_stream.h"
 #include "v8cffi_exceptions.h"
+#include "v8cffi_trace_back.h"
 #include "v8cffi.h"
 
 #define AS_TYPE(Type, Obj) reinterpret_cast<Type *>(Obj)
@@ -23,37 +29,198 @@ void v8cffi_free(void *ptr)
 }
 
 
+/*
+ * @brief Set the function releasing pinned inputs.
+ * Inputs passed with a handle may be referenced by V8
+ * after the call returns, the handle gets released
+ * once V8 is done with the buffer.
+ * @param release Callback, it may be called from any
+ * thread running JS code or disposing a VM.
+ * */
+void v8cffi_set_release_input(v8cffi_release_t release)
+{
+  v8cffi_input::setReleaseCallback(release);
+}
+
+
+/*
+ * Create a string copy and return it.
+ * Caller must free it later.
+ * Return NULL when out of memory.
+ * */
+char *str_dup(const char *s, size_t len) {
+  char *d = (char *) malloc(len + 1);  // + null char
+
+  if (d == NULL)
+    return NULL;
+  else
+    return (char *) memcpy(d, s, len + 1);
+}
+
+
+/*
+ * Copy a C++ string into a C string destination.
+ * Return false when out of memory or true otherwise.
+ * */
+bool str_copy(const std::string &str, char **out_str, size_t *out_len)
+{
+  *out_len = str.length();
+  *out_str = str_dup(str.c_str(), *out_len);
+
+  if (*out_str == NULL)
+    return false;
+  else
+    return true;
+}
+
+
+/*
+ * Return the details of a JS error,
+ * see v8cffi_trace_back::toJSError
+ * */
+std::string error_details(const v8cffi_exceptions::JSError &e)
+{
+  std::string details = e.getDetails();
+
+  if (details.empty())
+    return v8cffi_trace_back::toDetails(e.getMessage());
+
+  return details;
+}
+
+
+/*
+ * Copy the result into a C string destination,
+ * unless it was already written into the
+ * caller's buffer. Return false when out
+ * of memory or true otherwise.
+ * */
+bool output_copy(
+  const v8cffi_result::Output &output,
+  char **out_str,
+  size_t *out_len)
+{
+  *out_len = output.length();
+  *out_str = NULL;
+
+  if (output.isInBuffer())
+    return true;
+
+  return str_copy(output.getString(), out_str, out_len);
+}
+
+
+/*
+ * Map the exception being handled to a status code
+ * and copy its message into error, JS errors get
+ * their details. It must be called within a catch
+ * block. The error may be NULL to skip the message.
+ * */
+v8_code handle_error(char **error, size_t *error_len)
+{
+  v8_code code;
+  std::string message;
+
+  try
+  {
+    throw;
+  }
+  catch (const v8cffi_exceptions::TimeoutError &e)
+  {
+    code = E_V8_TIMEOUT_ERROR;
+    message = e.getMessage();
+  }
+  catch (const v8cffi_exceptions::JSError &e)
+  {
+    code = E_V8_JS_ERROR;
+    message = error_details(e);
+  }
+  catch (const v8cffi_exceptions::StaleError &e)
+  {
+    code = E_V8_STALE_ERROR;
+    message = e.getMessage();
+  }
+  catch (const v8cffi_exceptions::PinnedError &e)
+  {
+    code = E_V8_PINNED_ERROR;
+    message = e.getMessage();
+  }
+  catch (const std::bad_alloc &e)
+  {
+    return E_V8_OUT_OF_MEM_ERROR;
+  }
+  catch (...)
+  {
+    return E_V8_UNKNOWN_ERROR;
+  }
+
+  if (error == NULL)
+    return code;
+
+  try
+  {
+    if (!str_copy(message, error, error_len))
+      return E_V8_OUT_OF_MEM_ERROR;
+  }
+  catch (const std::bad_alloc &e)
+  {
+    return E_V8_OUT_OF_MEM_ERROR;
+  }
+
+  return code;
+}
+
+
+/*
+ * Copy the result and mark the
+ * call as succeeded. Return a status code.
+ * */
+v8_code complete_call(
+  v8cffi_timing::Call &call,
+  const v8cffi_result::Output &output,
+  char **out_str,
+  size_t *out_len)
+{
+  {
+    v8cffi_timing::PhaseTimer timer(v8cffi_timing::kCopy);
+
+    if (!output_copy(output, out_str, out_len))
+      return E_V8_OUT_OF_MEM_ERROR;
+  }
+
+  call.setBytesOut(output.length());
+  call.succeed();
+  return E_V8_OK;
+}
+
+
 /*
  * @brief Instantiate a Platform.
  * It must be instance only once per process,
  * this is enforced by V8.
  * @param platform Opaque type.
- * @param natives_blob Binary data read from the .bin file.
- * @param natives_blob_len Binary data length.
- * @param snapshot_blob Binary data read from the .bin file.
- * @param snapshot_blob_len Binary data length.
+ * @param natives_path Path to the natives .bin file.
+ * @param natives_path_len Path length.
+ * @param snapshot_path Path to the snapshot .bin file.
+ * @param snapshot_path_len Path length.
  * @return Status code
  * */
 v8_code v8cffi_platform_new(
   v8cffi_platform_t **platform,
-  const char *natives_blob,
-  size_t natives_blob_len,
-  const char *snapshot_blob,
-  size_t snapshot_blob_len)
+  const char *natives_path,
+  size_t natives_path_len,
+  const char *snapshot_path,
+  size_t snapshot_path_len)
 {
   try
   {
     *platform = AS_TYPE(v8cffi_platform_t, new v8cffi_platform::Platform(
-        std::string(natives_blob, natives_blob_len),
-        std::string(snapshot_blob, snapshot_blob_len)));
-  }
-  catch (const std::bad_alloc &e)
-  {
-    return E_V8_OUT_OF_MEM_ERROR;
+        std::string(natives_path, natives_path_len),
+        std::string(snapshot_path, snapshot_path_len)));
   }
   catch (...)
   {
-    return E_V8_UNKNOWN_ERROR;
+    return handle_error(NULL, NULL);
   }
 
   return E_V8_OK;
@@ -74,23 +241,78 @@ void v8cffi_platform_free(v8cffi_platform_t *platform)
 
 
 /*
- * @brief Instantiate a VM which is a V8::Isolate manager.
- * @param vm Opaque type.
+ * @brief Create a startup snapshot with the source already ran.
+ * @param source JS code to be ran, must be utf-8 encoded.
+ * @param source_len JS code length.
+ * @param output Storage for the snapshot blob.
+ * @param output_len Snapshot blob length.
+ * @param error Message for errors.
+ * @param error_len Error message length.
  * @return Status code
  * */
-v8_code v8cffi_vm_new(v8cffi_vm_t **vm)
+v8_code v8cffi_snapshot_new(
+  const char *source,
+  size_t source_len,
+  char **output,
+  size_t *output_len,
+  char **error,
+  size_t *error_len)
 {
+  std::string output_str;
+
   try
   {
-    *vm = AS_TYPE(v8cffi_vm_t, new v8cffi_vm::VM());
+    output_str = v8cffi_platform::createSnapshot(
+      std::string(source, source_len));
   }
-  catch (const std::bad_alloc &e)
+  catch (...)
   {
+    return handle_error(error, error_len);
+  }
+
+  if (!str_copy(output_str, output, output_len))
     return E_V8_OUT_OF_MEM_ERROR;
+
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Instantiate a VM which is a V8::Isolate manager.
+ * @param vm Opaque type.
+ * @param snapshot_path Path to a custom startup snapshot,
+ * the platform's snapshot is used when it's empty.
+ * @param snapshot_path_len Path length.
+ * @param max_semi_space_size Young generation semi-space
+ * size limit in MB, 0 for V8's default.
+ * @param max_old_space_size Old generation size limit
+ * in MB, 0 for V8's default.
+ * @param max_executable_size Executable code size limit
+ * in MB, 0 for V8's default.
+ * @return Status code
+ * */
+v8_code v8cffi_vm_new(
+  v8cffi_vm_t **vm,
+  const char *snapshot_path,
+  size_t snapshot_path_len,
+  int max_semi_space_size,
+  int max_old_space_size,
+  int max_executable_size)
+{
+  v8cffi_vm::HeapLimits heap_limits;
+  heap_limits.max_semi_space_size = max_semi_space_size;
+  heap_limits.max_old_space_size = max_old_space_size;
+  heap_limits.max_executable_size = max_executable_size;
+
+  try
+  {
+    *vm = AS_TYPE(v8cffi_vm_t, new v8cffi_vm::VM(
+      std::string(snapshot_path, snapshot_path_len),
+      heap_limits));
   }
   catch (...)
   {
-    return E_V8_UNKNOWN_ERROR;
+    return handle_error(NULL, NULL);
   }
 
   return E_V8_OK;
@@ -111,120 +333,1202 @@ void v8cffi_vm_free(v8cffi_vm_t *vm)
 
 
 /*
- * @brief Instantiate a Context to run JS code.
- * @param ctx Opaque type.
- * @param vm Opaque type, referencing a instantiated VM.
+ * @brief Get the VM's heap usage.
+ * It waits for running scripts to finish.
+ * @param vm Opaque type, instantiated VM.
+ * @param stats Storage for the heap statistics.
  * @return Status code
  * */
-v8_code v8cffi_context_new(v8cffi_context_t **ctx, v8cffi_vm_t *vm)
+v8_code v8cffi_vm_heap_stats(v8cffi_vm_t *vm, v8cffi_heap_stats_t *stats)
 {
+  v8::HeapStatistics heap_stats;
+  int64_t external_memory = 0;
+
   try
   {
-    *ctx = AS_TYPE(
-      v8cffi_context_t,
-      new v8cffi_context::Context(AS_TYPE(v8cffi_vm::VM, vm)->getIsolate()));
-  }
-  catch (const std::bad_alloc &e)
-  {
-    return E_V8_OUT_OF_MEM_ERROR;
+    AS_TYPE(v8cffi_vm::VM, vm)->getHeapStatistics(heap_stats, external_memory);
   }
   catch (...)
   {
-    return E_V8_UNKNOWN_ERROR;
+    return handle_error(NULL, NULL);
   }
 
+  stats->total_heap_size = heap_stats.total_heap_size();
+  stats->total_heap_size_executable = heap_stats.total_heap_size_executable();
+  stats->total_physical_size = heap_stats.total_physical_size();
+  stats->total_available_size = heap_stats.total_available_size();
+  stats->used_heap_size = heap_stats.used_heap_size();
+  stats->heap_size_limit = heap_stats.heap_size_limit();
+  stats->external_memory = external_memory;
   return E_V8_OK;
 }
 
 
 /*
- * @brief Destruct the Context.
- * @param ctx Opaque type.
+ * @brief Notify the VM is idle, so V8 can
+ * do garbage collection work.
+ * It waits for running scripts to finish.
+ * @param vm Opaque type, instantiated VM.
+ * @param deadline_ms Time available for the work.
+ * @param is_done Set to 1 when there is no more
+ * work to do until more JS code is ran, 0 otherwise.
+ * @return Status code
  * */
-void v8cffi_context_free(v8cffi_context_t *ctx)
+v8_code v8cffi_vm_idle_notification(
+  v8cffi_vm_t *vm,
+  double deadline_ms,
+  int *is_done)
 {
-  if (!ctx)
-    return;
+  try
+  {
+    *is_done = AS_TYPE(v8cffi_vm::VM, vm)->idleNotification(
+      deadline_ms) ? 1 : 0;
+  }
+  catch (...)
+  {
+    return handle_error(NULL, NULL);
+  }
 
-  delete AS_TYPE(v8cffi_context::Context, ctx);
+  return E_V8_OK;
 }
 
 
 /*
- * Create a string copy and return it.
- * Caller must free it later.
- * Return NULL when out of memory.
+ * @brief Notify the system is running low on memory,
+ * so V8 frees as much memory as it can.
+ * It waits for running scripts to finish.
+ * @param vm Opaque type, instantiated VM.
+ * @return Status code
  * */
-char *str_dup(const char *s, size_t len) {
-  char *d = (char *) malloc(len + 1);  // + null char
+v8_code v8cffi_vm_low_memory_notification(v8cffi_vm_t *vm)
+{
+  try
+  {
+    AS_TYPE(v8cffi_vm::VM, vm)->lowMemoryNotification();
+  }
+  catch (...)
+  {
+    return handle_error(NULL, NULL);
+  }
 
-  if (d == NULL)
-    return NULL;
-  else
-    return (char *) memcpy(d, s, len + 1);
+  return E_V8_OK;
 }
 
 
 /*
- * Copy a C++ string into a C string destination.
- * Return false when out of memory or true otherwise.
+ * @brief Take a heap snapshot and write it
+ * into a file, in the Chrome DevTools'
+ * .heapsnapshot (JSON) format. It's written
+ * incrementally, as it gets serialized.
+ * It waits for running scripts to finish.
+ * @param vm Opaque type, instantiated VM.
+ * @param fd File descriptor open for writing.
+ * @param error_number Storage for the errno
+ * of a failed write.
+ * @return Status code, unknown error
+ * if the file could not be written
  * */
-bool str_copy(const std::string &str, char **out_str, size_t *out_len)
+v8_code v8cffi_vm_write_heap_snapshot(
+  v8cffi_vm_t *vm,
+  int fd,
+  int *error_number)
 {
-  *out_len = str.length();
-  *out_str = str_dup(str.c_str(), *out_len);
+  try
+  {
+    *error_number = AS_TYPE(v8cffi_vm::VM, vm)->writeHeapSnapshot(fd);
+  }
+  catch (...)
+  {
+    return handle_error(NULL, NULL);
+  }
 
-  if (*out_str == NULL)
-    return false;
-  else
-    return true;
+  if (*error_number)
+    return E_V8_UNKNOWN_ERROR;
+
+  return E_V8_OK;
 }
 
 
 /*
- * @brief Run JS code, the JS state is saved across calls.
- * @param ctx Opaque type, instantiated Context.
- * @param input_script JS code to be ran, must be utf-8 encoded.
- * @param input_script_len JS code length.
- * @param output Storage for the JS result, utf-8 encoded.
- * @param output_len JS result length.
- * @param error Message for JS errors.
- * @param error_len Error message length.
- * @return Status code.
+ * @brief Get the stack of a JS error,
+ * or its thrown value if it's not an Error.
+ * These are formatted on demand, only the
+ * latest errors of the VM are kept.
+ * @param vm Opaque type, instantiated VM.
+ * @param error_id The error_id of the error details.
+ * @param details JSON object of the stack or value,
+ * it's empty if the error is no longer kept.
+ * @param details_len Details length.
+ * @return Status code
  * */
-v8_code v8cffi_run_script(
-  v8cffi_context_t *ctx,
-  const char *input_script,
-  size_t input_script_len,
-  const char *identifier,
-  size_t identifier_len,
-  char **output,
-  size_t *output_len,
-  char **error,
-  size_t *error_len)
+v8_code v8cffi_vm_error_details(
+  v8cffi_vm_t *vm,
+  unsigned int error_id,
+  char **details,
+  size_t *details_len)
 {
-  std::string output_str;
+  std::string details_str;
 
   try
   {
-    output_str = AS_TYPE(v8cffi_context::Context, ctx)->runScript(
-      std::string(input_script, input_script_len),
-      std::string(identifier, identifier_len));
+    details_str = AS_TYPE(v8cffi_vm::VM, vm)->errorDetails(error_id);
   }
-  catch (const v8cffi_exceptions::JSError &e)
+  catch (...)
   {
-    if (!str_copy(e.getMessage(), error, error_len))
-      return E_V8_OUT_OF_MEM_ERROR;
+    return handle_error(NULL, NULL);
+  }
+
+  if (!str_copy(details_str, details, details_len))
+    return E_V8_OUT_OF_MEM_ERROR;
+
+  return E_V8_OK;
+}
 
-    return E_V8_JS_ERROR;
+
+/*
+ * @brief Pin the VM to the current thread.
+ * The isolate is kept locked and entered until
+ * it's unpinned, so the calls ran within this
+ * thread skip the lock acquisition. Using the VM
+ * from other threads fails meanwhile.
+ * It waits for running scripts to finish.
+ * @param vm Opaque type, instantiated VM.
+ * @return Status code, pinned error if
+ * another thread pinned the VM
+ * */
+v8_code v8cffi_vm_pin(v8cffi_vm_t *vm)
+{
+  try
+  {
+    AS_TYPE(v8cffi_vm::VM, vm)->pin();
   }
   catch (...)
   {
-    return E_V8_UNKNOWN_ERROR;
+    return handle_error(NULL, NULL);
   }
 
-  if (!str_copy(output_str, output, output_len))
-    return E_V8_OUT_OF_MEM_ERROR;
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Unpin the VM, so other
+ * threads can use it.
+ * @param vm Opaque type, instantiated VM.
+ * @return Status code, pinned error if the
+ * current thread did not pin the VM
+ * */
+v8_code v8cffi_vm_unpin(v8cffi_vm_t *vm)
+{
+  try
+  {
+    AS_TYPE(v8cffi_vm::VM, vm)->unpin();
+  }
+  catch (...)
+  {
+    return handle_error(NULL, NULL);
+  }
 
   return E_V8_OK;
 }
+
+
+/*
+ * @brief Instantiate a Context to run JS code.
+ * @param ctx Opaque type.
+ * @param vm Opaque type, referencing a instantiated VM.
+ * @return Status code
+ * */
+v8_code v8cffi_context_new(v8cffi_context_t **ctx, v8cffi_vm_t *vm)
+{
+  try
+  {
+    *ctx = AS_TYPE(
+      v8cffi_context_t,
+      new v8cffi_context::Context(AS_TYPE(v8cffi_vm::VM, vm)->getIsolate()));
+  }
+  catch (...)
+  {
+    return handle_error(NULL, NULL);
+  }
+
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Destruct the Context.
+ * @param ctx Opaque type.
+ * */
+void v8cffi_context_free(v8cffi_context_t *ctx)
+{
+  if (!ctx)
+    return;
+
+  delete AS_TYPE(v8cffi_context::Context, ctx);
+}
+
+
+/*
+ * @brief Replace the Context's global scope by a new one,
+ * created from the VM's startup snapshot. The native
+ * functions and the libs are set again, the libs are
+ * not compiled again. The current global scope is kept
+ * if a lib fails. Scripts and functions created before
+ * are stale afterwards.
+ * It waits for running scripts to finish.
+ * @param ctx Opaque type, instantiated Context.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code
+ * */
+v8_code v8cffi_context_reset(
+  v8cffi_context_t *ctx,
+  char **error,
+  size_t *error_len)
+{
+  try
+  {
+    AS_TYPE(v8cffi_context::Context, ctx)->reset();
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Run a lib and keep it compiled,
+ * it's ran again on every reset.
+ * @param ctx Opaque type, instantiated Context.
+ * @param input_script JS code to be ran, must be utf-8 encoded.
+ * @param input_script_len JS code length.
+ * @param identifier Name of the script, must be utf-8 encoded.
+ * @param identifier_len Name of the script length.
+ * @param use_cache Whether to produce or consume a code cache,
+ * see v8cffi_run_script_cached. The cache
+ * parameters are ignored otherwise.
+ * @param cache Code cache to consume, it may be empty.
+ * @param cache_len Code cache length.
+ * @param cache_output Storage for the produced code cache.
+ * @param cache_output_len Produced code cache length.
+ * @param cache_rejected Set to 1 when V8 rejects the code cache.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code.
+ * */
+v8_code v8cffi_context_load_lib(
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  const char *identifier,
+  size_t identifier_len,
+  int use_cache,
+  const char *cache,
+  size_t cache_len,
+  char **cache_output,
+  size_t *cache_output_len,
+  int *cache_rejected,
+  char **error,
+  size_t *error_len)
+{
+  std::string cache_output_str;
+  bool cache_rejected_b = false;
+
+  try
+  {
+    AS_TYPE(v8cffi_context::Context, ctx)->loadLib(
+      std::string(input_script, input_script_len),
+      std::string(identifier, identifier_len),
+      use_cache != 0,
+      std::string(cache, cache_len),
+      cache_output_str,
+      cache_rejected_b);
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  *cache_rejected = cache_rejected_b ? 1 : 0;
+
+  if (!str_copy(cache_output_str, cache_output, cache_output_len))
+    return E_V8_OUT_OF_MEM_ERROR;
+
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Run JS code, the JS state is saved across calls.
+ * @param ctx Opaque type, instantiated Context.
+ * @param input_script JS code to be ran, must be utf-8 encoded.
+ * @param input_script_len JS code length.
+ * @param input_script_handle Pin of the JS code buffer,
+ * see v8cffi_set_release_input. It may be NULL.
+ * @param identifier Name of the script, must be utf-8 encoded.
+ * @param identifier_len Name of the script length.
+ * @param result_type How the JS result is converted.
+ * @param timeout_ms Terminate the execution after
+ * this many milliseconds, 0 for no timeout.
+ * @param output Storage for the JS result, utf-8 encoded.
+ * @param output_len JS result length.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code.
+ * */
+v8_code v8cffi_run_script(
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  void *input_script_handle,
+  const char *identifier,
+  size_t identifier_len,
+  v8_result_type result_type,
+  unsigned int timeout_ms,
+  char **output,
+  size_t *output_len,
+  char **error,
+  size_t *error_len)
+{
+  v8cffi_input::Input input(
+    input_script, input_script_len, input_script_handle);
+  v8cffi_result::Output output_res;
+  v8cffi_context::Context *context = AS_TYPE(v8cffi_context::Context, ctx);
+  v8cffi_timing::Call call(context->getCounters(), context->isTiming());
+  call.setBytesIn(input_script_len);
+
+  try
+  {
+    context->runScript(
+      input,
+      std::string(identifier, identifier_len),
+      static_cast<v8cffi_result::ResultType>(result_type),
+      timeout_ms,
+      output_res);
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  return complete_call(call, output_res, output, output_len);
+}
+
+
+/*
+ * @brief Run JS code writing the result into a caller
+ * supplied buffer. When the result does not fit,
+ * it's stored into overflow instead.
+ * @param ctx Opaque type, instantiated Context.
+ * @param input_script JS code to be ran, must be utf-8 encoded.
+ * @param input_script_len JS code length.
+ * @param input_script_handle Pin of the JS code buffer,
+ * see v8cffi_set_release_input. It may be NULL.
+ * @param identifier Name of the script, must be utf-8 encoded.
+ * @param identifier_len Name of the script length.
+ * @param result_type How the JS result is converted.
+ * @param timeout_ms Terminate the execution after
+ * this many milliseconds, 0 for no timeout.
+ * @param buffer Storage for the JS result, utf-8 encoded.
+ * @param buffer_len Buffer capacity.
+ * @param overflow Storage for the JS result when it does
+ * not fit in the buffer, NULL otherwise.
+ * @param output_len JS result length.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code.
+ * */
+v8_code v8cffi_run_script_into(
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  void *input_script_handle,
+  const char *identifier,
+  size_t identifier_len,
+  v8_result_type result_type,
+  unsigned int timeout_ms,
+  char *buffer,
+  size_t buffer_len,
+  char **overflow,
+  size_t *output_len,
+  char **error,
+  size_t *error_len)
+{
+  v8cffi_input::Input input(
+    input_script, input_script_len, input_script_handle);
+  v8cffi_result::Output output_res(buffer, buffer_len);
+  v8cffi_context::Context *context = AS_TYPE(v8cffi_context::Context, ctx);
+  v8cffi_timing::Call call(context->getCounters(), context->isTiming());
+  call.setBytesIn(input_script_len);
+
+  try
+  {
+    context->runScript(
+      input,
+      std::string(identifier, identifier_len),
+      static_cast<v8cffi_result::ResultType>(result_type),
+      timeout_ms,
+      output_res);
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  return complete_call(call, output_res, overflow, output_len);
+}
+
+
+/*
+ * @brief Run JS code streaming its output. The script
+ * calls a native function set as the global write_name,
+ * every chunk is passed to the write callback as it's
+ * produced. The result of the script is discarded.
+ * @param ctx Opaque type, instantiated Context.
+ * @param input_script JS code to be ran, must be utf-8 encoded.
+ * @param input_script_len JS code length.
+ * @param input_script_handle Pin of the JS code buffer,
+ * see v8cffi_set_release_input. It may be NULL.
+ * @param identifier Name of the script, must be utf-8 encoded.
+ * @param identifier_len Name of the script length.
+ * @param write_name Name of the JS function, must be utf-8 encoded.
+ * @param write_name_len Name of the JS function length.
+ * @param write Callback receiving the utf-8 encoded chunks,
+ * it's called within the calling thread. Returning non-zero
+ * throws a JS error, aborting the script.
+ * @param write_data Passed to the callback as is.
+ * @param timeout_ms Terminate the execution after
+ * this many milliseconds, 0 for no timeout.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code.
+ * */
+v8_code v8cffi_run_script_stream(
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  void *input_script_handle,
+  const char *identifier,
+  size_t identifier_len,
+  const char *write_name,
+  size_t write_name_len,
+  v8cffi_write_t write,
+  void *write_data,
+  unsigned int timeout_ms,
+  char **error,
+  size_t *error_len)
+{
+  v8cffi_input::Input input(
+    input_script, input_script_len, input_script_handle);
+  v8cffi_stream::Writer writer(write, write_data);
+  v8cffi_context::Context *context = AS_TYPE(v8cffi_context::Context, ctx);
+  v8cffi_timing::Call call(context->getCounters(), context->isTiming());
+  call.setBytesIn(input_script_len);
+
+  try
+  {
+    context->runScriptStream(
+      input,
+      std::string(identifier, identifier_len),
+      std::string(write_name, write_name_len),
+      writer,
+      timeout_ms);
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  call.setBytesOut(writer.getBytesWritten());
+  call.succeed();
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Run JS code producing or consuming a code cache.
+ * When the cache is empty a new one is produced into
+ * cache_output, otherwise it gets consumed.
+ * @param ctx Opaque type, instantiated Context.
+ * @param input_script JS code to be ran, must be utf-8 encoded.
+ * @param input_script_len JS code length.
+ * @param cache Code cache produced by a previous call.
+ * @param cache_len Code cache length, 0 to produce a new one.
+ * @param output Storage for the JS result, utf-8 encoded.
+ * @param output_len JS result length.
+ * @param cache_output Storage for the produced code cache.
+ * @param cache_output_len Produced code cache length.
+ * @param cache_rejected Set to 1 when V8 rejects the code cache.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code.
+ * */
+v8_code v8cffi_run_script_cached(
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  const char *identifier,
+  size_t identifier_len,
+  const char *cache,
+  size_t cache_len,
+  char **output,
+  size_t *output_len,
+  char **cache_output,
+  size_t *cache_output_len,
+  int *cache_rejected,
+  char **error,
+  size_t *error_len)
+{
+  v8cffi_result::Output output_res;
+  std::string cache_output_str;
+  bool cache_rejected_b = false;
+  v8cffi_context::Context *context = AS_TYPE(v8cffi_context::Context, ctx);
+  v8cffi_timing::Call call(context->getCounters(), context->isTiming());
+  call.setBytesIn(input_script_len);
+
+  try
+  {
+    context->runScriptCached(
+      std::string(input_script, input_script_len),
+      std::string(identifier, identifier_len),
+      std::string(cache, cache_len),
+      cache_output_str,
+      cache_rejected_b,
+      output_res);
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  *cache_rejected = cache_rejected_b ? 1 : 0;
+
+  if (!str_copy(cache_output_str, cache_output, cache_output_len))
+    return E_V8_OUT_OF_MEM_ERROR;
+
+  return complete_call(call, output_res, output, output_len);
+}
+
+
+/*
+ * @brief Set a native function as a global of the
+ * Context, calling the callback. The arguments are
+ * passed as a JSON array and the callback writes
+ * its result and its v8_result_type: text is
+ * returned as a string, JSON gets parsed and
+ * discard is undefined. The function is kept
+ * across resets.
+ * @param ctx Opaque type, instantiated Context.
+ * @param name Name of the function, must be utf-8 encoded.
+ * @param name_len Name of the function length.
+ * @param callback Called within the thread running
+ * the JS code, its result must be valid until it
+ * returns to JS. Returning non-zero throws a JS error,
+ * the result is the error message then.
+ * @param data Passed to the callback as is.
+ * It must outlive the Context.
+ * @param error Message for errors.
+ * @param error_len Error message length.
+ * @return Status code
+ * */
+v8_code v8cffi_context_add_function(
+  v8cffi_context_t *ctx,
+  const char *name,
+  size_t name_len,
+  v8cffi_callback_t callback,
+  void *data,
+  char **error,
+  size_t *error_len)
+{
+  try
+  {
+    AS_TYPE(v8cffi_context::Context, ctx)->addFunction(
+      std::string(name, name_len),
+      callback,
+      data);
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Start collecting a CPU profile.
+ * Profiles include every context within the VM.
+ * @param ctx Opaque type, instantiated Context.
+ * @param title Name of the profile, must be utf-8 encoded.
+ * @param title_len Name of the profile length.
+ * @param sampling_interval_us Microseconds between samples,
+ * 0 to keep the current interval. It must not be changed
+ * while another profile is being collected.
+ * @param error Message for errors.
+ * @param error_len Error message length.
+ * @return Status code
+ * */
+v8_code v8cffi_context_start_profiling(
+  v8cffi_context_t *ctx,
+  const char *title,
+  size_t title_len,
+  int sampling_interval_us,
+  char **error,
+  size_t *error_len)
+{
+  try
+  {
+    AS_TYPE(v8cffi_context::Context, ctx)->startProfiling(
+      std::string(title, title_len),
+      sampling_interval_us);
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Stop collecting a CPU profile.
+ * @param ctx Opaque type, instantiated Context.
+ * @param title Name of the profile, must be utf-8 encoded.
+ * @param title_len Name of the profile length.
+ * @param output Storage for the profile, in the
+ * Chrome DevTools' .cpuprofile (JSON) format.
+ * @param output_len Profile length.
+ * @param error Message for errors.
+ * @param error_len Error message length.
+ * @return Status code, unknown error
+ * if the profile was not started
+ * */
+v8_code v8cffi_context_stop_profiling(
+  v8cffi_context_t *ctx,
+  const char *title,
+  size_t title_len,
+  char **output,
+  size_t *output_len,
+  char **error,
+  size_t *error_len)
+{
+  std::string output_str;
+
+  try
+  {
+    if (!AS_TYPE(v8cffi_context::Context, ctx)->stopProfiling(
+        std::string(title, title_len),
+        output_str))
+      return E_V8_UNKNOWN_ERROR;
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  if (!str_copy(output_str, output, output_len))
+    return E_V8_OUT_OF_MEM_ERROR;
+
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Tag identifying the V8 version and flags
+ * a code cache was produced with.
+ * @return Version tag.
+ * */
+uint32_t v8cffi_cached_data_version_tag()
+{
+  return v8::ScriptCompiler::CachedDataVersionTag();
+}
+
+
+/*
+ * @brief Compile JS code to be ran many times.
+ * @param script Opaque type.
+ * @param ctx Opaque type, instantiated Context.
+ * It must outlive the script.
+ * @param input_script JS code to be compiled, must be utf-8 encoded.
+ * @param input_script_len JS code length.
+ * @param input_script_handle Pin of the JS code buffer,
+ * see v8cffi_set_release_input. It may be NULL.
+ * @param identifier Name of the script, must be utf-8 encoded.
+ * @param identifier_len Name of the script length.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code.
+ * */
+v8_code v8cffi_script_new(
+  v8cffi_script_t **script,
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  void *input_script_handle,
+  const char *identifier,
+  size_t identifier_len,
+  char **error,
+  size_t *error_len)
+{
+  v8cffi_input::Input input(
+    input_script, input_script_len, input_script_handle);
+
+  try
+  {
+    *script = AS_TYPE(v8cffi_script_t, new v8cffi_script::Script(
+      AS_TYPE(v8cffi_context::Context, ctx),
+      input,
+      std::string(identifier, identifier_len)));
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Destruct the Script.
+ * @param script Opaque type.
+ * */
+void v8cffi_script_free(v8cffi_script_t *script)
+{
+  if (!script)
+    return;
+
+  delete AS_TYPE(v8cffi_script::Script, script);
+}
+
+
+/*
+ * @brief Run a compiled script.
+ * @param script Opaque type, instantiated Script.
+ * @param result_type How the JS result is converted.
+ * @param timeout_ms Terminate the execution after
+ * this many milliseconds, 0 for no timeout.
+ * @param output Storage for the JS result, utf-8 encoded.
+ * @param output_len JS result length.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code.
+ * */
+v8_code v8cffi_script_run(
+  v8cffi_script_t *script,
+  v8_result_type result_type,
+  unsigned int timeout_ms,
+  char **output,
+  size_t *output_len,
+  char **error,
+  size_t *error_len)
+{
+  v8cffi_result::Output output_res;
+  v8cffi_context::Context *context = AS_TYPE(
+    v8cffi_script::Script, script)->getContext();
+  v8cffi_timing::Call call(context->getCounters(), context->isTiming());
+
+  try
+  {
+    AS_TYPE(v8cffi_script::Script, script)->run(
+      static_cast<v8cffi_result::ResultType>(result_type),
+      timeout_ms,
+      output_res);
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  return complete_call(call, output_res, output, output_len);
+}
+
+
+/*
+ * @brief Lookup a JS function to be called many times.
+ * @param function Opaque type.
+ * @param ctx Opaque type, instantiated Context.
+ * It must outlive the function.
+ * @param name Dotted name of the function (ie: foo.render),
+ * must be utf-8 encoded.
+ * @param name_len Name length.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code.
+ * */
+v8_code v8cffi_function_new(
+  v8cffi_function_t **function,
+  v8cffi_context_t *ctx,
+  const char *name,
+  size_t name_len,
+  char **error,
+  size_t *error_len)
+{
+  try
+  {
+    *function = AS_TYPE(v8cffi_function_t, new v8cffi_function::Function(
+      AS_TYPE(v8cffi_context::Context, ctx),
+      std::string(name, name_len)));
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  return E_V8_OK;
+}
+
+
+/*
+ * @brief Destruct the Function.
+ * @param function Opaque type.
+ * */
+void v8cffi_function_free(v8cffi_function_t *function)
+{
+  if (!function)
+    return;
+
+  delete AS_TYPE(v8cffi_function::Function, function);
+}
+
+
+/*
+ * @brief Call a JS function.
+ * @param function Opaque type, instantiated Function.
+ * @param args_json JSON array of arguments, must be utf-8 encoded.
+ * @param args_json_len JSON array length.
+ * @param args_json_handle Pin of the JSON array buffer,
+ * see v8cffi_set_release_input. It may be NULL.
+ * @param result_type How the JS result is converted.
+ * @param timeout_ms Terminate the execution after
+ * this many milliseconds, 0 for no timeout.
+ * @param output Storage for the JS result, utf-8 encoded.
+ * @param output_len JS result length.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code.
+ * */
+v8_code v8cffi_function_call(
+  v8cffi_function_t *function,
+  const char *args_json,
+  size_t args_json_len,
+  void *args_json_handle,
+  v8_result_type result_type,
+  unsigned int timeout_ms,
+  char **output,
+  size_t *output_len,
+  char **error,
+  size_t *error_len)
+{
+  v8cffi_input::Input input(args_json, args_json_len, args_json_handle);
+  v8cffi_result::Output output_res;
+  v8cffi_context::Context *context = AS_TYPE(
+    v8cffi_function::Function, function)->getContext();
+  v8cffi_timing::Call call(context->getCounters(), context->isTiming());
+  call.setBytesIn(args_json_len);
+
+  try
+  {
+    AS_TYPE(v8cffi_function::Function, function)->call(
+      input,
+      static_cast<v8cffi_result::ResultType>(result_type),
+      timeout_ms,
+      output_res);
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  return complete_call(call, output_res, output, output_len);
+}
+
+
+/*
+ * @brief Call a JS function writing the result into
+ * a caller supplied buffer. When the result does not fit,
+ * it's stored into overflow instead.
+ * @param function Opaque type, instantiated Function.
+ * @param args_json JSON array of arguments, must be utf-8 encoded.
+ * @param args_json_len JSON array length.
+ * @param args_json_handle Pin of the JSON array buffer,
+ * see v8cffi_set_release_input. It may be NULL.
+ * @param result_type How the JS result is converted.
+ * @param timeout_ms Terminate the execution after
+ * this many milliseconds, 0 for no timeout.
+ * @param buffer Storage for the JS result, utf-8 encoded.
+ * @param buffer_len Buffer capacity.
+ * @param overflow Storage for the JS result when it does
+ * not fit in the buffer, NULL otherwise.
+ * @param output_len JS result length.
+ * @param error Message for JS errors.
+ * @param error_len Error message length.
+ * @return Status code.
+ * */
+v8_code v8cffi_function_call_into(
+  v8cffi_function_t *function,
+  const char *args_json,
+  size_t args_json_len,
+  void *args_json_handle,
+  v8_result_type result_type,
+  unsigned int timeout_ms,
+  char *buffer,
+  size_t buffer_len,
+  char **overflow,
+  size_t *output_len,
+  char **error,
+  size_t *error_len)
+{
+  v8cffi_input::Input input(args_json, args_json_len, args_json_handle);
+  v8cffi_result::Output output_res(buffer, buffer_len);
+  v8cffi_context::Context *context = AS_TYPE(
+    v8cffi_function::Function, function)->getContext();
+  v8cffi_timing::Call call(context->getCounters(), context->isTiming());
+  call.setBytesIn(args_json_len);
+
+  try
+  {
+    AS_TYPE(v8cffi_function::Function, function)->call(
+      input,
+      static_cast<v8cffi_result::ResultType>(result_type),
+      timeout_ms,
+      output_res);
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  return complete_call(call, output_res, overflow, output_len);
+}
+
+
+/*
+ * Run a batch item and copy its result,
+ * or its error message, into the batch result.
+ * The caller must enter the context.
+ * */
+void run_batch_item(
+  v8cffi_context::Context *context,
+  const v8::Local<v8::Context> &v8_context,
+  const v8cffi_batch_item_t &item,
+  v8cffi_batch_result_t &result)
+{
+  v8cffi_input::Input input(item.input, item.input_len, NULL);
+  v8cffi_result::Output output;
+  v8cffi_result::ResultType result_type =
+    static_cast<v8cffi_result::ResultType>(item.result_type);
+
+  try
+  {
+    if (item.function)
+    {
+      v8cffi_function::Function *function = AS_TYPE(
+        v8cffi_function::Function, item.function);
+
+      if (function->getContext() != context)
+        throw v8cffi_exceptions::JSError(
+          "TypeError: the function belongs to another context");
+
+      function->call(v8_context, input, result_type, item.timeout_ms, output);
+    }
+    else
+      context->runScript(
+        v8_context,
+        input,
+        std::string(item.identifier, item.identifier_len),
+        result_type,
+        item.timeout_ms,
+        output);
+
+    result.code = E_V8_OK;
+  }
+  catch (...)
+  {
+    result.code = handle_error(&result.output, &result.output_len);
+    return;
+  }
+
+  v8cffi_timing::PhaseTimer timer(v8cffi_timing::kCopy);
+
+  if (!str_copy(output.getString(), &result.output, &result.output_len))
+    result.code = E_V8_OUT_OF_MEM_ERROR;
+}
+
+
+/*
+ * @brief Run many scripts and function calls
+ * back to back, entering the context once.
+ * Every item gets its own result, an item
+ * failing does not stop the batch.
+ * @param ctx Opaque type, instantiated Context.
+ * @param items Scripts to run, the ones with
+ * a function are calls to it instead, their
+ * input is the JSON array of arguments then.
+ * The functions must belong to the Context.
+ * The inputs are not pinned.
+ * @param items_len Number of items.
+ * @param results Storage for the results, as many
+ * as items. The output is the JS result, or the
+ * error message when the code is not E_V8_OK.
+ * Caller must free every output.
+ * @param error Message for errors.
+ * @param error_len Error message length.
+ * @return Status code, the batch is not ran on error.
+ * */
+v8_code v8cffi_run_batch(
+  v8cffi_context_t *ctx,
+  const v8cffi_batch_item_t *items,
+  size_t items_len,
+  v8cffi_batch_result_t *results,
+  char **error,
+  size_t *error_len)
+{
+  v8cffi_context::Context *context = AS_TYPE(v8cffi_context::Context, ctx);
+  v8cffi_timing::Call call(context->getCounters(), context->isTiming());
+  size_t bytes_in = 0;
+
+  for (size_t i = 0; i < items_len; i++)
+  {
+    results[i].code = E_V8_UNKNOWN_ERROR;
+    results[i].output = NULL;
+    results[i].output_len = 0;
+    bytes_in += items[i].input_len;
+  }
+
+  call.setBytesIn(bytes_in);
+
+  try
+  {
+    context->runBatch(
+      items_len,
+      [&](const v8::Local<v8::Context> &v8_context, size_t i)
+      {
+        run_batch_item(context, v8_context, items[i], results[i]);
+      });
+  }
+  catch (...)
+  {
+    return handle_error(error, error_len);
+  }
+
+  size_t bytes_out = 0;
+  bool is_ok = true;
+
+  for (size_t i = 0; i < items_len; i++)
+  {
+    if (results[i].code != E_V8_OK)
+      is_ok = false;
+    else
+      bytes_out += results[i].output_len;
+  }
+
+  call.setBytesOut(bytes_out);
+
+  if (is_ok)
+    call.succeed();
+
+  return E_V8_OK;
+}
+
+
+/*
+ * Fill the C counters
+ * */
+void counters_copy(
+  const v8cffi_timing::Totals &totals,
+  v8cffi_counters_t *counters)
+{
+  counters->calls = totals.calls;
+  counters->errors = totals.errors;
+  counters->bytes_in = totals.bytes_in;
+  counters->bytes_out = totals.bytes_out;
+  counters->input_ns = totals.phases_ns[v8cffi_timing::kInput];
+  counters->compile_ns = totals.phases_ns[v8cffi_timing::kCompile];
+  counters->run_ns = totals.phases_ns[v8cffi_timing::kRun];
+  counters->output_ns = totals.phases_ns[v8cffi_timing::kOutput];
+  counters->copy_ns = totals.phases_ns[v8cffi_timing::kCopy];
+}
+
+
+/*
+ * @brief Instrument the calls of every context.
+ * Calls running scripts and functions get timed
+ * by phase: input conversion, compilation, run,
+ * result conversion and the copy out.
+ * @param is_enabled 1 to enable, 0 to disable.
+ * */
+void v8cffi_set_timing(int is_enabled)
+{
+  v8cffi_timing::setEnabled(is_enabled != 0);
+}
+
+
+/*
+ * @brief Instrument the calls ran within the Context,
+ * see v8cffi_set_timing.
+ * @param ctx Opaque type, instantiated Context.
+ * @param is_enabled 1 to enable, 0 to disable.
+ * */
+void v8cffi_context_set_timing(v8cffi_context_t *ctx, int is_enabled)
+{
+  AS_TYPE(v8cffi_context::Context, ctx)->setTiming(is_enabled != 0);
+}
+
+
+/*
+ * @brief Get the timings of the last instrumented
+ * call done by the calling thread.
+ * @param timing Storage for the timings.
+ * @return 1 if there was a call, 0 otherwise.
+ * */
+int v8cffi_last_timing(v8cffi_timing_t *timing)
+{
+  v8cffi_timing::Record record;
+
+  if (!v8cffi_timing::getLastRecord(record))
+    return 0;
+
+  timing->input_ns = record.phases_ns[v8cffi_timing::kInput];
+  timing->compile_ns = record.phases_ns[v8cffi_timing::kCompile];
+  timing->run_ns = record.phases_ns[v8cffi_timing::kRun];
+  timing->output_ns = record.phases_ns[v8cffi_timing::kOutput];
+  timing->copy_ns = record.phases_ns[v8cffi_timing::kCopy];
+  timing->bytes_in = record.bytes_in;
+  timing->bytes_out = record.bytes_out;
+  timing->is_error = record.is_error ? 1 : 0;
+  return 1;
+}
+
+
+/*
+ * @brief Get the cumulative counters
+ * of every instrumented call.
+ * @param counters Storage for the counters.
+ * */
+void v8cffi_counters(v8cffi_counters_t *counters)
+{
+  counters_copy(v8cffi_timing::getCounters().read(), counters);
+}
+
+
+/*
+ * @brief Get the cumulative counters of the
+ * instrumented calls ran within the Context.
+ * @param ctx Opaque type, instantiated Context.
+ * @param counters Storage for the counters.
+ * */
+void v8cffi_context_counters(
+  v8cffi_context_t *ctx,
+  v8cffi_counters_t *counters)
+{
+  counters_copy(
+    AS_TYPE(v8cffi_context::Context, ctx)->getCounters().read(),
+    counters);
+}
@@ -19,6 +19,9 @@
 #  endif
 #endif
 
+#include <stddef.h>
+#include <stdint.h>
+
 #ifdef __cplusplus
 extern "C"
 {
@@ -30,42 +33,325 @@ typedef enum
   E_V8_OK = 0,
   E_V8_OUT_OF_MEM_ERROR,
   E_V8_JS_ERROR,
-  E_V8_UNKNOWN_ERROR
+  E_V8_UNKNOWN_ERROR,
+  E_V8_TIMEOUT_ERROR,
+  E_V8_PINNED_ERROR,
+  E_V8_STALE_ERROR
 } v8_code;
 
+typedef enum
+{
+  V8_RESULT_TEXT = 0,
+  V8_RESULT_JSON,
+  V8_RESULT_DISCARD
+} v8_result_type;
+
 V8CFFI_API void v8cffi_free(void *ptr);
 
+typedef void (*v8cffi_release_t)(void *handle);
+
+V8CFFI_API void v8cffi_set_release_input(v8cffi_release_t release);
+
 typedef struct v8cffi_platform_s v8cffi_platform_t;
 
 V8CFFI_API v8_code v8cffi_platform_new(
   v8cffi_platform_t **platform,
-  const char *natives_blob,
-  size_t natives_blob_len,
-  const char *snapshot_blob,
-  size_t snapshot_blob_len);
+  const char *natives_path,
+  size_t natives_path_len,
+  const char *snapshot_path,
+  size_t snapshot_path_len);
 V8CFFI_API void v8cffi_platform_free(v8cffi_platform_t *platform);
 
+V8CFFI_API v8_code v8cffi_snapshot_new(
+  const char *source,
+  size_t source_len,
+  char **output,
+  size_t *output_len,
+  char **error,
+  size_t *error_len);
+
 typedef struct v8cffi_vm_s v8cffi_vm_t;
 
-V8CFFI_API v8_code v8cffi_vm_new(v8cffi_vm_t **vm);
+V8CFFI_API v8_code v8cffi_vm_new(
+  v8cffi_vm_t **vm,
+  const char *snapshot_path,
+  size_t snapshot_path_len,
+  int max_semi_space_size,
+  int max_old_space_size,
+  int max_executable_size);
 V8CFFI_API void v8cffi_vm_free(v8cffi_vm_t *vm);
 
+typedef struct
+{
+  size_t total_heap_size;
+  size_t total_heap_size_executable;
+  size_t total_physical_size;
+  size_t total_available_size;
+  size_t used_heap_size;
+  size_t heap_size_limit;
+  int64_t external_memory;
+} v8cffi_heap_stats_t;
+
+V8CFFI_API v8_code v8cffi_vm_heap_stats(
+  v8cffi_vm_t *vm,
+  v8cffi_heap_stats_t *stats);
+V8CFFI_API v8_code v8cffi_vm_idle_notification(
+  v8cffi_vm_t *vm,
+  double deadline_ms,
+  int *is_done);
+V8CFFI_API v8_code v8cffi_vm_low_memory_notification(v8cffi_vm_t *vm);
+V8CFFI_API v8_code v8cffi_vm_write_heap_snapshot(
+  v8cffi_vm_t *vm,
+  int fd,
+  int *error_number);
+V8CFFI_API v8_code v8cffi_vm_error_details(
+  v8cffi_vm_t *vm,
+  unsigned int error_id,
+  char **details,
+  size_t *details_len);
+V8CFFI_API v8_code v8cffi_vm_pin(v8cffi_vm_t *vm);
+V8CFFI_API v8_code v8cffi_vm_unpin(v8cffi_vm_t *vm);
+
 typedef struct v8cffi_context_s v8cffi_context_t;
 
 V8CFFI_API v8_code v8cffi_context_new(v8cffi_context_t **ctx, v8cffi_vm_t *vm);
 V8CFFI_API void v8cffi_context_free(v8cffi_context_t *ctx);
+V8CFFI_API v8_code v8cffi_context_reset(
+  v8cffi_context_t *ctx,
+  char **error,
+  size_t *error_len);
+V8CFFI_API v8_code v8cffi_context_load_lib(
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  const char *identifier,
+  size_t identifier_len,
+  int use_cache,
+  const char *cache,
+  size_t cache_len,
+  char **cache_output,
+  size_t *cache_output_len,
+  int *cache_rejected,
+  char **error,
+  size_t *error_len);
+
+typedef int (*v8cffi_callback_t)(
+  void *data,
+  const char *args_json,
+  size_t args_json_len,
+  const char **result,
+  size_t *result_len,
+  int *result_type);
+
+V8CFFI_API v8_code v8cffi_context_add_function(
+  v8cffi_context_t *ctx,
+  const char *name,
+  size_t name_len,
+  v8cffi_callback_t callback,
+  void *data,
+  char **error,
+  size_t *error_len);
+
+V8CFFI_API v8_code v8cffi_context_start_profiling(
+  v8cffi_context_t *ctx,
+  const char *title,
+  size_t title_len,
+  int sampling_interval_us,
+  char **error,
+  size_t *error_len);
+V8CFFI_API v8_code v8cffi_context_stop_profiling(
+  v8cffi_context_t *ctx,
+  const char *title,
+  size_t title_len,
+  char **output,
+  size_t *output_len,
+  char **error,
+  size_t *error_len);
 
 V8CFFI_API v8_code v8cffi_run_script(
   v8cffi_context_t *ctx,
   const char *input_script,
   size_t input_script_len,
+  void *input_script_handle,
   const char *identifier,
   size_t identifier_len,
+  v8_result_type result_type,
+  unsigned int timeout_ms,
   char **output,
   size_t *output_len,
   char **error,
   size_t *error_len);
 
+V8CFFI_API v8_code v8cffi_run_script_into(
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  void *input_script_handle,
+  const char *identifier,
+  size_t identifier_len,
+  v8_result_type result_type,
+  unsigned int timeout_ms,
+  char *buffer,
+  size_t buffer_len,
+  char **overflow,
+  size_t *output_len,
+  char **error,
+  size_t *error_len);
+
+typedef int (*v8cffi_write_t)(void *data, const char *chunk, size_t chunk_len);
+
+V8CFFI_API v8_code v8cffi_run_script_stream(
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  void *input_script_handle,
+  const char *identifier,
+  size_t identifier_len,
+  const char *write_name,
+  size_t write_name_len,
+  v8cffi_write_t write,
+  void *write_data,
+  unsigned int timeout_ms,
+  char **error,
+  size_t *error_len);
+
+V8CFFI_API v8_code v8cffi_run_script_cached(
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  const char *identifier,
+  size_t identifier_len,
+  const char *cache,
+  size_t cache_len,
+  char **output,
+  size_t *output_len,
+  char **cache_output,
+  size_t *cache_output_len,
+  int *cache_rejected,
+  char **error,
+  size_t *error_len);
+
+V8CFFI_API uint32_t v8cffi_cached_data_version_tag(void);
+
+typedef struct v8cffi_script_s v8cffi_script_t;
+
+V8CFFI_API v8_code v8cffi_script_new(
+  v8cffi_script_t **script,
+  v8cffi_context_t *ctx,
+  const char *input_script,
+  size_t input_script_len,
+  void *input_script_handle,
+  const char *identifier,
+  size_t identifier_len,
+  char **error,
+  size_t *error_len);
+V8CFFI_API void v8cffi_script_free(v8cffi_script_t *script);
+
+V8CFFI_API v8_code v8cffi_script_run(
+  v8cffi_script_t *script,
+  v8_result_type result_type,
+  unsigned int timeout_ms,
+  char **output,
+  size_t *output_len,
+  char **error,
+  size_t *error_len);
+
+typedef struct v8cffi_function_s v8cffi_function_t;
+
+V8CFFI_API v8_code v8cffi_function_new(
+  v8cffi_function_t **function,
+  v8cffi_context_t *ctx,
+  const char *name,
+  size_t name_len,
+  char **error,
+  size_t *error_len);
+V8CFFI_API void v8cffi_function_free(v8cffi_function_t *function);
+
+V8CFFI_API v8_code v8cffi_function_call(
+  v8cffi_function_t *function,
+  const char *args_json,
+  size_t args_json_len,
+  void *args_json_handle,
+  v8_result_type result_type,
+  unsigned int timeout_ms,
+  char **output,
+  size_t *output_len,
+  char **error,
+  size_t *error_len);
+
+V8CFFI_API v8_code v8cffi_function_call_into(
+  v8cffi_function_t *function,
+  const char *args_json,
+  size_t args_json_len,
+  void *args_json_handle,
+  v8_result_type result_type,
+  unsigned int timeout_ms,
+  char *buffer,
+  size_t buffer_len,
+  char **overflow,
+  size_t *output_len,
+  char **error,
+  size_t *error_len);
+
+typedef struct
+{
+  const char *input;
+  size_t input_len;
+  const char *identifier;
+  size_t identifier_len;
+  v8cffi_function_t *function;
+  v8_result_type result_type;
+  unsigned int timeout_ms;
+} v8cffi_batch_item_t;
+
+typedef struct
+{
+  v8_code code;
+  char *output;
+  size_t output_len;
+} v8cffi_batch_result_t;
+
+V8CFFI_API v8_code v8cffi_run_batch(
+  v8cffi_context_t *ctx,
+  const v8cffi_batch_item_t *items,
+  size_t items_len,
+  v8cffi_batch_result_t *results,
+  char **error,
+  size_t *error_len);
+
+typedef struct
+{
+  uint64_t input_ns;
+  uint64_t compile_ns;
+  uint64_t run_ns;
+  uint64_t output_ns;
+  uint64_t copy_ns;
+  uint64_t bytes_in;
+  uint64_t bytes_out;
+  int is_error;
+} v8cffi_timing_t;
+
+typedef struct
+{
+  uint64_t calls;
+  uint64_t errors;
+  uint64_t bytes_in;
+  uint64_t bytes_out;
+  uint64_t input_ns;
+  uint64_t compile_ns;
+  uint64_t run_ns;
+  uint64_t output_ns;
+  uint64_t copy_ns;
+} v8cffi_counters_t;
+
+V8CFFI_API void v8cffi_set_timing(int is_enabled);
+V8CFFI_API void v8cffi_context_set_timing(v8cffi_context_t *ctx, int is_enabled);
+V8CFFI_API int v8cffi_last_timing(v8cffi_timing_t *timing);
+V8CFFI_API void v8cffi_counters(v8cffi_counters_t *counters);
+V8CFFI_API void v8cffi_context_counters(
+  v8cffi_context_t *ctx,
+  v8cffi_counters_t *counters);
+
 #ifdef __cplusplus
 }
 #endif
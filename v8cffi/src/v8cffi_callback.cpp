@@ -0,0 +1,169 @@
+#include "v8cffi_exceptions.h"
+#include "v8cffi_utils.h"
+#include "v8cffi_result.h"
+#include "v8cffi_callback.h"
+
+using namespace v8cffi_callback;
+
+
+Callback::Callback(
+  v8::Isolate *isolate,
+  const std::string &name,
+  CallbackFn callback,
+  void *data)
+{
+  m_name = name;
+  m_callback = callback;
+  m_data = data;
+
+  v8::Local<v8::FunctionTemplate> function_template = v8::FunctionTemplate::New(
+    isolate, call, v8::External::New(isolate, this));
+  function_template->SetClassName(v8cffi_utils::toV8String(isolate, m_name));
+  m_template.Reset(isolate, function_template);
+}
+
+
+Callback::~Callback()
+{
+  m_template.Reset();
+}
+
+
+/*
+ * Set the function as a global of
+ * the contexts created from the template.
+ * */
+void Callback::install(
+  v8::Isolate *isolate,
+  const v8::Local<v8::ObjectTemplate> &global_template)
+{
+  global_template->Set(
+    v8cffi_utils::toV8String(isolate, m_name),
+    v8::Local<v8::FunctionTemplate>::New(isolate, m_template));
+}
+
+
+/*
+ * Set the function as a global of a context
+ * created before the function was added.
+ * The callback must outlive the context.
+ * The caller must enter the context.
+ * */
+void Callback::install(
+  v8::Isolate *isolate,
+  const v8::Local<v8::Context> &context)
+{
+  v8::Local<v8::Function> function = v8::Local<v8::FunctionTemplate>::New(
+    isolate, m_template)->GetFunction(context).ToLocalChecked();
+  context->Global()->Set(
+    context,
+    v8cffi_utils::toV8String(isolate, m_name),
+    function).FromJust();
+}
+
+
+/*
+ * Serialize the arguments, call the callback
+ * and parse its result. Failures are thrown as
+ * JS errors, C++ exceptions must not go
+ * through the JS frames.
+ * */
+void Callback::call(const v8::FunctionCallbackInfo<v8::Value> &info)
+{
+  v8::Isolate *isolate = info.GetIsolate();
+  v8::Local<v8::Context> context = isolate->GetCurrentContext();
+  Callback *callback = static_cast<Callback *>(
+    info.Data().As<v8::External>()->Value());
+  v8cffi_result::Output args_json;
+  std::string error;
+
+  {
+    v8::TryCatch try_catch;
+    v8::Local<v8::Array> args = v8::Array::New(isolate, info.Length());
+
+    for (int i = 0; i < info.Length(); i++)
+      args->Set(context, i, info[i]).FromJust();
+
+    try
+    {
+      args_json.write(
+        isolate, context, args, try_catch, v8cffi_result::kJSON);
+    }
+    catch (const v8cffi_exceptions::JSError &e)
+    {
+      if (try_catch.HasCaught())
+      {
+        // ie: toJSON threw, keep the original exception
+        try_catch.ReThrow();
+        return;
+      }
+
+      error = e.getMessage();
+    }
+    catch (...)
+    {
+      error = "Error: Arguments could not be serialized";
+    }
+  }
+
+  if (!error.empty())
+  {
+    isolate->ThrowException(v8::Exception::Error(
+      v8cffi_utils::toV8String(isolate, error)));
+    return;
+  }
+
+  const char *result = nullptr;
+  size_t result_len = 0;
+  int result_type = v8cffi_result::kDiscard;
+  int failed = callback->m_callback(
+    callback->m_data,
+    args_json.getString().data(),
+    args_json.length(),
+    &result,
+    &result_len,
+    &result_type);
+
+  if (failed)
+  {
+    if (result)
+      error.assign(result, result_len);
+    else
+      error = "Callback failed";
+
+    isolate->ThrowException(v8::Exception::Error(
+      v8cffi_utils::toV8String(isolate, error)));
+    return;
+  }
+
+  if (result_type == v8cffi_result::kDiscard)
+    return;  // undefined
+
+  v8::MaybeLocal<v8::String> result_str = v8::String::NewFromUtf8(
+    isolate,
+    result ? result : "",
+    v8::NewStringType::kNormal,
+    static_cast<int>(result_len));
+
+  if (result_str.IsEmpty())
+  {
+    isolate->ThrowException(v8::Exception::RangeError(
+      v8cffi_utils::toV8String(isolate, "Callback result is too long")));
+    return;
+  }
+
+  // Strings are returned as is, without a JSON round trip
+  if (result_type == v8cffi_result::kText)
+  {
+    info.GetReturnValue().Set(result_str.ToLocalChecked());
+    return;
+  }
+
+  v8::MaybeLocal<v8::Value> result_maybe = v8::JSON::Parse(
+    isolate, result_str.ToLocalChecked());
+
+  if (result_maybe.IsEmpty())
+    return;  // SyntaxError is pending
+
+  info.GetReturnValue().Set(result_maybe.ToLocalChecked());
+}
@@ -0,0 +1,63 @@
+#ifndef V8CFFI_CALLBACK_H_INCLUDED
+#define V8CFFI_CALLBACK_H_INCLUDED
+
+#include <string.h>
+#include <string>
+
+#include "include/libplatform/libplatform.h"
+#include "include/v8.h"
+
+
+namespace v8cffi_callback
+{
+  // Return non-zero on error, the result
+  // is the error message then. The result
+  // type is a v8cffi_result::ResultType
+  typedef int (*CallbackFn)(
+    void *data,
+    const char *args_json,
+    size_t args_json_len,
+    const char **result,
+    size_t *result_len,
+    int *result_type);
+
+  /*
+   * Native JS function passing its arguments
+   * to the callback as a JSON array. The result
+   * of the callback is returned to JS as a
+   * string, parsed as JSON or as undefined.
+   * The function template is created once,
+   * contexts are created with it set up.
+   * */
+  class Callback
+  {
+    public:
+      Callback(
+        v8::Isolate *isolate,
+        const std::string &name,
+        CallbackFn callback,
+        void *data);
+      ~Callback();
+      void install(
+        v8::Isolate *isolate,
+        const v8::Local<v8::ObjectTemplate> &global_template);
+      void install(
+        v8::Isolate *isolate,
+        const v8::Local<v8::Context> &context);
+
+    private:
+      // Prevent copying. Not implemented.
+      Callback(const Callback&);
+      Callback& operator=(const Callback&);
+
+      static void call(const v8::FunctionCallbackInfo<v8::Value> &info);
+
+      std::string m_name;
+      CallbackFn m_callback = nullptr;
+      void *m_data = nullptr;
+      v8::Global<v8::FunctionTemplate> m_template;
+  };
+}
+
+
+#endif
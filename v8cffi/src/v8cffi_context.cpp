@@ -1,6 +1,9 @@
 #include "v8cffi_exceptions.h"
+#include "v8cffi_pin.h"
 #include "v8cffi_utils.h"
 #include "v8cffi_trace_back.h"
+#include "v8cffi_watchdog.h"
+#include "v8cffi_profiler.h"
 #include "v8cffi_context.h"
 
 using namespace v8cffi_context;
@@ -10,47 +13,539 @@ Context::Context(v8::Isolate *isolate)
 {
   m_isolate = isolate;
 
-  v8::Locker l(m_isolate);
+  v8cffi_pin::Lock l(m_isolate);
   v8::Isolate::Scope isolate_scope(m_isolate);
   v8::HandleScope handle_scope(m_isolate);
-  m_pers_context.Reset(m_isolate, v8::Context::New(m_isolate));
+  v8::Local<v8::ObjectTemplate> global_template = v8::ObjectTemplate::New(
+    m_isolate);
+  m_global_template.Reset(m_isolate, global_template);
+  m_pers_context.Reset(
+    m_isolate, v8::Context::New(m_isolate, nullptr, global_template));
 }
 
 
 Context::~Context() {
+  m_libs.clear();
   m_pers_context.Reset();
+  m_global_template.Reset();
+  m_callbacks.clear();
   // isolate gets disposed elsewhere
 }
 
 
-std::string Context::runScript(
+/*
+ * Replace the context by a new one, built
+ * from the context's template: the global scope
+ * is deserialized from the isolate's startup
+ * snapshot, with the native functions set by
+ * the global template, and the libs are ran again. The libs are kept
+ * compiled, they are not parsed again.
+ * The current context is kept when a lib fails.
+ * Scripts and functions created before
+ * this are stale afterwards.
+ * */
+void Context::reset()
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8::Local<v8::Context> context = v8::Context::New(
+    m_isolate,
+    nullptr,
+    v8::Local<v8::ObjectTemplate>::New(m_isolate, m_global_template));
+  v8::Context::Scope context_scope(context);
+
+  for (auto &lib : m_libs)
+  {
+    v8::TryCatch try_catch;
+    v8cffi_result::Output output;
+    v8::Local<v8::Script> script = v8::Local<v8::UnboundScript>::New(
+      m_isolate, lib)->BindToCurrentContext();
+    run(context, script, try_catch, v8cffi_result::kDiscard, 0, output);
+  }
+
+  m_pers_context.Reset(m_isolate, context);
+  m_generation++;
+}
+
+
+/*
+ * Run a lib and keep it as part of
+ * the context's template. It's compiled
+ * once, see runScriptCached for the cache
+ * parameters, they are ignored
+ * unless use_cache is set.
+ * */
+void Context::loadLib(
   const std::string &input_script,
-  const std::string &identifier)
+  const std::string &identifier,
+  bool use_cache,
+  const std::string &cache_input,
+  std::string &cache_output,
+  bool &cache_rejected)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8::Local<v8::Context> context = v8::Local<v8::Context>::New(
+    m_isolate, m_pers_context);  // Materialize the persistent context
+  v8::Context::Scope context_scope(context);
+  v8::TryCatch try_catch;
+  v8::Local<v8::Script> script = compileCached(
+    context,
+    input_script,
+    identifier,
+    use_cache,
+    cache_input,
+    cache_output,
+    cache_rejected,
+    try_catch);
+  v8cffi_result::Output output;
+  run(context, script, try_catch, v8cffi_result::kDiscard, 0, output);
+  m_libs.emplace_back(m_isolate, script->GetUnboundScript());
+}
+
+
+/*
+ * Set a native function calling the callback
+ * as a global. The global template is replaced
+ * by one having the function too, so the contexts
+ * created on reset have it set up. Templates
+ * are not changed once they are used.
+ * */
+void Context::addFunction(
+  const std::string &name,
+  v8cffi_callback::CallbackFn callback,
+  void *data)
 {
-  v8::Locker l(m_isolate);
+  v8cffi_pin::Lock l(m_isolate);
   v8::Isolate::Scope isolate_scope(m_isolate);
   v8::HandleScope handle_scope(m_isolate);
   v8::Local<v8::Context> context = v8::Local<v8::Context>::New(
     m_isolate, m_pers_context);  // Materialize the persistent context
   v8::Context::Scope context_scope(context);
-  v8::Local<v8::String> source = v8cffi_utils::toV8String(m_isolate, input_script);
+
+  m_callbacks.emplace_back(
+    new v8cffi_callback::Callback(m_isolate, name, callback, data));
+  m_callbacks.back()->install(m_isolate, context);
+
+  v8::Local<v8::ObjectTemplate> global_template = v8::ObjectTemplate::New(
+    m_isolate);
+
+  for (auto &cb : m_callbacks)
+    cb->install(m_isolate, global_template);
+
+  m_global_template.Reset(m_isolate, global_template);
+}
+
+
+/*
+ * Start collecting a CPU profile. The profiler
+ * is shared by every context within the VM.
+ * */
+void Context::startProfiling(
+  const std::string &title,
+  int sampling_interval_us)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8cffi_profiler::start(m_isolate, title, sampling_interval_us);
+}
+
+
+/*
+ * Stop collecting a CPU profile and write
+ * it into the output as a .cpuprofile
+ * */
+bool Context::stopProfiling(const std::string &title, std::string &output)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  return v8cffi_profiler::stop(m_isolate, title, output);
+}
+
+
+void Context::runScript(
+  v8cffi_input::Input &input_script,
+  const std::string &identifier,
+  v8cffi_result::ResultType result_type,
+  unsigned int timeout_ms,
+  v8cffi_result::Output &output)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8::Local<v8::Context> context = v8::Local<v8::Context>::New(
+    m_isolate, m_pers_context);  // Materialize the persistent context
+  v8::Context::Scope context_scope(context);
+
+  runScript(
+    context,
+    input_script,
+    identifier,
+    result_type,
+    timeout_ms,
+    output);
+}
+
+
+/*
+ * Compile and run the script.
+ * The caller must enter the context.
+ * */
+void Context::runScript(
+  const v8::Local<v8::Context> &context,
+  v8cffi_input::Input &input_script,
+  const std::string &identifier,
+  v8cffi_result::ResultType result_type,
+  unsigned int timeout_ms,
+  v8cffi_result::Output &output)
+{
+  v8::TryCatch try_catch;
+
+  run(
+    context,
+    compile(context, input_script, identifier, try_catch),
+    try_catch,
+    result_type,
+    timeout_ms,
+    output);
+}
+
+
+/*
+ * Enter the context once and run every
+ * item back to back. Each item gets its
+ * own handle scope, so the handles of
+ * an item are released once it's done.
+ * */
+void Context::runBatch(size_t items_len, const BatchFn &run_item)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8::Local<v8::Context> context = v8::Local<v8::Context>::New(
+    m_isolate, m_pers_context);  // Materialize the persistent context
+  v8::Context::Scope context_scope(context);
+
+  for (size_t i = 0; i < items_len; i++)
+  {
+    v8::HandleScope item_handle_scope(m_isolate);
+    run_item(context, i);
+  }
+}
+
+
+/*
+ * Run the script with a native function
+ * set as the global write_name, for the
+ * script to stream its output through it.
+ * The global is restored afterwards.
+ * */
+void Context::runScriptStream(
+  v8cffi_input::Input &input_script,
+  const std::string &identifier,
+  const std::string &write_name,
+  v8cffi_stream::Writer &writer,
+  unsigned int timeout_ms)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8::Local<v8::Context> context = v8::Local<v8::Context>::New(
+    m_isolate, m_pers_context);  // Materialize the persistent context
+  v8::Context::Scope context_scope(context);
+  v8::TryCatch try_catch;
+  v8::Local<v8::Script> script = compile(
+    context, input_script, identifier, try_catch);
+
+  v8::Local<v8::Object> global = context->Global();
+  v8::Local<v8::String> name = v8cffi_utils::toV8String(m_isolate, write_name);
+  bool has_previous = global->HasOwnProperty(context, name).FromJust();
+  v8::Local<v8::Value> previous = global->Get(
+    context, name).ToLocalChecked();
+  global->Set(
+    context, name, writer.toV8Function(m_isolate, context)).FromJust();
+  v8cffi_result::Output output;
+  writer.open();
+
+  try
+  {
+    run(
+      context,
+      script,
+      try_catch,
+      v8cffi_result::kDiscard,
+      timeout_ms,
+      output);
+  }
+  catch (...)
+  {
+    writer.close();
+    restoreGlobal(context, name, has_previous, previous);
+    throw;
+  }
+
+  writer.close();
+  restoreGlobal(context, name, has_previous, previous);
+}
+
+
+/*
+ * Compile the script.
+ * The caller must enter the context.
+ * */
+v8::Local<v8::Script> Context::compile(
+  const v8::Local<v8::Context> &context,
+  v8cffi_input::Input &input_script,
+  const std::string &identifier,
+  const v8::TryCatch &try_catch)
+{
+  v8::Local<v8::String> source;
+
+  {
+    v8cffi_timing::PhaseTimer timer(v8cffi_timing::kInput);
+    source = input_script.toV8String(m_isolate);
+  }
+
   v8::ScriptOrigin origin(v8cffi_utils::toV8String(m_isolate, identifier));
+  v8::MaybeLocal<v8::Script> script_maybe;
+
+  {
+    v8cffi_timing::PhaseTimer timer(v8cffi_timing::kCompile);
+    script_maybe = v8::Script::Compile(context, source, &origin);
+  }
+
+  if (script_maybe.IsEmpty())
+    throw v8cffi_trace_back::toJSError(m_isolate, try_catch);
+
+  return script_maybe.ToLocalChecked();
+}
+
+
+/*
+ * Set a global back to its previous
+ * value, or delete it if there was none.
+ * The caller must enter the context.
+ * */
+void Context::restoreGlobal(
+  const v8::Local<v8::Context> &context,
+  const v8::Local<v8::String> &name,
+  bool has_previous,
+  const v8::Local<v8::Value> &previous)
+{
+  v8::Local<v8::Object> global = context->Global();
+
+  if (has_previous)
+    global->Set(context, name, previous).FromJust();
+  else
+    global->Delete(context, name).FromJust();
+}
+
+
+/*
+ * Compile the script consuming the cache_input
+ * when it's not empty, otherwise a new code cache
+ * is produced and stored into cache_output.
+ * */
+void Context::runScriptCached(
+  const std::string &input_script,
+  const std::string &identifier,
+  const std::string &cache_input,
+  std::string &cache_output,
+  bool &cache_rejected,
+  v8cffi_result::Output &output)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8::Local<v8::Context> context = v8::Local<v8::Context>::New(
+    m_isolate, m_pers_context);  // Materialize the persistent context
+  v8::Context::Scope context_scope(context);
   v8::TryCatch try_catch;
-  v8::MaybeLocal<v8::Script> script_maybe = v8::Script::Compile(
-    context, source, &origin);
+  v8::Local<v8::Script> script = compileCached(
+    context,
+    input_script,
+    identifier,
+    true,
+    cache_input,
+    cache_output,
+    cache_rejected,
+    try_catch);
+
+  run(
+    context,
+    script,
+    try_catch,
+    v8cffi_result::kText,
+    0,
+    output);
+}
+
+
+/*
+ * Compile a script, consuming the code cache
+ * if there is one or producing it otherwise.
+ * No code cache is used unless use_cache is set.
+ * The caller must enter the context.
+ * */
+v8::Local<v8::Script> Context::compileCached(
+  const v8::Local<v8::Context> &context,
+  const std::string &input_script,
+  const std::string &identifier,
+  bool use_cache,
+  const std::string &cache_input,
+  std::string &cache_output,
+  bool &cache_rejected,
+  const v8::TryCatch &try_catch)
+{
+  v8::ScriptOrigin origin(v8cffi_utils::toV8String(m_isolate, identifier));
+
+  v8::ScriptCompiler::CompileOptions options =
+    v8::ScriptCompiler::kNoCompileOptions;
+  v8::ScriptCompiler::CachedData *cached_data = nullptr;
+
+  if (use_cache)
+    options = v8::ScriptCompiler::kProduceCodeCache;
+
+  if (use_cache && !cache_input.empty())
+  {
+    options = v8::ScriptCompiler::kConsumeCodeCache;
+    // The buffer is not owned, cache_input outlives the source
+    cached_data = new v8::ScriptCompiler::CachedData(
+      reinterpret_cast<const uint8_t *>(cache_input.data()),
+      static_cast<int>(cache_input.length()));
+  }
+
+  v8::Local<v8::String> source_str;
+
+  {
+    v8cffi_timing::PhaseTimer timer(v8cffi_timing::kInput);
+    source_str = v8cffi_utils::toV8String(m_isolate, input_script);
+  }
+
+  // Source takes ownership of the cached_data
+  v8::ScriptCompiler::Source source(source_str, origin, cached_data);
+  v8::MaybeLocal<v8::Script> script_maybe;
+
+  {
+    v8cffi_timing::PhaseTimer timer(v8cffi_timing::kCompile);
+    script_maybe = v8::ScriptCompiler::Compile(context, &source, options);
+  }
 
   if (script_maybe.IsEmpty())
-    throw v8cffi_exceptions::JSError(
-      v8cffi_trace_back::prettyTraceBack(m_isolate, try_catch));
+    throw v8cffi_trace_back::toJSError(m_isolate, try_catch);
+
+  cache_rejected = false;
+  cache_output.clear();
+
+  if (cached_data)
+    cache_rejected = cached_data->rejected;
+  else if (source.GetCachedData())
+    cache_output.assign(
+      reinterpret_cast<const char *>(source.GetCachedData()->data),
+      source.GetCachedData()->length);
+
+  return script_maybe.ToLocalChecked();
+}
+
+
+/*
+ * Run a compiled script and write the result
+ * into the output, converted as result_type says.
+ * The execution is terminated after timeout_ms,
+ * 0 means no timeout.
+ * The caller must enter the context.
+ * */
+void Context::run(
+  const v8::Local<v8::Context> &context,
+  const v8::Local<v8::Script> &script,
+  const v8::TryCatch &try_catch,
+  v8cffi_result::ResultType result_type,
+  unsigned int timeout_ms,
+  v8cffi_result::Output &output)
+{
+  v8cffi_watchdog::Deadline deadline(m_isolate, timeout_ms);
+
+  try
+  {
+    v8::MaybeLocal<v8::Value> result_maybe;
+
+    {
+      v8cffi_timing::PhaseTimer timer(v8cffi_timing::kRun);
+      result_maybe = script->Run(context);
+    }
+
+    if (result_maybe.IsEmpty())
+      throw v8cffi_trace_back::toJSError(m_isolate, try_catch);
+
+    v8cffi_timing::PhaseTimer timer(v8cffi_timing::kOutput);
+    output.write(
+      m_isolate,
+      context,
+      result_maybe.ToLocalChecked(),
+      try_catch,
+      result_type);
+  }
+  catch (const v8cffi_exceptions::JSError &e)
+  {
+    if (deadline.hasExpired())
+      throw v8cffi_exceptions::TimeoutError();
+
+    throw;
+  }
+}
+
+
+v8::Isolate *Context::getIsolate()
+{
+  return m_isolate;
+}
+
+
+/*
+ * The generation changes on every reset.
+ * The caller must hold the isolate lock.
+ * */
+unsigned long Context::getGeneration()
+{
+  return m_generation;
+}
+
+
+/*
+ * Return the materialized context.
+ * The caller must hold the isolate
+ * lock and a handle scope.
+ * */
+v8::Local<v8::Context> Context::getContext()
+{
+  return v8::Local<v8::Context>::New(m_isolate, m_pers_context);
+}
 
-  v8::Local<v8::Script> script = script_maybe.ToLocalChecked();
-  v8::MaybeLocal<v8::Value> result_maybe = script->Run(context);
 
-  if (result_maybe.IsEmpty())
-    throw v8cffi_exceptions::JSError(
-      v8cffi_trace_back::prettyTraceBack(m_isolate, try_catch));
+/*
+ * Instrument the calls ran within the context
+ * */
+void Context::setTiming(bool is_enabled)
+{
+  m_is_timing = is_enabled;
+}
 
-  v8::Local<v8::Value> result = result_maybe.ToLocalChecked();
-  v8::String::Utf8Value result_utf8_str(result);
-  return v8cffi_utils::toCString(result_utf8_str);
+
+bool Context::isTiming()
+{
+  return m_is_timing;
+}
+
+
+/*
+ * Return the counters of the
+ * calls ran within the context
+ * */
+v8cffi_timing::Counters &Context::getCounters()
+{
+  return m_counters;
 }
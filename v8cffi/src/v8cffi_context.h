@@ -3,30 +3,123 @@
 
 #include <string.h>
 #include <string>
+#include <atomic>
+#include <functional>
+#include <memory>
+#include <vector>
 
 #include "include/libplatform/libplatform.h"
 #include "include/v8.h"
 
+#include "v8cffi_input.h"
+#include "v8cffi_result.h"
+#include "v8cffi_timing.h"
+#include "v8cffi_stream.h"
+#include "v8cffi_callback.h"
+
 
 namespace v8cffi_context
 {
+  // Run the item at the given index,
+  // within the entered context
+  typedef std::function<void(const v8::Local<v8::Context> &, size_t)> BatchFn;
 
   class Context
   {
     public:
       Context(v8::Isolate *isolate);
       ~Context();
-      std::string runScript(
+      void reset();
+      void loadLib(
+        const std::string &input_script,
+        const std::string &identifier,
+        bool use_cache,
+        const std::string &cache_input,
+        std::string &cache_output,
+        bool &cache_rejected);
+      void addFunction(
+        const std::string &name,
+        v8cffi_callback::CallbackFn callback,
+        void *data);
+      void startProfiling(const std::string &title, int sampling_interval_us);
+      bool stopProfiling(const std::string &title, std::string &output);
+      void runScript(
+        v8cffi_input::Input &input_script,
+        const std::string &identifier,
+        v8cffi_result::ResultType result_type,
+        unsigned int timeout_ms,
+        v8cffi_result::Output &output);
+      void runScript(
+        const v8::Local<v8::Context> &context,
+        v8cffi_input::Input &input_script,
+        const std::string &identifier,
+        v8cffi_result::ResultType result_type,
+        unsigned int timeout_ms,
+        v8cffi_result::Output &output);
+      void runBatch(size_t items_len, const BatchFn &run_item);
+      void runScriptStream(
+        v8cffi_input::Input &input_script,
+        const std::string &identifier,
+        const std::string &write_name,
+        v8cffi_stream::Writer &writer,
+        unsigned int timeout_ms);
+      void runScriptCached(
         const std::string &input_script,
-        const std::string &identifier);
+        const std::string &identifier,
+        const std::string &cache_input,
+        std::string &cache_output,
+        bool &cache_rejected,
+        v8cffi_result::Output &output);
+      void run(
+        const v8::Local<v8::Context> &context,
+        const v8::Local<v8::Script> &script,
+        const v8::TryCatch &try_catch,
+        v8cffi_result::ResultType result_type,
+        unsigned int timeout_ms,
+        v8cffi_result::Output &output);
+      v8::Isolate *getIsolate();
+      v8::Local<v8::Context> getContext();
+      unsigned long getGeneration();
+      void setTiming(bool is_enabled);
+      bool isTiming();
+      v8cffi_timing::Counters &getCounters();
 
     private:
       // Prevent copying. Not implemented.
       Context(const Context&);
       Context& operator=(const Context&);
 
+      v8::Local<v8::Script> compile(
+        const v8::Local<v8::Context> &context,
+        v8cffi_input::Input &input_script,
+        const std::string &identifier,
+        const v8::TryCatch &try_catch);
+      v8::Local<v8::Script> compileCached(
+        const v8::Local<v8::Context> &context,
+        const std::string &input_script,
+        const std::string &identifier,
+        bool use_cache,
+        const std::string &cache_input,
+        std::string &cache_output,
+        bool &cache_rejected,
+        const v8::TryCatch &try_catch);
+      void restoreGlobal(
+        const v8::Local<v8::Context> &context,
+        const v8::Local<v8::String> &name,
+        bool has_previous,
+        const v8::Local<v8::Value> &previous);
+
       v8::Isolate *m_isolate = nullptr;
       v8::Persistent<v8::Context> m_pers_context;
+      // Contexts are created from it, it has the functions set
+      v8::Global<v8::ObjectTemplate> m_global_template;
+      // Incremented on every reset
+      unsigned long m_generation = 0;
+      // Compiled libs, ran again on every reset
+      std::vector<v8::Global<v8::UnboundScript>> m_libs;
+      std::atomic<bool> m_is_timing{false};
+      v8cffi_timing::Counters m_counters;
+      std::vector<std::unique_ptr<v8cffi_callback::Callback>> m_callbacks;
   };
 
 }
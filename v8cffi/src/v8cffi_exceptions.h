@@ -13,6 +13,10 @@ namespace v8cffi_exceptions
     public:
       explicit JSError() : m_message("") {}
       explicit JSError(const std::string &message) : m_message(message) {}
+      explicit JSError(
+        const std::string &message,
+        const std::string &details) :
+        m_message(message), m_details(details) {}
       virtual ~JSError() throw() {}
       virtual const char *what() const throw()
       {
@@ -22,6 +26,64 @@ namespace v8cffi_exceptions
       {
         return m_message;
       }
+      // JSON object, it may be empty.
+      // See v8cffi_trace_back::toJSError
+      virtual std::string getDetails() const throw()
+      {
+        return m_details;
+      }
+
+    protected:
+      std::string m_message;
+      std::string m_details;
+  };
+
+
+  class TimeoutError : public JSError
+  {
+    public:
+      explicit TimeoutError() : JSError("Error: Script execution timed out") {}
+      virtual ~TimeoutError() throw() {}
+  };
+
+
+  // Not a JS error, the script or function
+  // was created before the context was reset
+  class StaleError : public std::exception
+  {
+    public:
+      explicit StaleError() :
+        m_message("The context was reset after creating this handle") {}
+      virtual ~StaleError() throw() {}
+      virtual const char *what() const throw()
+      {
+        return m_message.c_str();
+      }
+      virtual std::string getMessage() const throw()
+      {
+        return m_message;
+      }
+
+    protected:
+      std::string m_message;
+  };
+
+  // Not a JS error, the isolate is
+  // pinned by another thread
+  class PinnedError : public std::exception
+  {
+    public:
+      explicit PinnedError() :
+        m_message("The VM is pinned to another thread") {}
+      virtual ~PinnedError() throw() {}
+      virtual const char *what() const throw()
+      {
+        return m_message.c_str();
+      }
+      virtual std::string getMessage() const throw()
+      {
+        return m_message;
+      }
 
     protected:
       std::string m_message;
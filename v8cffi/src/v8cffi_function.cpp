@@ -0,0 +1,195 @@
+#include <utility>
+#include <vector>
+
+#include "v8cffi_exceptions.h"
+#include "v8cffi_pin.h"
+#include "v8cffi_utils.h"
+#include "v8cffi_trace_back.h"
+#include "v8cffi_watchdog.h"
+#include "v8cffi_function.h"
+
+using namespace v8cffi_function;
+
+
+/*
+ * Lookup a function by its dotted name
+ * (ie: foo.render) starting from the global
+ * object. The object holding the function
+ * is kept as the receiver (this).
+ * It can be called until the context gets reset.
+ * The context must outlive the function.
+ * */
+Function::Function(
+  v8cffi_context::Context *context,
+  const std::string &name)
+{
+  m_context = context;
+  m_isolate = context->getIsolate();
+
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8::Local<v8::Context> v8_context = m_context->getContext();
+  v8::Context::Scope context_scope(v8_context);
+  v8::TryCatch try_catch;
+
+  v8::Local<v8::Value> receiver = v8_context->Global();
+  v8::Local<v8::Value> value = receiver;
+  std::string::size_type start = 0;
+
+  while (start <= name.length())
+  {
+    std::string::size_type end = name.find('.', start);
+
+    if (end == std::string::npos)
+      end = name.length();
+
+    if (!value->IsObject())
+      throw v8cffi_exceptions::JSError(
+        "TypeError: " + name.substr(0, start - 1) + " is not an object");
+
+    receiver = value;
+    v8::MaybeLocal<v8::Value> value_maybe = value.As<v8::Object>()->Get(
+      v8_context,
+      v8cffi_utils::toV8String(m_isolate, name.substr(start, end - start)));
+
+    if (value_maybe.IsEmpty())
+      throw v8cffi_trace_back::toJSError(m_isolate, try_catch);
+
+    value = value_maybe.ToLocalChecked();
+    start = end + 1;
+  }
+
+  if (!value->IsFunction())
+    throw v8cffi_exceptions::JSError(
+      "TypeError: " + name + " is not a function");
+
+  m_pers_function.Reset(m_isolate, value.As<v8::Function>());
+  m_pers_receiver.Reset(m_isolate, receiver);
+  m_generation = m_context->getGeneration();
+}
+
+
+/*
+ * The function is released by the thread
+ * holding the pin, if another thread holds it
+ * */
+Function::~Function()
+{
+  v8::Global<v8::Function> *function = new v8::Global<v8::Function>(
+    std::move(m_pers_function));
+  v8::Global<v8::Value> *receiver = new v8::Global<v8::Value>(
+    std::move(m_pers_receiver));
+  v8cffi_pin::release(m_isolate, [function, receiver]()
+  {
+    delete function;
+    delete receiver;
+  });
+}
+
+
+v8cffi_context::Context *Function::getContext()
+{
+  return m_context;
+}
+
+
+/*
+ * Call the function, args_json must be
+ * a JSON array containing the arguments.
+ * The execution is terminated after timeout_ms,
+ * 0 means no timeout.
+ * */
+void Function::call(
+  v8cffi_input::Input &args_json,
+  v8cffi_result::ResultType result_type,
+  unsigned int timeout_ms,
+  v8cffi_result::Output &output)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8::Local<v8::Context> v8_context = m_context->getContext();
+  v8::Context::Scope context_scope(v8_context);
+
+  call(v8_context, args_json, result_type, timeout_ms, output);
+}
+
+
+/*
+ * Call the function.
+ * The caller must enter the
+ * context of the function.
+ * */
+void Function::call(
+  const v8::Local<v8::Context> &v8_context,
+  v8cffi_input::Input &args_json,
+  v8cffi_result::ResultType result_type,
+  unsigned int timeout_ms,
+  v8cffi_result::Output &output)
+{
+  if (m_generation != m_context->getGeneration())
+    throw v8cffi_exceptions::StaleError();
+
+  v8::TryCatch try_catch;
+  std::vector<v8::Local<v8::Value>> args;
+
+  {
+    v8cffi_timing::PhaseTimer timer(v8cffi_timing::kInput);
+    v8::MaybeLocal<v8::Value> args_maybe = v8::JSON::Parse(
+      m_isolate, args_json.toV8String(m_isolate));
+
+    if (args_maybe.IsEmpty())
+      throw v8cffi_trace_back::toJSError(m_isolate, try_catch);
+
+    v8::Local<v8::Value> args_value = args_maybe.ToLocalChecked();
+
+    if (!args_value->IsArray())
+      throw v8cffi_exceptions::JSError(
+        "TypeError: arguments must be an array");
+
+    v8::Local<v8::Array> args_array = args_value.As<v8::Array>();
+    args.resize(args_array->Length());
+
+    for (uint32_t i = 0; i < args.size(); i++)
+      args[i] = args_array->Get(v8_context, i).ToLocalChecked();
+  }
+
+  v8::Local<v8::Function> function = v8::Local<v8::Function>::New(
+    m_isolate, m_pers_function);  // Materialize the persistent function
+  v8::Local<v8::Value> receiver = v8::Local<v8::Value>::New(
+    m_isolate, m_pers_receiver);
+  v8cffi_watchdog::Deadline deadline(m_isolate, timeout_ms);
+
+  try
+  {
+    v8::MaybeLocal<v8::Value> result_maybe;
+
+    {
+      v8cffi_timing::PhaseTimer timer(v8cffi_timing::kRun);
+      result_maybe = function->Call(
+        v8_context,
+        receiver,
+        static_cast<int>(args.size()),
+        args.data());
+    }
+
+    if (result_maybe.IsEmpty())
+      throw v8cffi_trace_back::toJSError(m_isolate, try_catch);
+
+    v8cffi_timing::PhaseTimer timer(v8cffi_timing::kOutput);
+    output.write(
+      m_isolate,
+      v8_context,
+      result_maybe.ToLocalChecked(),
+      try_catch,
+      result_type);
+  }
+  catch (const v8cffi_exceptions::JSError &e)
+  {
+    if (deadline.hasExpired())
+      throw v8cffi_exceptions::TimeoutError();
+
+    throw;
+  }
+}
@@ -0,0 +1,51 @@
+#ifndef V8CFFI_FUNCTION_H_INCLUDED
+#define V8CFFI_FUNCTION_H_INCLUDED
+
+#include <string.h>
+#include <string>
+
+#include "include/libplatform/libplatform.h"
+#include "include/v8.h"
+
+#include "v8cffi_context.h"
+
+
+namespace v8cffi_function
+{
+
+  class Function
+  {
+    public:
+      Function(
+        v8cffi_context::Context *context,
+        const std::string &name);
+      ~Function();
+      v8cffi_context::Context *getContext();
+      void call(
+        v8cffi_input::Input &args_json,
+        v8cffi_result::ResultType result_type,
+        unsigned int timeout_ms,
+        v8cffi_result::Output &output);
+      void call(
+        const v8::Local<v8::Context> &v8_context,
+        v8cffi_input::Input &args_json,
+        v8cffi_result::ResultType result_type,
+        unsigned int timeout_ms,
+        v8cffi_result::Output &output);
+
+    private:
+      // Prevent copying. Not implemented.
+      Function(const Function&);
+      Function& operator=(const Function&);
+
+      v8cffi_context::Context *m_context = nullptr;
+      v8::Isolate *m_isolate = nullptr;
+      v8::Global<v8::Function> m_pers_function;
+      v8::Global<v8::Value> m_pers_receiver;
+      unsigned long m_generation = 0;
+  };
+
+}
+
+
+#endif
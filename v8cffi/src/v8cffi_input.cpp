@@ -0,0 +1,125 @@
+#include "v8cffi_input.h"
+
+using namespace v8cffi_input;
+
+
+static ReleaseCallback release_callback = nullptr;
+
+
+static void release(void *handle)
+{
+  if (handle && release_callback)
+    release_callback(handle);
+}
+
+
+/*
+ * A pinned buffer owned by a V8 string.
+ * V8 deletes it when the string gets
+ * garbage collected or the isolate disposed.
+ * */
+class PinnedResource : public v8::String::ExternalOneByteStringResource
+{
+  public:
+    PinnedResource(const char *data, size_t length)
+    {
+      m_data = data;
+      m_length = length;
+    }
+
+    ~PinnedResource() override
+    {
+      release(m_handle);
+    }
+
+    const char *data() const override
+    {
+      return m_data;
+    }
+
+    size_t length() const override
+    {
+      return m_length;
+    }
+
+    void setHandle(void *handle)
+    {
+      m_handle = handle;
+    }
+
+  private:
+    // Prevent copying. Not implemented.
+    PinnedResource(const PinnedResource&);
+    PinnedResource& operator=(const PinnedResource&);
+
+    const char *m_data = nullptr;
+    size_t m_length = 0;
+    void *m_handle = nullptr;
+};
+
+
+/*
+ * UTF-8 is only a valid one-byte
+ * (latin-1) string when it's ASCII.
+ * */
+static bool isASCII(const char *data, size_t length)
+{
+  for (size_t i = 0; i < length; i++)
+    if (static_cast<unsigned char>(data[i]) & 0x80)
+      return false;
+
+  return true;
+}
+
+
+void v8cffi_input::setReleaseCallback(ReleaseCallback release)
+{
+  release_callback = release;
+}
+
+
+Input::Input(const char *data, size_t length, void *handle)
+{
+  m_data = data;
+  m_length = length;
+  m_handle = handle;
+}
+
+
+Input::~Input()
+{
+  release(m_handle);
+}
+
+
+/*
+ * Create a V8 string out of the input.
+ * A pinned ASCII input becomes an external
+ * string referencing the buffer, anything
+ * else gets copied into the V8 heap.
+ * */
+v8::Local<v8::String> Input::toV8String(v8::Isolate *isolate)
+{
+  if (m_handle && isASCII(m_data, m_length))
+  {
+    PinnedResource *resource = new PinnedResource(m_data, m_length);
+    v8::MaybeLocal<v8::String> str_maybe = v8::String::NewExternalOneByte(
+      isolate, resource);
+
+    if (!str_maybe.IsEmpty())
+    {
+      // The resource is owned by V8 now
+      resource->setHandle(m_handle);
+      m_handle = nullptr;
+      return str_maybe.ToLocalChecked();
+    }
+
+    delete resource;  // Too long, not owned by V8
+  }
+
+  return v8::String::NewFromUtf8(
+    isolate,
+    m_data,
+    v8::NewStringType::kNormal,
+    static_cast<int>(m_length)).ToLocalChecked();
+}
@@ -0,0 +1,42 @@
+#ifndef V8CFFI_INPUT_H_INCLUDED
+#define V8CFFI_INPUT_H_INCLUDED
+
+#include <string.h>
+#include <string>
+
+#include "include/libplatform/libplatform.h"
+#include "include/v8.h"
+
+
+namespace v8cffi_input
+{
+  typedef void (*ReleaseCallback)(void *handle);
+
+  void setReleaseCallback(ReleaseCallback release);
+
+  /*
+   * A borrowed utf-8 input. When it has a handle,
+   * the buffer is pinned by the caller and it may
+   * be exposed to V8 without a copy. The handle is
+   * released once, when V8 no longer needs the buffer.
+   * */
+  class Input
+  {
+    public:
+      Input(const char *data, size_t length, void *handle);
+      ~Input();
+      v8::Local<v8::String> toV8String(v8::Isolate *isolate);
+
+    private:
+      // Prevent copying. Not implemented.
+      Input(const Input&);
+      Input& operator=(const Input&);
+
+      const char *m_data = nullptr;
+      size_t m_length = 0;
+      void *m_handle = nullptr;
+  };
+}
+
+
+#endif
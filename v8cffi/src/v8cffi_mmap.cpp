@@ -0,0 +1,75 @@
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#include <stdexcept>
+
+#include "v8cffi_mmap.h"
+
+using namespace v8cffi_mmap;
+
+
+MappedFile::MappedFile()
+{
+}
+
+
+MappedFile::~MappedFile()
+{
+  if (!m_data)
+    return;
+
+  munmap(m_data, m_size);
+  m_data = nullptr;
+  m_size = 0;
+}
+
+
+/*
+ * Map the whole file read-only.
+ * The clean pages are backed by the page cache,
+ * so they are shared between processes
+ * mapping the same file. The mapping is private,
+ * files are meant to be replaced by renaming
+ * a new file over them, never written in place.
+ * */
+void MappedFile::open(const std::string &path)
+{
+  if (m_data)
+    throw std::logic_error("File already mapped");
+
+  int fd = ::open(path.c_str(), O_RDONLY);
+
+  if (fd == -1)
+    throw std::runtime_error("Could not open " + path);
+
+  struct stat st;
+
+  if (fstat(fd, &st) == -1 || st.st_size == 0)
+  {
+    close(fd);
+    throw std::runtime_error("Could not stat (or empty) " + path);
+  }
+
+  void *data = mmap(
+    NULL, static_cast<size_t>(st.st_size), PROT_READ, MAP_PRIVATE, fd, 0);
+  close(fd);  // The mapping keeps the file referenced
+
+  if (data == MAP_FAILED)
+    throw std::runtime_error("Could not map " + path);
+
+  m_data = data;
+  m_size = static_cast<size_t>(st.st_size);
+}
+
+
+const char *MappedFile::data() const
+{
+  return static_cast<const char *>(m_data);
+}
+
+
+size_t MappedFile::size() const
+{
+  return m_size;
+}
@@ -0,0 +1,32 @@
+#ifndef V8CFFI_MMAP_H_INCLUDED
+#define V8CFFI_MMAP_H_INCLUDED
+
+#include <string.h>
+#include <string>
+
+
+namespace v8cffi_mmap
+{
+
+  class MappedFile
+  {
+    public:
+      MappedFile();
+      ~MappedFile();
+      void open(const std::string &path);
+      const char *data() const;
+      size_t size() const;
+
+    private:
+      // Prevent copying. Not implemented.
+      MappedFile(const MappedFile&);
+      MappedFile& operator=(const MappedFile&);
+
+      void *m_data = nullptr;
+      size_t m_size = 0;
+  };
+
+}
+
+
+#endif
@@ -0,0 +1,252 @@
+#include "v8cffi_exceptions.h"
+#include "v8cffi_pin.h"
+
+using namespace v8cffi_pin;
+
+
+static const uint32_t PIN_SLOT = 1;
+
+
+Pin::Pin(v8::Isolate *isolate)
+{
+  m_isolate = isolate;
+}
+
+
+/*
+ * Release the pin, if it's held
+ * by the current thread
+ * */
+Pin::~Pin()
+{
+  if (isPinned())
+    unpin();
+}
+
+
+/*
+ * Lock and enter the isolate for the current
+ * thread. Other threads are rejected right away,
+ * then it waits for their running scripts to
+ * finish. It does nothing if the current
+ * thread already holds the pin.
+ * */
+void Pin::pin()
+{
+  std::thread::id current = std::this_thread::get_id();
+
+  {
+    std::unique_lock<std::mutex> lock(m_mutex);
+
+    if (m_owner == current)
+      return;
+
+    if (m_owner != std::thread::id())
+      throw v8cffi_exceptions::PinnedError();
+
+    // Other threads may be waiting for the lock
+    // this thread holds (i.e: pinning from a Python
+    // function called by JS), they would never finish
+    if (v8::Locker::IsLocked(m_isolate) && hasOtherUsers())
+      throw v8cffi_exceptions::PinnedError();
+
+    m_owner = current;
+    m_cond.wait(lock, [this] { return !hasOtherUsers(); });
+  }
+
+  // No other thread can take the lock anymore
+  m_locker.reset(new v8::Locker(m_isolate));
+  m_isolate->Enter();
+}
+
+
+/*
+ * Run the deferred releases, then exit
+ * and unlock the isolate. It must be called
+ * by the thread holding the pin.
+ * */
+void Pin::unpin()
+{
+  std::unique_lock<std::mutex> lock(m_mutex);
+
+  if (m_owner != std::this_thread::get_id())
+    throw v8cffi_exceptions::PinnedError();
+
+  // Releases may get deferred while running these
+  while (!m_deferred.empty())
+  {
+    std::vector<std::function<void()>> deferred;
+    deferred.swap(m_deferred);
+    lock.unlock();
+
+    for (auto &release : deferred)
+      release();
+
+    lock.lock();
+  }
+
+  // Other threads can use the isolate
+  // as soon as it's unlocked
+  m_isolate->Exit();
+  m_locker.reset();
+  m_owner = std::thread::id();
+}
+
+
+/*
+ * Return whether the current
+ * thread holds the pin
+ * */
+bool Pin::isPinned()
+{
+  std::lock_guard<std::mutex> lock(m_mutex);
+  return m_owner == std::this_thread::get_id();
+}
+
+
+/*
+ * Return whether the current thread
+ * can use the isolate, that's when
+ * another thread does not hold the pin
+ * */
+bool Pin::isAvailable()
+{
+  std::lock_guard<std::mutex> lock(m_mutex);
+  return (
+    m_owner == std::thread::id() ||
+    m_owner == std::this_thread::get_id());
+}
+
+
+/*
+ * Register the current thread as about
+ * to take the isolate lock. It fails when
+ * another thread holds (or is taking) the pin.
+ * Every enter must be followed by a leave.
+ * */
+bool Pin::enter()
+{
+  std::thread::id current = std::this_thread::get_id();
+  std::lock_guard<std::mutex> lock(m_mutex);
+
+  if (m_owner != std::thread::id() && m_owner != current)
+    return false;
+
+  m_users[current]++;
+  return true;
+}
+
+
+void Pin::leave()
+{
+  {
+    std::lock_guard<std::mutex> lock(m_mutex);
+    auto it = m_users.find(std::this_thread::get_id());
+
+    if (--it->second == 0)
+      m_users.erase(it);
+  }
+
+  m_cond.notify_all();
+}
+
+
+/*
+ * Keep a handle release for the owner to run
+ * on unpin, when another thread holds the pin.
+ * Run it right away otherwise.
+ * */
+void Pin::defer(const std::function<void()> &release)
+{
+  {
+    std::lock_guard<std::mutex> lock(m_mutex);
+
+    if (m_owner != std::thread::id() &&
+        m_owner != std::this_thread::get_id())
+    {
+      m_deferred.push_back(release);
+      return;
+    }
+
+    m_users[std::this_thread::get_id()]++;
+  }
+
+  {
+    v8::Locker l(m_isolate);
+    release();
+  }
+
+  leave();
+}
+
+
+// The caller must hold the mutex
+bool Pin::hasOtherUsers()
+{
+  std::thread::id current = std::this_thread::get_id();
+
+  for (auto &user : m_users)
+    if (user.first != current)
+      return true;
+
+  return false;
+}
+
+
+void Pin::attach(v8::Isolate *isolate, Pin *pin)
+{
+  isolate->SetData(PIN_SLOT, pin);
+}
+
+
+Pin *Pin::from(v8::Isolate *isolate)
+{
+  return static_cast<Pin *>(isolate->GetData(PIN_SLOT));
+}
+
+
+Lock::Lock(v8::Isolate *isolate) :
+  m_user(isolate),
+  m_locker(isolate)
+{}
+
+
+Lock::User::User(v8::Isolate *isolate)
+{
+  Pin *pin = Pin::from(isolate);
+
+  if (pin && !pin->enter())
+    throw v8cffi_exceptions::PinnedError();
+
+  m_pin = pin;
+}
+
+
+Lock::User::~User()
+{
+  if (m_pin)
+    m_pin->leave();
+}
+
+
+/*
+ * Release persistent handles (the function
+ * must reset them) without blocking on a pin
+ * held by another thread, the release is
+ * deferred to that thread then.
+ * */
+void v8cffi_pin::release(
+  v8::Isolate *isolate,
+  const std::function<void()> &release)
+{
+  Pin *pin = Pin::from(isolate);
+
+  if (!pin)
+  {
+    v8::Locker l(isolate);
+    release();
+    return;
+  }
+
+  pin->defer(release);
+}
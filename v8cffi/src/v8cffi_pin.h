@@ -0,0 +1,102 @@
+#ifndef V8CFFI_PIN_H_INCLUDED
+#define V8CFFI_PIN_H_INCLUDED
+
+#include <condition_variable>
+#include <functional>
+#include <memory>
+#include <mutex>
+#include <thread>
+#include <unordered_map>
+#include <vector>
+
+#include "include/libplatform/libplatform.h"
+#include "include/v8.h"
+
+
+namespace v8cffi_pin
+{
+
+  /*
+   * Keeps the isolate locked and entered by
+   * a single thread across calls. The lockers
+   * and scopes taken by every call within
+   * that thread become cheap nested ones.
+   * Other threads get a PinnedError instead
+   * of blocking on the lock until it gets
+   * unpinned. The pin state and the threads
+   * about to take the lock are guarded by
+   * the same mutex, so pinning waits for
+   * those threads to be done.
+   * */
+  class Pin
+  {
+    public:
+      Pin(v8::Isolate *isolate);
+      ~Pin();
+      void pin();
+      void unpin();
+      bool isPinned();
+      bool isAvailable();
+      bool enter();
+      void leave();
+      void defer(const std::function<void()> &release);
+      static void attach(v8::Isolate *isolate, Pin *pin);
+      static Pin *from(v8::Isolate *isolate);
+
+    private:
+      // Prevent copying. Not implemented.
+      Pin(const Pin&);
+      Pin& operator=(const Pin&);
+
+      bool hasOtherUsers();
+
+      v8::Isolate *m_isolate = nullptr;
+      std::mutex m_mutex;
+      std::condition_variable m_cond;
+      std::thread::id m_owner;
+      // Threads using the isolate, and how many
+      // nested locks each one holds
+      std::unordered_map<std::thread::id, size_t> m_users;
+      // Handle resets left for the owner to run
+      std::vector<std::function<void()>> m_deferred;
+      std::unique_ptr<v8::Locker> m_locker;
+  };
+
+
+  /*
+   * Lock the isolate, same as v8::Locker
+   * but it throws a PinnedError instead of
+   * blocking when another thread holds the pin
+   * */
+  class Lock
+  {
+    public:
+      explicit Lock(v8::Isolate *isolate);
+
+    private:
+      // Prevent copying. Not implemented.
+      Lock(const Lock&);
+      Lock& operator=(const Lock&);
+
+      class User
+      {
+        public:
+          explicit User(v8::Isolate *isolate);
+          ~User();
+
+        private:
+          Pin *m_pin = nullptr;
+      };
+
+      // The user is released after the locker
+      User m_user;
+      v8::Locker m_locker;
+  };
+
+
+  void release(v8::Isolate *isolate, const std::function<void()> &release);
+
+}
+
+
+#endif
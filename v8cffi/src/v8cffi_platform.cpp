@@ -1,30 +1,38 @@
+#include "v8cffi_exceptions.h"
 #include "v8cffi_platform.h"
 
 using namespace v8cffi_platform;
 
 
+static v8::Platform *current_platform = nullptr;
+
+
 /*
  * This can only be initialized once per process,
  * it's enforced by V8, not here.
+ * The blobs are memory mapped, so they
+ * are not copied and the pages are shared
+ * between processes.
  * */
 Platform::Platform(
-  const std::string &natives_blob,
-  const std::string &snapshot_blob)
+  const std::string &natives_path,
+  const std::string &snapshot_path)
 {
-  // StartupData does not copy the string,
-  // so we keep it alive
-  m_natives_blob = natives_blob;
-  m_snapshot_blob = snapshot_blob;
+  // StartupData does not copy the data,
+  // so we keep the files mapped
+  m_natives_file.open(natives_path);
+  m_snapshot_file.open(snapshot_path);
 
-  m_natives.data = m_natives_blob.c_str();
-  m_natives.raw_size = m_natives_blob.length();
-  m_snapshot.data = m_snapshot_blob.c_str();
-  m_snapshot.raw_size = m_snapshot_blob.length();
+  m_natives.data = m_natives_file.data();
+  m_natives.raw_size = static_cast<int>(m_natives_file.size());
+  m_snapshot.data = m_snapshot_file.data();
+  m_snapshot.raw_size = static_cast<int>(m_snapshot_file.size());
 
   v8::V8::InitializeICU();  // todo: check if true
   v8::V8::SetNativesDataBlob(&m_natives);
   v8::V8::SetSnapshotDataBlob(&m_snapshot);
   m_platform = v8::platform::CreateDefaultPlatform();
+  current_platform = m_platform;
   v8::V8::InitializePlatform(m_platform);  // todo: check if true
   v8::V8::Initialize();  // todo: check if true
 }
@@ -40,4 +48,34 @@ Platform::~Platform()
 
   delete m_platform;
   m_platform = nullptr;
+  current_platform = nullptr;
+}
+
+
+/*
+ * Return the initialized platform.
+ * */
+v8::Platform *v8cffi_platform::getPlatform()
+{
+  return current_platform;
+}
+
+
+/*
+ * Run the source within a new context
+ * and serialize the resulting heap.
+ * The platform must be initialized.
+ * */
+std::string v8cffi_platform::createSnapshot(const std::string &source)
+{
+  v8::StartupData snapshot = v8::V8::CreateSnapshotDataBlob(source.c_str());
+
+  if (!snapshot.data)
+    throw v8cffi_exceptions::JSError(
+      "Could not create the snapshot. "
+      "The source may contain errors or non serializable state");
+
+  std::string snapshot_blob(snapshot.data, snapshot.raw_size);
+  delete[] snapshot.data;
+  return snapshot_blob;
 }
@@ -6,6 +6,8 @@
 #include "include/libplatform/libplatform.h"
 #include "include/v8.h"
 
+#include "v8cffi_mmap.h"
+
 
 namespace v8cffi_platform
 {
@@ -14,8 +16,8 @@ namespace v8cffi_platform
   {
     public:
       Platform(
-        const std::string &natives_blob,
-        const std::string &snapshot_blob);
+        const std::string &natives_path,
+        const std::string &snapshot_path);
       ~Platform();
 
     private:
@@ -26,10 +28,12 @@ namespace v8cffi_platform
       v8::Platform *m_platform = nullptr;
       v8::StartupData m_natives;
       v8::StartupData m_snapshot;
-      std::string m_natives_blob;
-      std::string m_snapshot_blob;
+      v8cffi_mmap::MappedFile m_natives_file;
+      v8cffi_mmap::MappedFile m_snapshot_file;
   };
 
+  std::string createSnapshot(const std::string &source);
+  v8::Platform *getPlatform();
 }
 
 
@@ -0,0 +1,268 @@
+#include <errno.h>
+#include <stdio.h>
+#include <unistd.h>
+#include <vector>
+
+#include "v8cffi_utils.h"
+#include "v8cffi_profiler.h"
+
+using namespace v8cffi_profiler;
+
+
+static const int SNAPSHOT_CHUNK_SIZE = 64 * 1024;
+
+
+void appendInt(std::string &out, int64_t number)
+{
+  char buffer[32];
+  snprintf(buffer, sizeof(buffer), "%lld", static_cast<long long>(number));
+  out += buffer;
+}
+
+
+/*
+ * Append the node and its children,
+ * flattened, as DevTools profile nodes.
+ * */
+void appendNode(std::string &out, const v8::CpuProfileNode *node)
+{
+  out += "{\"id\":";
+  appendInt(out, node->GetNodeId());
+  out += ",\"callFrame\":{\"functionName\":";
+  v8cffi_utils::appendJSONString(out, node->GetFunctionName());
+  out += ",\"scriptId\":\"";
+  appendInt(out, node->GetScriptId());
+  out += "\",\"url\":";
+  v8cffi_utils::appendJSONString(out, node->GetScriptResourceName());
+  // DevTools lines and columns are zero-based
+  out += ",\"lineNumber\":";
+  appendInt(out, node->GetLineNumber() - 1);
+  out += ",\"columnNumber\":";
+  appendInt(out, node->GetColumnNumber() - 1);
+  out += "},\"hitCount\":";
+  appendInt(out, node->GetHitCount());
+
+  const char *bailout_reason = node->GetBailoutReason();
+
+  if (bailout_reason && *bailout_reason && strcmp(bailout_reason, "no reason"))
+  {
+    out += ",\"deoptReason\":\"";
+    out += bailout_reason;  // Static V8 messages, no escaping needed
+    out += '"';
+  }
+
+  unsigned int line_count = node->GetHitLineCount();
+
+  if (line_count)
+  {
+    std::vector<v8::CpuProfileNode::LineTick> ticks(line_count);
+
+    if (node->GetLineTicks(&ticks[0], line_count))
+    {
+      out += ",\"positionTicks\":[";
+
+      for (unsigned int i = 0; i < line_count; i++)
+      {
+        if (i)
+          out += ',';
+
+        out += "{\"line\":";
+        appendInt(out, ticks[i].line);
+        out += ",\"ticks\":";
+        appendInt(out, ticks[i].hit_count);
+        out += '}';
+      }
+
+      out += ']';
+    }
+  }
+
+  int children_count = node->GetChildrenCount();
+  out += ",\"children\":[";
+
+  for (int i = 0; i < children_count; i++)
+  {
+    if (i)
+      out += ',';
+
+    appendInt(out, node->GetChild(i)->GetNodeId());
+  }
+
+  out += "]}";
+
+  for (int i = 0; i < children_count; i++)
+  {
+    out += ',';
+    appendNode(out, node->GetChild(i));
+  }
+}
+
+
+/*
+ * Serialize the profile into the Chrome
+ * DevTools' .cpuprofile (JSON) format.
+ * Times are in microseconds.
+ * */
+void v8cffi_profiler::toCpuProfile(
+  const v8::CpuProfile *profile,
+  std::string &output)
+{
+  output += "{\"nodes\":[";
+  appendNode(output, profile->GetTopDownRoot());
+  output += "],\"startTime\":";
+  appendInt(output, profile->GetStartTime());
+  output += ",\"endTime\":";
+  appendInt(output, profile->GetEndTime());
+
+  int samples_count = profile->GetSamplesCount();
+  output += ",\"samples\":[";
+
+  for (int i = 0; i < samples_count; i++)
+  {
+    if (i)
+      output += ',';
+
+    appendInt(output, profile->GetSample(i)->GetNodeId());
+  }
+
+  output += "],\"timeDeltas\":[";
+  int64_t last_timestamp = profile->GetStartTime();
+
+  for (int i = 0; i < samples_count; i++)
+  {
+    if (i)
+      output += ',';
+
+    int64_t timestamp = profile->GetSampleTimestamp(i);
+    appendInt(output, timestamp - last_timestamp);
+    last_timestamp = timestamp;
+  }
+
+  output += "]}";
+}
+
+
+/*
+ * Start collecting a CPU profile. The sampling
+ * interval is changed only when it's not zero.
+ * The isolate must be locked and entered.
+ * */
+void v8cffi_profiler::start(
+  v8::Isolate *isolate,
+  const std::string &title,
+  int sampling_interval_us)
+{
+  v8::CpuProfiler *profiler = isolate->GetCpuProfiler();
+
+  if (sampling_interval_us > 0)
+    profiler->SetSamplingInterval(sampling_interval_us);
+
+  profiler->StartProfiling(
+    v8cffi_utils::toV8String(isolate, title), true);
+}
+
+
+/*
+ * Stop collecting a CPU profile and
+ * write it as a .cpuprofile into the output.
+ * Return false when the profile was not started.
+ * The isolate must be locked and entered.
+ * */
+bool v8cffi_profiler::stop(
+  v8::Isolate *isolate,
+  const std::string &title,
+  std::string &output)
+{
+  v8::CpuProfile *profile = isolate->GetCpuProfiler()->StopProfiling(
+    v8cffi_utils::toV8String(isolate, title));
+
+  if (!profile)
+    return false;
+
+  try
+  {
+    toCpuProfile(profile, output);
+  }
+  catch (...)
+  {
+    profile->Delete();
+    throw;
+  }
+
+  profile->Delete();
+  return true;
+}
+
+
+FileOutputStream::FileOutputStream(int fd)
+{
+  m_fd = fd;
+}
+
+
+void FileOutputStream::EndOfStream()
+{
+}
+
+
+int FileOutputStream::GetChunkSize()
+{
+  return SNAPSHOT_CHUNK_SIZE;
+}
+
+
+/*
+ * Write the whole chunk, aborting
+ * the serialization on I/O errors.
+ * */
+v8::OutputStream::WriteResult FileOutputStream::WriteAsciiChunk(
+  char *data,
+  int size)
+{
+  while (size > 0)
+  {
+    ssize_t written = ::write(m_fd, data, size);
+
+    if (written < 0)
+    {
+      if (errno == EINTR)
+        continue;
+
+      m_error = errno;
+      return kAbort;
+    }
+
+    data += written;
+    size -= written;
+  }
+
+  return kContinue;
+}
+
+
+/*
+ * Return the errno of the failed write, or 0
+ * */
+int FileOutputStream::getError() const
+{
+  return m_error;
+}
+
+
+/*
+ * Take a heap snapshot and write it into the
+ * file descriptor as a .heapsnapshot (JSON), in
+ * chunks. The snapshot is deleted afterwards.
+ * Return the errno of a failed write, or 0.
+ * The isolate must be locked and entered.
+ * */
+int v8cffi_profiler::writeHeapSnapshot(v8::Isolate *isolate, int fd)
+{
+  v8::HeapProfiler *profiler = isolate->GetHeapProfiler();
+  const v8::HeapSnapshot *snapshot = profiler->TakeHeapSnapshot();
+  FileOutputStream stream(fd);
+  snapshot->Serialize(&stream, v8::HeapSnapshot::kJSON);
+  // Delete is not const, the snapshot is owned by the profiler
+  const_cast<v8::HeapSnapshot *>(snapshot)->Delete();
+  return stream.getError();
+}
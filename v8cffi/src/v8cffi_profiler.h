@@ -0,0 +1,49 @@
+#ifndef V8CFFI_PROFILER_H_INCLUDED
+#define V8CFFI_PROFILER_H_INCLUDED
+
+#include <string.h>
+#include <string>
+
+#include "include/libplatform/libplatform.h"
+#include "include/v8.h"
+#include "include/v8-profiler.h"
+
+
+namespace v8cffi_profiler
+{
+  void start(
+    v8::Isolate *isolate,
+    const std::string &title,
+    int sampling_interval_us);
+  bool stop(
+    v8::Isolate *isolate,
+    const std::string &title,
+    std::string &output);
+  void toCpuProfile(const v8::CpuProfile *profile, std::string &output);
+  int writeHeapSnapshot(v8::Isolate *isolate, int fd);
+
+  /*
+   * Stream writing the chunks straight
+   * into a file descriptor as they come.
+   * */
+  class FileOutputStream : public v8::OutputStream
+  {
+    public:
+      FileOutputStream(int fd);
+      void EndOfStream();
+      int GetChunkSize();
+      WriteResult WriteAsciiChunk(char *data, int size);
+      int getError() const;
+
+    private:
+      // Prevent copying. Not implemented.
+      FileOutputStream(const FileOutputStream&);
+      FileOutputStream& operator=(const FileOutputStream&);
+
+      int m_fd = -1;
+      int m_error = 0;
+  };
+}
+
+
+#endif
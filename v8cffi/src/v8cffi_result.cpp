@@ -0,0 +1,133 @@
+#include "v8cffi_exceptions.h"
+#include "v8cffi_utils.h"
+#include "v8cffi_trace_back.h"
+#include "v8cffi_result.h"
+
+using namespace v8cffi_result;
+
+
+/*
+ * Serialize a JS value into JSON, calling the
+ * context's JSON.stringify (no script is compiled).
+ * undefined is serialized as null at the top level.
+ * */
+v8::Local<v8::String> toJSON(
+  v8::Isolate *isolate,
+  const v8::Local<v8::Context> &context,
+  v8::Local<v8::Value> value,
+  const v8::TryCatch &try_catch)
+{
+  v8::Local<v8::String> json_key = v8::String::NewFromUtf8(
+    isolate, "JSON", v8::NewStringType::kInternalized).ToLocalChecked();
+  v8::Local<v8::String> stringify_key = v8::String::NewFromUtf8(
+    isolate, "stringify", v8::NewStringType::kInternalized).ToLocalChecked();
+  v8::Local<v8::Value> json;
+  v8::Local<v8::Value> stringify;
+
+  if (!context->Global()->Get(context, json_key).ToLocal(&json))
+    throw v8cffi_trace_back::toJSError(isolate, try_catch);
+
+  if (!json->IsObject())
+    throw v8cffi_exceptions::JSError("TypeError: JSON is not an object");
+
+  if (!json.As<v8::Object>()->Get(context, stringify_key).ToLocal(&stringify))
+    throw v8cffi_trace_back::toJSError(isolate, try_catch);
+
+  if (!stringify->IsFunction())
+    throw v8cffi_exceptions::JSError(
+      "TypeError: JSON.stringify is not a function");
+
+  v8::Local<v8::Value> result;
+
+  if (!stringify.As<v8::Function>()->Call(
+      context, json, 1, &value).ToLocal(&result))
+    throw v8cffi_trace_back::toJSError(isolate, try_catch);
+
+  if (!result->IsString())
+    return v8::String::NewFromUtf8(
+      isolate, "null", v8::NewStringType::kInternalized).ToLocalChecked();
+
+  return result.As<v8::String>();
+}
+
+
+Output::Output()
+{
+}
+
+
+Output::Output(char *buffer, size_t buffer_len)
+{
+  m_buffer = buffer;
+  m_buffer_len = buffer_len;
+}
+
+
+/*
+ * Convert the result of running a script
+ * or calling a function and store it.
+ * kText stores the string representation,
+ * kJSON stores it serialized by JSON.stringify
+ * and kDiscard stores nothing.
+ * Strings are written as UTF-8 straight into
+ * the buffer, without intermediate copies.
+ * */
+void Output::write(
+  v8::Isolate *isolate,
+  const v8::Local<v8::Context> &context,
+  const v8::Local<v8::Value> &value,
+  const v8::TryCatch &try_catch,
+  ResultType result_type)
+{
+  m_length = 0;
+  m_in_buffer = false;
+  m_str.clear();
+
+  if (result_type == kDiscard)
+    return;
+
+  v8::Local<v8::String> str;
+
+  if (result_type == kJSON)
+    str = toJSON(isolate, context, value, try_catch);
+  else if (!value->ToString(context).ToLocal(&str))
+    return;
+
+  static const int options = (
+    v8::String::NO_NULL_TERMINATION |
+    v8::String::REPLACE_INVALID_UTF8);
+  m_length = static_cast<size_t>(str->Utf8Length());
+
+  if (m_buffer && m_length <= m_buffer_len)
+  {
+    str->WriteUtf8(m_buffer, static_cast<int>(m_length), nullptr, options);
+    m_in_buffer = true;
+    return;
+  }
+
+  m_str.resize(m_length);
+
+  if (m_length)
+    str->WriteUtf8(&m_str[0], static_cast<int>(m_length), nullptr, options);
+}
+
+
+bool Output::isInBuffer() const
+{
+  return m_in_buffer;
+}
+
+
+size_t Output::length() const
+{
+  return m_length;
+}
+
+
+/*
+ * Return the result when it's not in the buffer.
+ * */
+const std::string &Output::getString() const
+{
+  return m_str;
+}
@@ -0,0 +1,56 @@
+#ifndef V8CFFI_RESULT_H_INCLUDED
+#define V8CFFI_RESULT_H_INCLUDED
+
+#include <string.h>
+#include <string>
+
+#include "include/libplatform/libplatform.h"
+#include "include/v8.h"
+
+
+namespace v8cffi_result
+{
+  // Must match v8_result_type (v8cffi.h)
+  enum ResultType
+  {
+    kText = 0,
+    kJSON,
+    kDiscard
+  };
+
+  /*
+   * Destination of a result. It writes into
+   * a caller supplied buffer when there is one
+   * and the result fits in it, otherwise the
+   * result is kept in a string.
+   * */
+  class Output
+  {
+    public:
+      Output();
+      Output(char *buffer, size_t buffer_len);
+      void write(
+        v8::Isolate *isolate,
+        const v8::Local<v8::Context> &context,
+        const v8::Local<v8::Value> &value,
+        const v8::TryCatch &try_catch,
+        ResultType result_type);
+      bool isInBuffer() const;
+      size_t length() const;
+      const std::string &getString() const;
+
+    private:
+      // Prevent copying. Not implemented.
+      Output(const Output&);
+      Output& operator=(const Output&);
+
+      char *m_buffer = nullptr;
+      size_t m_buffer_len = 0;
+      size_t m_length = 0;
+      bool m_in_buffer = false;
+      std::string m_str;
+  };
+}
+
+
+#endif
@@ -0,0 +1,82 @@
+#include <utility>
+
+#include "v8cffi_exceptions.h"
+#include "v8cffi_pin.h"
+#include "v8cffi_utils.h"
+#include "v8cffi_trace_back.h"
+#include "v8cffi_script.h"
+
+using namespace v8cffi_script;
+
+
+/*
+ * Compile the script once, it's bound
+ * to the context and can be ran many times,
+ * until the context gets reset.
+ * The context must outlive the script.
+ * */
+Script::Script(
+  v8cffi_context::Context *context,
+  v8cffi_input::Input &input_script,
+  const std::string &identifier)
+{
+  m_context = context;
+  m_isolate = context->getIsolate();
+
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8::Local<v8::Context> v8_context = m_context->getContext();
+  v8::Context::Scope context_scope(v8_context);
+  v8::Local<v8::String> source = input_script.toV8String(m_isolate);
+  v8::ScriptOrigin origin(v8cffi_utils::toV8String(m_isolate, identifier));
+  v8::TryCatch try_catch;
+  v8::MaybeLocal<v8::Script> script_maybe = v8::Script::Compile(
+    v8_context, source, &origin);
+
+  if (script_maybe.IsEmpty())
+    throw v8cffi_trace_back::toJSError(m_isolate, try_catch);
+
+  m_pers_script.Reset(m_isolate, script_maybe.ToLocalChecked());
+  m_generation = m_context->getGeneration();
+}
+
+
+/*
+ * The script is released by the thread
+ * holding the pin, if another thread holds it
+ * */
+Script::~Script()
+{
+  v8::Global<v8::Script> *script = new v8::Global<v8::Script>(
+    std::move(m_pers_script));
+  v8cffi_pin::release(m_isolate, [script]() { delete script; });
+}
+
+
+v8cffi_context::Context *Script::getContext()
+{
+  return m_context;
+}
+
+
+void Script::run(
+  v8cffi_result::ResultType result_type,
+  unsigned int timeout_ms,
+  v8cffi_result::Output &output)
+{
+  v8cffi_pin::Lock l(m_isolate);
+
+  if (m_generation != m_context->getGeneration())
+    throw v8cffi_exceptions::StaleError();
+
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  v8::Local<v8::Context> v8_context = m_context->getContext();
+  v8::Context::Scope context_scope(v8_context);
+  v8::Local<v8::Script> script = v8::Local<v8::Script>::New(
+    m_isolate, m_pers_script);  // Materialize the persistent script
+  v8::TryCatch try_catch;
+  m_context->run(
+    v8_context, script, try_catch, result_type, timeout_ms, output);
+}
@@ -0,0 +1,44 @@
+#ifndef V8CFFI_SCRIPT_H_INCLUDED
+#define V8CFFI_SCRIPT_H_INCLUDED
+
+#include <string.h>
+#include <string>
+
+#include "include/libplatform/libplatform.h"
+#include "include/v8.h"
+
+#include "v8cffi_context.h"
+
+
+namespace v8cffi_script
+{
+
+  class Script
+  {
+    public:
+      Script(
+        v8cffi_context::Context *context,
+        v8cffi_input::Input &input_script,
+        const std::string &identifier);
+      ~Script();
+      v8cffi_context::Context *getContext();
+      void run(
+        v8cffi_result::ResultType result_type,
+        unsigned int timeout_ms,
+        v8cffi_result::Output &output);
+
+    private:
+      // Prevent copying. Not implemented.
+      Script(const Script&);
+      Script& operator=(const Script&);
+
+      v8cffi_context::Context *m_context = nullptr;
+      v8::Isolate *m_isolate = nullptr;
+      v8::Global<v8::Script> m_pers_script;
+      unsigned long m_generation = 0;
+  };
+
+}
+
+
+#endif
@@ -0,0 +1,125 @@
+#include <algorithm>
+#include <atomic>
+#include <vector>
+
+#include "v8cffi_utils.h"
+#include "v8cffi_stream.h"
+
+using namespace v8cffi_stream;
+
+
+// Ids are never reused, so a stale
+// function can't reach a newer writer
+static std::atomic<uintptr_t> next_id(1);
+
+// The writers being streamed into.
+// JS runs within the thread holding
+// the isolate lock, so these are the
+// only ones a write can reach
+static thread_local std::vector<Writer *> open_writers;
+
+
+Writer::Writer(WriteCallback write, void *data)
+{
+  m_id = next_id++;
+  m_write = write;
+  m_data = data;
+}
+
+
+Writer::~Writer()
+{
+  close();
+}
+
+
+/*
+ * Accept writes until it gets closed.
+ * Streams may be nested (i.e: a Python
+ * function streaming another script).
+ * */
+void Writer::open()
+{
+  if (m_is_open)
+    return;
+
+  open_writers.push_back(this);
+  m_is_open = true;
+}
+
+
+void Writer::close()
+{
+  if (!m_is_open)
+    return;
+
+  open_writers.erase(
+    std::remove(open_writers.begin(), open_writers.end(), this),
+    open_writers.end());
+  m_is_open = false;
+}
+
+
+/*
+ * Return a new JS function writing into this writer,
+ * while it's open. The function holds the writer id,
+ * not the writer, it's safe to call at any time.
+ * */
+v8::Local<v8::Function> Writer::toV8Function(
+  v8::Isolate *isolate,
+  const v8::Local<v8::Context> &context)
+{
+  return v8::Function::New(
+    context,
+    callback,
+    v8::External::New(isolate, reinterpret_cast<void *>(m_id)),
+    1).ToLocalChecked();
+}
+
+
+size_t Writer::getBytesWritten() const
+{
+  return m_bytes_written;
+}
+
+
+/*
+ * JS write(chunk). Non-string chunks get
+ * converted into strings, the chunk is utf-8
+ * encoded. It throws if the callback fails,
+ * or if the stream has ended.
+ * */
+void Writer::callback(const v8::FunctionCallbackInfo<v8::Value> &info)
+{
+  v8::Isolate *isolate = info.GetIsolate();
+  uintptr_t id = reinterpret_cast<uintptr_t>(
+    info.Data().As<v8::External>()->Value());
+  auto it = std::find_if(
+    open_writers.begin(),
+    open_writers.end(),
+    [id](const Writer *writer) { return writer->m_id == id; });
+
+  if (it == open_writers.end())
+  {
+    isolate->ThrowException(v8::Exception::Error(
+      v8cffi_utils::toV8String(
+        isolate, "write() called after the stream ended")));
+    return;
+  }
+
+  Writer *writer = *it;
+
+  if (info.Length() < 1)
+    return;
+
+  v8::String::Utf8Value chunk(info[0]);
+
+  if (*chunk == nullptr)
+    return;  // Conversion threw
+
+  writer->m_bytes_written += chunk.length();
+
+  if (writer->m_write(writer->m_data, *chunk, chunk.length()))
+    isolate->ThrowException(v8::Exception::Error(
+      v8cffi_utils::toV8String(isolate, "write callback failed")));
+}
@@ -0,0 +1,53 @@
+#ifndef V8CFFI_STREAM_H_INCLUDED
+#define V8CFFI_STREAM_H_INCLUDED
+
+#include <stdint.h>
+#include <string.h>
+#include <string>
+
+#include "include/libplatform/libplatform.h"
+#include "include/v8.h"
+
+
+namespace v8cffi_stream
+{
+  // Return non-zero to abort the script
+  typedef int (*WriteCallback)(void *data, const char *chunk, size_t chunk_len);
+
+  /*
+   * Native JS function passing every chunk
+   * it's called with to the write callback,
+   * as it's produced. The function may outlive
+   * the stream (i.e: kept by the script), it
+   * only refers to the writer by id and it
+   * throws once the writer is closed.
+   * */
+  class Writer
+  {
+    public:
+      Writer(WriteCallback write, void *data);
+      ~Writer();
+      void open();
+      void close();
+      v8::Local<v8::Function> toV8Function(
+        v8::Isolate *isolate,
+        const v8::Local<v8::Context> &context);
+      size_t getBytesWritten() const;
+
+    private:
+      // Prevent copying. Not implemented.
+      Writer(const Writer&);
+      Writer& operator=(const Writer&);
+
+      static void callback(const v8::FunctionCallbackInfo<v8::Value> &info);
+
+      uintptr_t m_id = 0;
+      bool m_is_open = false;
+      WriteCallback m_write = nullptr;
+      void *m_data = nullptr;
+      size_t m_bytes_written = 0;
+  };
+}
+
+
+#endif
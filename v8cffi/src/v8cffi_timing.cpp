@@ -0,0 +1,166 @@
+#include <string.h>
+#include <atomic>
+
+#include "v8cffi_timing.h"
+
+using namespace v8cffi_timing;
+
+
+static std::atomic<bool> is_enabled_global(false);
+static Counters counters_global;
+static thread_local Call *current_call = nullptr;
+static thread_local Record last_record;
+static thread_local bool has_last_record = false;
+
+
+Counters::Counters()
+{
+  memset(&m_totals, 0, sizeof(m_totals));
+}
+
+
+void Counters::add(const Record &record)
+{
+  std::lock_guard<std::mutex> lock(m_mutex);
+  m_totals.calls++;
+  m_totals.errors += record.is_error ? 1 : 0;
+  m_totals.bytes_in += record.bytes_in;
+  m_totals.bytes_out += record.bytes_out;
+
+  for (int i = 0; i < kPhasesCount; i++)
+    m_totals.phases_ns[i] += record.phases_ns[i];
+}
+
+
+Totals Counters::read()
+{
+  std::lock_guard<std::mutex> lock(m_mutex);
+  return m_totals;
+}
+
+
+/*
+ * Instrument the calls of every context
+ * */
+void v8cffi_timing::setEnabled(bool is_enabled)
+{
+  is_enabled_global = is_enabled;
+}
+
+
+bool v8cffi_timing::isEnabled()
+{
+  return is_enabled_global;
+}
+
+
+/*
+ * Return the counters of every
+ * instrumented call (process wide)
+ * */
+Counters &v8cffi_timing::getCounters()
+{
+  return counters_global;
+}
+
+
+/*
+ * Copy the last instrumented call
+ * done by the calling thread.
+ * Return false if there is none.
+ * */
+bool v8cffi_timing::getLastRecord(Record &record)
+{
+  if (!has_last_record)
+    return false;
+
+  record = last_record;
+  return true;
+}
+
+
+Call::Call(Counters &counters, bool is_enabled)
+{
+  m_is_enabled = is_enabled || isEnabled();
+
+  if (!m_is_enabled)
+    return;
+
+  memset(&m_record, 0, sizeof(m_record));
+  m_record.is_error = true;
+  m_counters = &counters;
+  m_previous = current_call;
+  current_call = this;
+}
+
+
+Call::~Call()
+{
+  if (!m_is_enabled)
+    return;
+
+  current_call = m_previous;
+  last_record = m_record;
+  has_last_record = true;
+  m_counters->add(m_record);
+  counters_global.add(m_record);
+}
+
+
+void Call::setBytesIn(size_t bytes_in)
+{
+  m_record.bytes_in = bytes_in;
+}
+
+
+void Call::setBytesOut(size_t bytes_out)
+{
+  m_record.bytes_out = bytes_out;
+}
+
+
+/*
+ * Calls are errors until they succeed
+ * */
+void Call::succeed()
+{
+  m_record.is_error = false;
+}
+
+
+void Call::addPhase(Phase phase, uint64_t ns)
+{
+  m_record.phases_ns[phase] += ns;
+}
+
+
+/*
+ * Return the innermost instrumented call
+ * of the calling thread, or NULL
+ * */
+Call *Call::current()
+{
+  return current_call;
+}
+
+
+PhaseTimer::PhaseTimer(Phase phase)
+{
+  m_call = Call::current();
+  m_phase = phase;
+
+  if (m_call)
+    m_start = std::chrono::steady_clock::now();
+}
+
+
+PhaseTimer::~PhaseTimer()
+{
+  if (!m_call)
+    return;
+
+  m_call->addPhase(
+    m_phase,
+    std::chrono::duration_cast<std::chrono::nanoseconds>(
+      std::chrono::steady_clock::now() - m_start).count());
+}
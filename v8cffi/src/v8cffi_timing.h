@@ -0,0 +1,114 @@
+#ifndef V8CFFI_TIMING_H_INCLUDED
+#define V8CFFI_TIMING_H_INCLUDED
+
+#include <stdint.h>
+#include <chrono>
+#include <mutex>
+
+
+namespace v8cffi_timing
+{
+  // Must match v8cffi_timing_t (v8cffi.h)
+  enum Phase
+  {
+    kInput = 0,
+    kCompile,
+    kRun,
+    kOutput,
+    kCopy,
+    kPhasesCount
+  };
+
+  struct Record
+  {
+    uint64_t phases_ns[kPhasesCount];
+    uint64_t bytes_in;
+    uint64_t bytes_out;
+    bool is_error;
+  };
+
+  struct Totals
+  {
+    uint64_t calls;
+    uint64_t errors;
+    uint64_t bytes_in;
+    uint64_t bytes_out;
+    uint64_t phases_ns[kPhasesCount];
+  };
+
+  /*
+   * Cumulative counters, thread-safe
+   * */
+  class Counters
+  {
+    public:
+      Counters();
+      void add(const Record &record);
+      Totals read();
+
+    private:
+      // Prevent copying. Not implemented.
+      Counters(const Counters&);
+      Counters& operator=(const Counters&);
+
+      std::mutex m_mutex;
+      Totals m_totals;
+  };
+
+  void setEnabled(bool is_enabled);
+  bool isEnabled();
+  Counters &getCounters();
+  bool getLastRecord(Record &record);
+
+  /*
+   * An instrumented call. The phases timed
+   * within its lifetime, in the same thread,
+   * are added to it. The record gets stored
+   * as the thread's last record and added to
+   * the counters once the call is done.
+   * */
+  class Call
+  {
+    public:
+      Call(Counters &counters, bool is_enabled);
+      ~Call();
+      void setBytesIn(size_t bytes_in);
+      void setBytesOut(size_t bytes_out);
+      void succeed();
+      void addPhase(Phase phase, uint64_t ns);
+      static Call *current();
+
+    private:
+      // Prevent copying. Not implemented.
+      Call(const Call&);
+      Call& operator=(const Call&);
+
+      Call *m_previous = nullptr;
+      Counters *m_counters = nullptr;
+      bool m_is_enabled = false;
+      Record m_record;
+  };
+
+  /*
+   * Time the phase of the
+   * current call, if any
+   * */
+  class PhaseTimer
+  {
+    public:
+      PhaseTimer(Phase phase);
+      ~PhaseTimer();
+
+    private:
+      // Prevent copying. Not implemented.
+      PhaseTimer(const PhaseTimer&);
+      PhaseTimer& operator=(const PhaseTimer&);
+
+      Call *m_call = nullptr;
+      Phase m_phase;
+      std::chrono::steady_clock::time_point m_start;
+  };
+}
+
+
+#endif
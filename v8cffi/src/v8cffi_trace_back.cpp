@@ -1,150 +1,251 @@
 #include "v8cffi_utils.h"
+#include "v8cffi_result.h"
 #include "v8cffi_trace_back.h"
 
 using namespace v8cffi_trace_back;
 
 
-std::string paddingOf(int padding_len)
+static const int SOURCE_LINE_MAX_LEN = 240;
+static const size_t MAX_ERRORS = 16;
+static const uint32_t ERRORS_SLOT = 2;
+
+
+void appendLocation(
+  v8::Isolate *isolate,
+  const v8::Local<v8::Message> &message,
+  std::string &out)
 {
-  if (padding_len < 0)
-    return "";
+  v8::Local<v8::Context> context = isolate->GetCurrentContext();
+
+  out += ",\"resource_name\":";
+  v8cffi_utils::appendJSONString(out, message->GetScriptResourceName());
+  out += ",\"line_number\":";
+  v8cffi_utils::appendJSONNumber(
+    out, message->GetLineNumber(context).FromMaybe(0));
+  out += ",\"start_column\":";
+  v8cffi_utils::appendJSONNumber(
+    out, message->GetStartColumn(context).FromMaybe(0));
+  out += ",\"end_column\":";
+  v8cffi_utils::appendJSONNumber(
+    out, message->GetEndColumn(context).FromMaybe(0));
 
-  std::string padding = "";
+  v8::MaybeLocal<v8::String> source_line_maybe = message->GetSourceLine(
+    context);
 
-  for (int i = 0; i < padding_len; i++)
-    padding += " ";
+  if (source_line_maybe.IsEmpty())
+    return;
 
-  return padding;
+  // Minified scripts may have huge lines, those are not copied
+  v8::Local<v8::String> source_line = source_line_maybe.ToLocalChecked();
+
+  if (source_line->Utf8Length() > SOURCE_LINE_MAX_LEN)
+  {
+    out += ",\"source_line_too_long\":true";
+    return;
+  }
+
+  out += ",\"source_line\":";
+  v8cffi_utils::appendJSONString(out, source_line);
 }
 
 
 /*
-  Return: file_name:line_num
-*/
-std::string errorSource(
+ * Append the error.stack string as is,
+ * the frames are parsed by the caller
+ * if it needs them. Reading it formats
+ * the stack V8 captured on creation.
+ * */
+void appendStack(
   v8::Isolate *isolate,
-  const v8::Local<v8::Message> &message)
+  const v8::Local<v8::Context> &context,
+  const v8::Local<v8::Value> &exception,
+  std::string &out)
 {
-  v8::String::Utf8Value origin_str(
-    message->GetScriptResourceName());
-  int line_num_default = 0;
-  int line_num = message->GetLineNumber(
-    isolate->GetCurrentContext()).FromMaybe(line_num_default);
-  return v8cffi_utils::toCString(origin_str) + ":" + std::to_string(line_num);
+  v8::TryCatch try_catch;
+  v8::Local<v8::String> stack_key = v8::String::NewFromUtf8(
+    isolate, "stack", v8::NewStringType::kInternalized).ToLocalChecked();
+  v8::Local<v8::Object> error = v8::Local<v8::Object>::Cast(exception);
+  v8::Local<v8::Value> stack;
+
+  if (!error->Get(context, stack_key).ToLocal(&stack))
+    return;
+
+  if (!stack->IsString())
+    return;
+
+  out += "\"stack\":";
+  v8cffi_utils::appendJSONString(out, stack);
 }
 
 
-std::string sourceLine(
+/*
+ * Append the thrown value as JSON,
+ * unless it's not serializable
+ * */
+void appendValue(
   v8::Isolate *isolate,
-  const v8::Local<v8::Message> &message)
+  const v8::Local<v8::Context> &context,
+  const v8::Local<v8::Value> &value,
+  std::string &out)
 {
-  std::string source_line_str = "";
-
-  v8::MaybeLocal<v8::String> source_line_maybe = message->GetSourceLine(
-    isolate->GetCurrentContext());
+  v8::TryCatch try_catch;
+  v8cffi_result::Output value_json;
 
-  if (!source_line_maybe.IsEmpty())
+  try
   {
-    v8::Local<v8::Value> source_line =
-      source_line_maybe.ToLocalChecked();
-
-    if (source_line->IsString())
-      source_line_str = v8cffi_utils::toCString(
-        v8::String::Utf8Value(source_line));
+    value_json.write(
+      isolate,
+      context,
+      value,
+      try_catch,
+      v8cffi_result::kJSON);
+  }
+  catch (const v8cffi_exceptions::JSError &e)
+  {
+    return;
   }
 
-  return source_line_str;
+  out += "\"value\":";
+  out += value_json.getString();
 }
 
 
-std::string wavyLine(
-  v8::Isolate *isolate,
-  const v8::Local<v8::Message> &message)
+Errors::Errors()
 {
-  std::string wavy_line = "";
-
-  int source_col_start_default = 0;
-  int source_col_start = message->GetStartColumn(
-    isolate->GetCurrentContext()).FromMaybe(source_col_start_default);
-
-  wavy_line += paddingOf(source_col_start);
-
-  int source_col_end_default = 0;
-  int source_col_end = message->GetEndColumn(
-    isolate->GetCurrentContext()).FromMaybe(source_col_end_default);
+}
 
-  for (int i = source_col_start; i < source_col_end; i++)
-    wavy_line += "^";
 
-  return wavy_line;
+Errors::~Errors()
+{
 }
 
 
-std::string errorMessage(
+/*
+ * Keep the exception to format it later,
+ * dropping the oldest one if there are
+ * too many. Return its id.
+ * */
+uint32_t Errors::keep(
   v8::Isolate *isolate,
-  const v8::TryCatch &try_catch)
+  const v8::Local<v8::Context> &context,
+  const v8::Local<v8::Value> &exception)
 {
-  std::string error_message_str = "";
+  if (m_errors.size() >= MAX_ERRORS)
+    m_errors.pop_front();
+
+  m_errors.emplace_back();
+  Error &error = m_errors.back();
+  error.id = ++m_last_id;
+  error.context.Reset(isolate, context);
+  error.exception.Reset(isolate, exception);
+  return error.id;
+}
 
-  v8::MaybeLocal<v8::Message> message_maybe = try_catch.Message();
 
-  if (!message_maybe.IsEmpty())
+/*
+ * Return the stack of a kept Error,
+ * or the thrown value for anything else,
+ * as a JSON object. The error is dropped
+ * afterwards. The object is empty when the
+ * error is no longer kept.
+ * */
+std::string Errors::format(v8::Isolate *isolate, uint32_t id)
+{
+  v8::HandleScope handle_scope(isolate);
+  v8::Local<v8::Context> context;
+  v8::Local<v8::Value> exception;
+
+  for (auto it = m_errors.begin(); it != m_errors.end(); it++)
   {
-    v8::Local<v8::Message> message = message_maybe.ToLocalChecked();
+    if (it->id != id)
+      continue;
+
+    context = v8::Local<v8::Context>::New(isolate, it->context);
+    exception = v8::Local<v8::Value>::New(isolate, it->exception);
+    // Formatting may throw and keep more errors
+    m_errors.erase(it);
+    break;
+  }
 
-    error_message_str += errorSource(isolate, message) + "\n";
+  if (exception.IsEmpty())
+    return "{}";
 
-    std::string source_line = sourceLine(isolate, message);
-    std::string padding = paddingOf(4);
+  v8::Context::Scope context_scope(context);
+  std::string details = "{";
 
-    if (source_line.length() <= 240)
-      error_message_str += padding + source_line + "\n" +
-        padding + wavyLine(isolate, message);
-    else
-      error_message_str += padding + "~Line too long to display.";
-  }
+  // Only errors have a stack, as in error.stack
+  if (exception->IsNativeError())
+    appendStack(isolate, context, exception, details);
+  else
+    appendValue(isolate, context, exception, details);
 
-  return error_message_str;
+  details += '}';
+  return details;
 }
 
 
-std::string stackTrace(const v8::TryCatch &try_catch)
+void Errors::attach(v8::Isolate *isolate, Errors *errors)
 {
-  std::string stack_trace_str = "";
-
-  v8::MaybeLocal<v8::Value> stack_trace_maybe = try_catch.StackTrace();
-
-  if (!stack_trace_maybe.IsEmpty())
-  {
-    v8::Local<v8::Value> stack_trace = stack_trace_maybe.ToLocalChecked();
+  isolate->SetData(ERRORS_SLOT, errors);
+}
 
-    if (stack_trace->IsString())
-      stack_trace_str = v8cffi_utils::toCString(
-        v8::String::Utf8Value(stack_trace));
-  }
 
-  return stack_trace_str;
+Errors *Errors::from(v8::Isolate *isolate)
+{
+  return static_cast<Errors *>(isolate->GetData(ERRORS_SLOT));
 }
 
 
-std::string v8cffi_trace_back::prettyTraceBack(
+/*
+ * Return the error of the caught exception.
+ * Its details are a JSON object of the message
+ * and location, to be formatted by the caller
+ * if it needs to. The exception is kept, so its
+ * stack and thrown value can be requested
+ * through the error_id, see Errors::format.
+ * */
+v8cffi_exceptions::JSError v8cffi_trace_back::toJSError(
   v8::Isolate *isolate,
   const v8::TryCatch &try_catch)
 {
-  std::string trace_back = "";
+  // There is no exception value to inspect
+  if (try_catch.HasTerminated())
+    return v8cffi_exceptions::JSError(
+      "Error: Script execution was terminated");
 
-  std::string error_message = errorMessage(isolate, try_catch);
+  v8::Local<v8::Value> exception = try_catch.Exception();
+  std::string message = v8cffi_utils::toCString(
+    v8::String::Utf8Value(exception));
+  std::string details = "{\"message\":";
+  v8cffi_utils::appendJSONString(details, message);
 
-  if (!error_message.empty())
-    trace_back += error_message + "\n";
+  v8::MaybeLocal<v8::Message> message_maybe = try_catch.Message();
 
-  std::string stack_trace = stackTrace(try_catch);
+  if (!message_maybe.IsEmpty())
+    appendLocation(isolate, message_maybe.ToLocalChecked(), details);
 
-  if (!stack_trace.empty())
-    trace_back += stack_trace;
-  else
-    trace_back += v8cffi_utils::toCString(
-      v8::String::Utf8Value(try_catch.Exception()));
+  Errors *errors = Errors::from(isolate);
 
-  return trace_back;
+  if (errors)
+  {
+    details += ",\"error_id\":";
+    details += std::to_string(errors->keep(
+      isolate, isolate->GetCurrentContext(), exception));
+  }
+
+  details += '}';
+  return v8cffi_exceptions::JSError(message, details);
+}
+
+
+/*
+ * Return the details of an error
+ * that has only got a message
+ * */
+std::string v8cffi_trace_back::toDetails(const std::string &message)
+{
+  std::string details = "{\"message\":";
+  v8cffi_utils::appendJSONString(details, message);
+  details += '}';
+  return details;
 }
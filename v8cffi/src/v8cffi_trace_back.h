@@ -1,18 +1,60 @@
 #ifndef V8CFFI_TRACE_BACK_H_INCLUDED
 #define V8CFFI_TRACE_BACK_H_INCLUDED
 
+#include <stdint.h>
 #include <string.h>
+#include <deque>
 #include <string>
 
 #include "include/libplatform/libplatform.h"
 #include "include/v8.h"
 
+#include "v8cffi_exceptions.h"
+
 
 namespace v8cffi_trace_back
 {
-  std::string prettyTraceBack(
+
+  /*
+   * The latest errors thrown within an isolate.
+   * Their stack and thrown value are formatted
+   * when requested, so throwing is cheap.
+   * Older errors are dropped. The isolate
+   * must be locked to use it.
+   * */
+  class Errors
+  {
+    public:
+      Errors();
+      ~Errors();
+      uint32_t keep(
+        v8::Isolate *isolate,
+        const v8::Local<v8::Context> &context,
+        const v8::Local<v8::Value> &exception);
+      std::string format(v8::Isolate *isolate, uint32_t id);
+      static void attach(v8::Isolate *isolate, Errors *errors);
+      static Errors *from(v8::Isolate *isolate);
+
+    private:
+      // Prevent copying. Not implemented.
+      Errors(const Errors&);
+      Errors& operator=(const Errors&);
+
+      struct Error
+      {
+        uint32_t id;
+        v8::Global<v8::Context> context;
+        v8::Global<v8::Value> exception;
+      };
+
+      uint32_t m_last_id = 0;
+      std::deque<Error> m_errors;
+  };
+
+  v8cffi_exceptions::JSError toJSError(
     v8::Isolate *isolate,
     const v8::TryCatch &try_catch);
+  std::string toDetails(const std::string &message);
 }
 
 
@@ -1,3 +1,7 @@
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+
 #include "v8cffi_utils.h"
 
 using namespace v8cffi_utils;
@@ -19,3 +23,68 @@ std::string v8cffi_utils::toCString(const v8::String::Utf8Value &str_utf8)
 {
   return std::string(*str_utf8, str_utf8.length());
 }
+
+
+void appendJSONEscaped(std::string &out, const char *str, size_t str_len)
+{
+  static const char *hex = "0123456789abcdef";
+
+  out += '"';
+
+  for (size_t i = 0; i < str_len; i++)
+  {
+    unsigned char c = static_cast<unsigned char>(str[i]);
+
+    if (c == '"')
+      out += "\\\"";
+    else if (c == '\\')
+      out += "\\\\";
+    else if (c < 0x20)
+    {
+      out += "\\u00";
+      out += hex[c >> 4];
+      out += hex[c & 0xf];
+    }
+    else
+      out += str[i];
+  }
+
+  out += '"';
+}
+
+
+void v8cffi_utils::appendJSONString(std::string &out, const v8::Local<v8::Value> &value)
+{
+  v8::String::Utf8Value str_utf8(value);
+  appendJSONEscaped(out, *str_utf8, str_utf8.length());
+}
+
+
+void v8cffi_utils::appendJSONString(std::string &out, const std::string &str)
+{
+  appendJSONEscaped(out, str.data(), str.length());
+}
+
+
+void v8cffi_utils::appendJSONNumber(std::string &out, double number)
+{
+  if (!isfinite(number))
+  {
+    out += "null";
+    return;
+  }
+
+  char buffer[32];
+
+  // The shortest form parsing back to the same number,
+  // as JS does, ie: 0.1 rather than 0.10000000000000001
+  for (int precision = 15; precision <= 17; precision++)
+  {
+    snprintf(buffer, sizeof(buffer), "%.*g", precision, number);
+
+    if (strtod(buffer, nullptr) == number)
+      break;
+  }
+
+  out += buffer;
+}
@@ -14,6 +14,9 @@ namespace v8cffi_utils
     v8::Isolate *isolate,
     const std::string &str);
   std::string toCString(const v8::String::Utf8Value &str_utf8);
+  void appendJSONString(std::string &out, const v8::Local<v8::Value> &value);
+  void appendJSONString(std::string &out, const std::string &str);
+  void appendJSONNumber(std::string &out, double number);
 }
 
 
@@ -3,6 +3,8 @@
 #include <memory>
 
 #include "v8cffi_exceptions.h"
+#include "v8cffi_platform.h"
+#include "v8cffi_profiler.h"
 #include "v8cffi_vm.h"
 
 using namespace v8cffi_vm;
@@ -27,11 +29,44 @@ void ArrayBufferAllocator::Free(void *data, size_t)
 }
 
 
-VM::VM()
+/*
+ * The snapshot_path is optional, the platform's
+ * snapshot is used when it's empty.
+ * */
+VM::VM(const std::string &snapshot_path, const HeapLimits &heap_limits)
 {
   v8::Isolate::CreateParams create_params;
   create_params.array_buffer_allocator = &m_allocator;
+
+  if (heap_limits.max_semi_space_size > 0)
+    create_params.constraints.set_max_semi_space_size(
+      heap_limits.max_semi_space_size);
+
+  if (heap_limits.max_old_space_size > 0)
+    create_params.constraints.set_max_old_space_size(
+      heap_limits.max_old_space_size);
+
+  if (heap_limits.max_executable_size > 0)
+    create_params.constraints.set_max_executable_size(
+      heap_limits.max_executable_size);
+
+  if (!snapshot_path.empty())
+  {
+    // StartupData does not copy the data and it's
+    // used for every new context, so we keep it mapped
+    m_snapshot_file.open(snapshot_path);
+    m_snapshot.data = m_snapshot_file.data();
+    m_snapshot.raw_size = static_cast<int>(m_snapshot_file.size());
+    create_params.snapshot_blob = &m_snapshot;
+  }
+
   m_isolate = v8::Isolate::New(create_params);
+  m_watchdog.reset(new v8cffi_watchdog::Watchdog(m_isolate));
+  v8cffi_watchdog::Watchdog::attach(m_isolate, m_watchdog.get());
+  m_pin.reset(new v8cffi_pin::Pin(m_isolate));
+  v8cffi_pin::Pin::attach(m_isolate, m_pin.get());
+  m_errors.reset(new v8cffi_trace_back::Errors());
+  v8cffi_trace_back::Errors::attach(m_isolate, m_errors.get());
 }
 
 
@@ -40,6 +75,15 @@ VM::~VM()
   if (!m_isolate)
     return;
 
+  m_watchdog.reset();
+  m_pin.reset();  // Unlock the isolate, if it's pinned
+
+  {
+    // The kept errors hold handles
+    v8::Locker l(m_isolate);
+    m_errors.reset();
+  }
+
   m_isolate->Dispose();
 
   // delete m_isolate;
@@ -51,3 +95,91 @@ v8::Isolate *VM::getIsolate()
 {
   return m_isolate;
 }
+
+
+/*
+ * Get the heap usage. The external memory is the
+ * memory held by JS objects outside of the heap
+ * (ie: array buffers and external strings).
+ * It waits for running scripts to finish.
+ * */
+void VM::getHeapStatistics(
+  v8::HeapStatistics &heap_stats,
+  int64_t &external_memory)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  m_isolate->GetHeapStatistics(&heap_stats);
+  external_memory = m_isolate->AdjustAmountOfExternalAllocatedMemory(0);
+}
+
+
+/*
+ * Let V8 do garbage collection work
+ * for up to deadline_ms. Return true when
+ * there is no more work to do until more
+ * JS code is ran.
+ * */
+bool VM::idleNotification(double deadline_ms)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  double now = v8cffi_platform::getPlatform()->MonotonicallyIncreasingTime();
+  return m_isolate->IdleNotificationDeadline(now + deadline_ms / 1000.0);
+}
+
+
+/*
+ * Let V8 free as much memory as it can,
+ * this is a full (and slow) garbage collection.
+ * */
+void VM::lowMemoryNotification()
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  m_isolate->LowMemoryNotification();
+}
+
+
+/*
+ * Write a heap snapshot into the file descriptor.
+ * Return the errno of a failed write, or 0.
+ * */
+int VM::writeHeapSnapshot(int fd)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  v8::HandleScope handle_scope(m_isolate);
+  return v8cffi_profiler::writeHeapSnapshot(m_isolate, fd);
+}
+
+
+/*
+ * Format the stack or thrown value of
+ * a JS error, as a JSON object. It's empty
+ * when the error is no longer kept.
+ * See v8cffi_trace_back::Errors
+ * */
+std::string VM::errorDetails(uint32_t error_id)
+{
+  v8cffi_pin::Lock l(m_isolate);
+  v8::Isolate::Scope isolate_scope(m_isolate);
+  return m_errors->format(m_isolate, error_id);
+}
+
+
+/*
+ * Lock and enter the isolate for the
+ * current thread, until it's unpinned.
+ * See v8cffi_pin::Pin
+ * */
+void VM::pin()
+{
+  m_pin->pin();
+}
+
+
+void VM::unpin()
+{
+  m_pin->unpin();
+}
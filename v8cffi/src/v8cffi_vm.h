@@ -1,9 +1,17 @@
 #ifndef V8CFFI_VM_H_INCLUDED
 #define V8CFFI_VM_H_INCLUDED
 
+#include <string>
+#include <memory>
+
 #include "include/libplatform/libplatform.h"
 #include "include/v8.h"
 
+#include "v8cffi_mmap.h"
+#include "v8cffi_watchdog.h"
+#include "v8cffi_pin.h"
+#include "v8cffi_trace_back.h"
+
 
 namespace v8cffi_vm
 {
@@ -17,12 +25,30 @@ namespace v8cffi_vm
   };
 
 
+  // Heap size limits, in MB. 0 means V8's default
+  struct HeapLimits
+  {
+    int max_semi_space_size = 0;
+    int max_old_space_size = 0;
+    int max_executable_size = 0;
+  };
+
+
   class VM
   {
     public:
-      VM();
+      VM(const std::string &snapshot_path, const HeapLimits &heap_limits);
       ~VM();
       v8::Isolate *getIsolate();
+      void getHeapStatistics(
+        v8::HeapStatistics &heap_stats,
+        int64_t &external_memory);
+      bool idleNotification(double deadline_ms);
+      void lowMemoryNotification();
+      int writeHeapSnapshot(int fd);
+      std::string errorDetails(uint32_t error_id);
+      void pin();
+      void unpin();
 
     private:
       // Prevent copying. Not implemented.
@@ -30,7 +56,12 @@ namespace v8cffi_vm
       VM& operator=(const VM&);
 
       ArrayBufferAllocator m_allocator;
+      v8::StartupData m_snapshot;
+      v8cffi_mmap::MappedFile m_snapshot_file;
       v8::Isolate *m_isolate = nullptr;
+      std::unique_ptr<v8cffi_watchdog::Watchdog> m_watchdog;
+      std::unique_ptr<v8cffi_pin::Pin> m_pin;
+      std::unique_ptr<v8cffi_trace_back::Errors> m_errors;
   };
 
 }
@@ -0,0 +1,178 @@
+#include <algorithm>
+#include <cassert>
+
+#include "v8cffi_watchdog.h"
+
+using namespace v8cffi_watchdog;
+
+
+static const uint32_t WATCHDOG_SLOT = 0;
+
+
+Watchdog::Watchdog(v8::Isolate *isolate)
+{
+  m_isolate = isolate;
+}
+
+
+Watchdog::~Watchdog()
+{
+  {
+    std::lock_guard<std::mutex> lock(m_mutex);
+    m_stop = true;
+  }
+
+  m_cond.notify_one();
+
+  if (m_thread.joinable())
+    m_thread.join();
+}
+
+
+/*
+ * Push a deadline, return its level
+ * within the stack of nested calls.
+ * */
+size_t Watchdog::arm(unsigned int timeout_ms)
+{
+  size_t level;
+
+  {
+    std::lock_guard<std::mutex> lock(m_mutex);
+    level = m_deadlines.size();
+    m_deadlines.push_back(
+      std::chrono::steady_clock::now() +
+      std::chrono::milliseconds(timeout_ms));
+
+    if (!m_thread.joinable())
+      m_thread = std::thread(&Watchdog::loop, this);
+  }
+
+  m_cond.notify_one();
+  return level;
+}
+
+
+/*
+ * Pop the deadline of the innermost call.
+ * Return whether the termination must be
+ * cancelled, that's when the execution was
+ * terminated by this deadline and not by
+ * the deadline of an outer call, which must
+ * keep unwinding. The outer deadline is
+ * enforced again after this returns.
+ * */
+bool Watchdog::disarm(size_t level)
+{
+  bool is_cancel = false;
+
+  {
+    std::lock_guard<std::mutex> lock(m_mutex);
+    assert(level + 1 == m_deadlines.size());
+    m_deadlines.pop_back();
+
+    if (m_fired && m_fired_level == level)
+    {
+      m_fired = false;
+      is_cancel = true;
+    }
+  }
+
+  m_cond.notify_one();
+  return is_cancel;
+}
+
+
+/*
+ * Return whether the deadline of
+ * the call at the given level (or the
+ * one of an outer call) was reached
+ * */
+bool Watchdog::hasFired(size_t level)
+{
+  std::lock_guard<std::mutex> lock(m_mutex);
+  return m_fired && m_fired_level <= level;
+}
+
+
+void Watchdog::loop()
+{
+  std::unique_lock<std::mutex> lock(m_mutex);
+
+  while (!m_stop)
+  {
+    // Wait for the fired termination to be cancelled
+    if (m_deadlines.empty() || m_fired)
+    {
+      m_cond.wait(lock);
+      continue;
+    }
+
+    auto now = std::chrono::steady_clock::now();
+    size_t level = 0;
+
+    // The outermost expired deadline
+    while (level < m_deadlines.size() && now < m_deadlines[level])
+      level++;
+
+    if (level == m_deadlines.size())
+    {
+      m_cond.wait_until(
+        lock,
+        *std::min_element(m_deadlines.begin(), m_deadlines.end()));
+      continue;
+    }
+
+    // TerminateExecution is safe to call from any thread
+    m_fired = true;
+    m_fired_level = level;
+    m_isolate->TerminateExecution();
+  }
+}
+
+
+void Watchdog::attach(v8::Isolate *isolate, Watchdog *watchdog)
+{
+  isolate->SetData(WATCHDOG_SLOT, watchdog);
+}
+
+
+Watchdog *Watchdog::from(v8::Isolate *isolate)
+{
+  return static_cast<Watchdog *>(isolate->GetData(WATCHDOG_SLOT));
+}
+
+
+Deadline::Deadline(v8::Isolate *isolate, unsigned int timeout_ms)
+{
+  if (!timeout_ms)
+    return;
+
+  m_isolate = isolate;
+  m_watchdog = Watchdog::from(isolate);
+  m_level = m_watchdog->arm(timeout_ms);
+}
+
+
+/*
+ * The watchdog may fire right after the
+ * execution is done, the termination is
+ * cancelled so it does not leak into the
+ * next call and the context stays usable.
+ * A termination caused by an outer call's
+ * deadline is left to that call.
+ * */
+Deadline::~Deadline()
+{
+  if (!m_watchdog)
+    return;
+
+  if (m_watchdog->disarm(m_level))
+    m_isolate->CancelTerminateExecution();
+}
+
+
+bool Deadline::hasExpired()
+{
+  return m_watchdog && m_watchdog->hasFired(m_level);
+}
@@ -0,0 +1,81 @@
+#ifndef V8CFFI_WATCHDOG_H_INCLUDED
+#define V8CFFI_WATCHDOG_H_INCLUDED
+
+#include <chrono>
+#include <condition_variable>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+#include "include/libplatform/libplatform.h"
+#include "include/v8.h"
+
+
+namespace v8cffi_watchdog
+{
+
+  /*
+   * Terminates the JS execution of an isolate
+   * once a deadline is reached. The isolate lock
+   * serializes the execution, but calls can be
+   * nested (i.e: a Python function calling back
+   * into JS), so the deadlines are kept as a stack
+   * and the earliest one is enforced. The thread is
+   * started the first time it gets armed.
+   * */
+  class Watchdog
+  {
+    public:
+      Watchdog(v8::Isolate *isolate);
+      ~Watchdog();
+      size_t arm(unsigned int timeout_ms);
+      bool disarm(size_t level);
+      bool hasFired(size_t level);
+      static void attach(v8::Isolate *isolate, Watchdog *watchdog);
+      static Watchdog *from(v8::Isolate *isolate);
+
+    private:
+      // Prevent copying. Not implemented.
+      Watchdog(const Watchdog&);
+      Watchdog& operator=(const Watchdog&);
+
+      void loop();
+
+      v8::Isolate *m_isolate = nullptr;
+      std::mutex m_mutex;
+      std::condition_variable m_cond;
+      std::thread m_thread;
+      std::vector<std::chrono::steady_clock::time_point> m_deadlines;
+      size_t m_fired_level = 0;
+      bool m_fired = false;
+      bool m_stop = false;
+  };
+
+
+  /*
+   * Arm the isolate's watchdog for the scope
+   * of a call. It must be created while
+   * holding the isolate lock. A timeout
+   * of 0 means no deadline.
+   * */
+  class Deadline
+  {
+    public:
+      Deadline(v8::Isolate *isolate, unsigned int timeout_ms);
+      ~Deadline();
+      bool hasExpired();
+
+    private:
+      // Prevent copying. Not implemented.
+      Deadline(const Deadline&);
+      Deadline& operator=(const Deadline&);
+
+      v8::Isolate *m_isolate = nullptr;
+      Watchdog *m_watchdog = nullptr;
+      size_t m_level = 0;
+  };
+
+}
+
+
+#endif
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from _v8 import ffi, lib
+
+
+__all__ = [
+    'set_enabled',
+    'last_call',
+    'counters']
+
+_PHASES = ('input', 'compile', 'run', 'output', 'copy')
+
+
+def _phases(c_struct):
+    return {
+        phase: getattr(c_struct, phase + '_ns')
+        for phase in _PHASES}
+
+
+def _to_counters(c_counters):
+    """
+    Convert the C counters
+
+    :param c_counters: C counters
+    :type c_counters: :py:class:`ffi.CData<v8cffi_counters_t *>`
+    :rtype: dict
+    """
+    return {
+        'calls': c_counters.calls,
+        'errors': c_counters.errors,
+        'bytes_in': c_counters.bytes_in,
+        'bytes_out': c_counters.bytes_out,
+        'phases_ns': _phases(c_counters)}
+
+
+def set_enabled(is_enabled):
+    """
+    Instrument the calls of every context.\
+    Use :py:func:`.Context.set_timing` to\
+    instrument a single context.
+
+    Running scripts and calling functions\
+    get timed by phase, in nanoseconds:
+
+    * ``input``: Input conversion\
+    (script or arguments) into JS
+    * ``compile``: Script compilation
+    * ``run``: JS execution
+    * ``output``: Result conversion\
+    (stringification)
+    * ``copy``: Result copy out of V8
+
+    Loading scripts with a code cache\
+    is not instrumented
+
+    :param bool is_enabled: Whether to\
+    instrument the calls or not
+    """
+    lib.v8cffi_set_timing(1 if is_enabled else 0)
+
+
+def last_call():
+    """
+    Return the timings of the last\
+    instrumented call done by the\
+    calling thread
+
+    * ``phases_ns``: Nanoseconds by phase,\
+    see :py:func:`set_enabled`
+    * ``bytes_in``: Input size
+    * ``bytes_out``: Result size
+    * ``is_error``: Whether the call failed
+
+    :return: The call timings or ``None``\
+    if there was no instrumented call
+    :rtype: dict
+    """
+    timing = ffi.new('v8cffi_timing_t *')
+
+    if not lib.v8cffi_last_timing(timing):
+        return None
+
+    return {
+        'phases_ns': _phases(timing),
+        'bytes_in': timing.bytes_in,
+        'bytes_out': timing.bytes_out,
+        'is_error': bool(timing.is_error)}
+
+
+def counters():
+    """
+    Return the cumulative counters\
+    of every instrumented call\
+    since the process started
+
+    * ``calls``: Number of calls
+    * ``errors``: Number of failed calls
+    * ``bytes_in``: Total input size
+    * ``bytes_out``: Total result size
+    * ``phases_ns``: Total nanoseconds\
+    by phase, see :py:func:`set_enabled`
+
+    :return: The counters
+    :rtype: dict
+    """
+    c_counters = ffi.new('v8cffi_counters_t *')
+    lib.v8cffi_counters(c_counters)
+    return _to_counters(c_counters)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import os
+import sys
+
+
+def to_fs_path(path):
+    """
+    @Private
+    Check the file exists and\
+    encode the path for C
+
+    :param str path: File path
+    :return: File path, encoded
+    :rtype: bytes
+    :raises OSError: If the file\
+    does not exists
+    """
+    os.stat(path)
+
+    if isinstance(path, bytes):
+        return path
+
+    return path.encode(sys.getfilesystemencoding())
@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import unicode_literals
+import os
+import json
+import tempfile
+
+import six
 
 from _v8 import ffi, lib
 
 from . import exceptions
 from . import context
+from . import utils
 
 
 __all__ = ['VM']
@@ -24,9 +30,36 @@ class VM(object):
 
     :param platform: Initialized platform
     :type platform: :py:class:`._Platform`
+    :param str snapshot_path: Path to a custom\
+    startup snapshot, see :py:mod:`.snapshot`.\
+    Every context will start with the state\
+    of the snapshot. Default to the\
+    platform's snapshot
+    :param int max_semi_space_size: Young generation\
+    semi-space size limit in MB. Default to V8's
+    :param int max_old_space_size: Old generation\
+    size limit in MB, this is most of the heap.\
+    The process aborts when it's exceeded.\
+    Default to V8's
+    :param int max_executable_size: Executable code\
+    size limit in MB. Default to V8's
     """
-    def __init__(self, platform):
+    def __init__(
+            self,
+            platform,
+            snapshot_path=None,
+            max_semi_space_size=0,
+            max_old_space_size=0,
+            max_executable_size=0):
+        assert max_semi_space_size >= 0
+        assert max_old_space_size >= 0
+        assert max_executable_size >= 0
+
         self._platform = platform
+        self._snapshot_path = snapshot_path
+        self._max_semi_space_size = max_semi_space_size
+        self._max_old_space_size = max_old_space_size
+        self._max_executable_size = max_executable_size
         self._c_vm = None
 
     def __enter__(self):
@@ -36,9 +69,21 @@ class VM(object):
         assert not self.is_alive()
         assert self._platform.is_alive()
 
+        snapshot_path = b''
+
+        if self._snapshot_path is not None:
+            snapshot_path = utils.to_fs_path(self._snapshot_path)
+
         self._c_vm = ffi.new('v8cffi_vm_t **')
         self._c_vm[0] = ffi.NULL
-        code = lib.v8cffi_vm_new(self._c_vm)
+
+        code = lib.v8cffi_vm_new(
+            self._c_vm,
+            snapshot_path,
+            len(snapshot_path),
+            self._max_semi_space_size,
+            self._max_old_space_size,
+            self._max_executable_size)
 
         if code != lib.E_V8_OK:
             raise exceptions.get_exception(code)
@@ -74,6 +119,197 @@ class VM(object):
         """
         return context.Context(self)
 
+    def heap_stats(self):
+        """
+        Return the heap usage, in bytes.\
+        It waits for running scripts to finish.
+
+        The ``external_memory`` is held by JS\
+        objects outside the heap (ie: array buffers)
+
+        :return: ``total_heap_size``,\
+        ``total_heap_size_executable``,\
+        ``total_physical_size``,\
+        ``total_available_size``,\
+        ``used_heap_size``, ``heap_size_limit``\
+        and ``external_memory``
+        :rtype: dict
+        :raises V8PinnedError: if the VM\
+        is pinned to another thread
+        """
+        assert self.is_alive()
+
+        stats = ffi.new('v8cffi_heap_stats_t *')
+        code = lib.v8cffi_vm_heap_stats(self._c_vm[0], stats)
+
+        if code != lib.E_V8_OK:
+            raise exceptions.get_exception(code)
+
+        return {
+            'total_heap_size': stats.total_heap_size,
+            'total_heap_size_executable': stats.total_heap_size_executable,
+            'total_physical_size': stats.total_physical_size,
+            'total_available_size': stats.total_available_size,
+            'used_heap_size': stats.used_heap_size,
+            'heap_size_limit': stats.heap_size_limit,
+            'external_memory': stats.external_memory}
+
+    def idle_notification(self, deadline_ms):
+        """
+        Let V8 do garbage collection work\
+        while the VM is not in use.\
+        It waits for running scripts to finish
+
+        :param float deadline_ms: Max milliseconds\
+        the work may take
+        :return: Whether there is no more\
+        work to do until more JS code is ran
+        :rtype: bool
+        :raises V8PinnedError: if the VM\
+        is pinned to another thread
+        """
+        assert self.is_alive()
+        assert deadline_ms > 0
+
+        is_done = ffi.new('int *', 0)
+        code = lib.v8cffi_vm_idle_notification(
+            self._c_vm[0], float(deadline_ms), is_done)
+
+        if code != lib.E_V8_OK:
+            raise exceptions.get_exception(code)
+
+        return bool(is_done[0])
+
+    def low_memory_notification(self):
+        """
+        Let V8 free as much memory as it can.\
+        This is a full garbage collection\
+        and it may take a while.\
+        It waits for running scripts to finish
+
+        :raises V8PinnedError: if the VM\
+        is pinned to another thread
+        """
+        assert self.is_alive()
+
+        code = lib.v8cffi_vm_low_memory_notification(self._c_vm[0])
+
+        if code != lib.E_V8_OK:
+            raise exceptions.get_exception(code)
+
+    def pin(self):
+        """
+        Pin the VM to the current thread.\
+        The VM is kept locked until\
+        :py:func:`unpin` is called, so the\
+        calls ran within this thread skip\
+        taking the lock. This is meant for\
+        threads owning a VM.
+
+        Using the VM, or its contexts,\
+        scripts and functions, from other\
+        threads raises :py:class:`.V8PinnedError`\
+        meanwhile. The thread must unpin\
+        the VM, or tear it down.\
+        It waits for running scripts to finish.\
+        Pinning it again does nothing
+
+        :raises V8PinnedError: if the VM\
+        is pinned to another thread
+        """
+        assert self.is_alive()
+
+        code = lib.v8cffi_vm_pin(self._c_vm[0])
+
+        if code != lib.E_V8_OK:
+            raise exceptions.get_exception(code)
+
+    def unpin(self):
+        """
+        Unpin the VM, so other threads\
+        can use it. See :py:func:`pin`
+
+        :raises V8PinnedError: if the VM\
+        is not pinned to the current thread
+        """
+        assert self.is_alive()
+
+        code = lib.v8cffi_vm_unpin(self._c_vm[0])
+
+        if code != lib.E_V8_OK:
+            raise exceptions.get_exception(code)
+
+    def _error_details(self, error_id):
+        """
+        @Private
+        Format the stack or thrown value\
+        of a JS error raised within the VM.\
+        Only the latest errors are kept
+
+        :param int error_id: ``error_id``\
+        of the error details
+        :return: ``stack`` or ``value``,\
+        it's empty if the error is no longer kept
+        :rtype: dict
+        :raises V8PinnedError: if the VM\
+        is pinned to another thread
+        """
+        assert self.is_alive()
+
+        with context._String() as details:
+            code = lib.v8cffi_vm_error_details(
+                self._c_vm[0],
+                error_id,
+                details.string_ptr,
+                details.len_ptr)
+
+            if code != lib.E_V8_OK:
+                raise exceptions.get_exception(code)
+
+            return json.loads(six.text_type(details))
+
+    def write_heap_snapshot(self, path):
+        """
+        Take a heap snapshot and write it\
+        into a file, in the Chrome DevTools'\
+        ``.heapsnapshot`` format. It can be loaded\
+        in the Memory tab. The file is only\
+        created once the snapshot is complete.
+
+        Taking a snapshot triggers a full\
+        garbage collection and may take\
+        a while for big heaps.\
+        It waits for running scripts to finish
+
+        :param str path: ``.heapsnapshot`` file path
+        :raises OSError: If there was an error\
+        writing the file
+        """
+        assert self.is_alive()
+
+        error_number = ffi.new('int *', 0)
+        # The snapshot is renamed into place once
+        # complete, a failure leaves nothing at path
+        fd, tmp_path = tempfile.mkstemp(
+            prefix='.heapsnapshot-', dir=os.path.dirname(path) or '.')
+
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                code = lib.v8cffi_vm_write_heap_snapshot(
+                    self._c_vm[0], fh.fileno(), error_number)
+
+            if error_number[0]:
+                raise OSError(
+                    error_number[0], os.strerror(error_number[0]), path)
+
+            if code != lib.E_V8_OK:
+                raise exceptions.get_exception(code)
+
+            os.rename(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
     def get_c_vm(self):
         """
         @Private
@@ -97,6 +333,8 @@ class VM(object):
         is no memory for allocating it,\
         the process should die afterwards anyway,\
         there is little point in catching this
+        :raises OSError: If the snapshot\
+        file does not exists
         """
         return self.__enter__()
 